@@ -1,22 +1,40 @@
 """
 Point d'entrée de l'application Recharge
 """
+import os
+
 import dash
 import dash_bootstrap_components as dbc
+import diskcache
 
 from config import Config
 from src.layout import create_layout
 from src.callbacks import register_callbacks
 from src.scheduler_manager import SchedulerManager
+from src.job_queue import AutomationJobQueue
+from src.mail_outbox import MailOutbox
+from src.api_endpoints import api_bp
+
+
+def _is_reloader_parent():
+    """
+    Processus superviseur du reloader Werkzeug (DEBUG) : il ne sert aucune requête
+    et relance un processus enfant qui exécute lui-même create_app().
+    """
+    return Config.DEBUG and os.environ.get('WERKZEUG_RUN_MAIN') != 'true'
 
 def create_app():
     """Crée et configure l'application Dash"""
     
+    # Gestionnaire des callbacks de fond (récupération Smappee hors des workers web)
+    background_callback_manager = dash.DiskcacheManager(diskcache.Cache(Config.BACKGROUND_CACHE_DIR))
+    
     # Initialiser l'application Dash avec Bootstrap
     app = dash.Dash(
         __name__,
         external_stylesheets=[dbc.themes.BOOTSTRAP],
-        suppress_callback_exceptions=Config.SUPPRESS_CALLBACK_EXCEPTIONS
+        suppress_callback_exceptions=Config.SUPPRESS_CALLBACK_EXCEPTIONS,
+        background_callback_manager=background_callback_manager
     )
     
     # Charger le template HTML personnalisé
@@ -35,9 +53,21 @@ def create_app():
     # Enregistrer les callbacks
     register_callbacks(app)
     
+    # Exposer l'API REST (/api/...) sur le serveur Flask de Dash
+    app.server.register_blueprint(api_bp)
+    
     # S'assurer que le dossier data existe
     Config.ensure_data_dir()
     
+    # Reprendre les automatisations restées en file lors du dernier arrêt
+    # (pas dans le superviseur du reloader : l'enfant s'en charge)
+    if not _is_reloader_parent():
+        AutomationJobQueue.start()
+    
+    # Démarrer l'envoi des emails en file (dont ceux interrompus lors du dernier arrêt)
+    if not _is_reloader_parent():
+        MailOutbox.start()
+    
     # Démarrer le planificateur de tâches (Scheduler)
     # Cela chargera la configuration depuis la DB et lancera le CronTrigger
     SchedulerManager.start()
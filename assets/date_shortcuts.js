@@ -0,0 +1,127 @@
+/*
+ * Raccourcis de dates exécutés côté navigateur (callbacks clientside Dash).
+ * Même sémantique que les helpers de src/utils.py :
+ *   get_current_month_period, get_previous_month_period, get_current_year_period,
+ *   get_month_button_texts, calculate_end_date_12_months, calculate_end_of_month.
+ * Les dates sont manipulées comme des triplets (année, mois, jour) pour ne pas
+ * dépendre du fuseau horaire du navigateur.
+ */
+
+// Miroir de MOIS_FR_ABBR (src/utils.py)
+const MOIS_FR_ABBR = ['', 'Jan.', 'Fév.', 'Mars', 'Avr.', 'Mai', 'Juin',
+                      'Juil.', 'Août', 'Sept.', 'Oct.', 'Nov.', 'Déc.'];
+
+function daysInMonth(year, month) {
+    // month : 1-12 ; le jour 0 du mois suivant est le dernier jour du mois
+    return new Date(Date.UTC(year, month, 0)).getUTCDate();
+}
+
+function formatDate(year, month, day) {
+    const pad = (n) => String(n).padStart(2, '0');
+    return `${String(year).padStart(4, '0')}-${pad(month)}-${pad(day)}`;
+}
+
+function parseDate(value) {
+    // Accepte "YYYY-MM-DD" ou un ISO complet ("YYYY-MM-DDTHH:MM:SS")
+    const match = /^(\d{4})-(\d{2})-(\d{2})/.exec(String(value));
+    if (!match) {
+        return null;
+    }
+    return {year: Number(match[1]), month: Number(match[2]), day: Number(match[3])};
+}
+
+function today() {
+    const now = new Date();
+    return {year: now.getFullYear(), month: now.getMonth() + 1, day: now.getDate()};
+}
+
+function previousMonth(year, month) {
+    return month > 1 ? {year: year, month: month - 1} : {year: year - 1, month: 12};
+}
+
+function currentMonthPeriod(now) {
+    return [formatDate(now.year, now.month, 1),
+            formatDate(now.year, now.month, daysInMonth(now.year, now.month))];
+}
+
+function previousMonthPeriod(now) {
+    const prev = previousMonth(now.year, now.month);
+    return [formatDate(prev.year, prev.month, 1),
+            formatDate(prev.year, prev.month, daysInMonth(prev.year, prev.month))];
+}
+
+function currentYearPeriod(now) {
+    return [formatDate(now.year, 1, 1), formatDate(now.year, 12, 31)];
+}
+
+function monthButtonTexts(now) {
+    const prev = previousMonth(now.year, now.month);
+    return [`${MOIS_FR_ABBR[prev.month]} ${prev.year}`,
+            `${MOIS_FR_ABBR[now.month]} ${now.year}`,
+            `Année ${now.year}`];
+}
+
+function endDate12Months(start) {
+    // start + relativedelta(months=12) - 1 jour : le jour est borné à la fin du mois (29/02 -> 28/02)
+    const year = start.year + 1;
+    const day = Math.min(start.day, daysInMonth(year, start.month));
+    const end = new Date(Date.UTC(year, start.month - 1, day - 1));
+    return formatDate(end.getUTCFullYear(), end.getUTCMonth() + 1, end.getUTCDate());
+}
+
+function endOfMonth(start) {
+    return formatDate(start.year, start.month, daysInMonth(start.year, start.month));
+}
+
+window.dash_clientside = Object.assign({}, window.dash_clientside, {
+    dates: {
+        select_period: function(monthClicks, yearClicks, prevMonthClicks, defaultClicks, defaultDates) {
+            const noUpdate = window.dash_clientside.no_update;
+            const triggered = window.dash_clientside.callback_context.triggered;
+            if (!triggered || !triggered.length) {
+                return [noUpdate, noUpdate, noUpdate, noUpdate, noUpdate];
+            }
+
+            const buttonId = triggered[0].prop_id.split('.')[0];
+            const now = today();
+            const texts = monthButtonTexts(now);
+            let period = null;
+
+            if (buttonId === 'select-current-month-btn') {
+                period = currentMonthPeriod(now);
+            } else if (buttonId === 'select-previous-month-btn') {
+                period = previousMonthPeriod(now);
+            } else if (buttonId === 'select-current-year-btn') {
+                period = currentYearPeriod(now);
+            } else if (buttonId === 'select-default-dates-btn') {
+                const min = defaultDates && defaultDates.min ? parseDate(defaultDates.min) : null;
+                const max = defaultDates && defaultDates.max ? parseDate(defaultDates.max) : null;
+                if (min && max) {
+                    period = [formatDate(min.year, min.month, min.day),
+                              formatDate(max.year, max.month, max.day)];
+                }
+            }
+
+            if (!period) {
+                return [noUpdate, noUpdate].concat(texts);
+            }
+            return period.concat(texts);
+        },
+
+        calculate_end_date_12_months: function(nClicks, startDate) {
+            const start = startDate ? parseDate(startDate) : null;
+            if (!nClicks || !start) {
+                return window.dash_clientside.no_update;
+            }
+            return endDate12Months(start);
+        },
+
+        calculate_end_of_month: function(nClicks, startDate) {
+            const start = startDate ? parseDate(startDate) : null;
+            if (!nClicks || !start) {
+                return window.dash_clientside.no_update;
+            }
+            return endOfMonth(start);
+        }
+    }
+});
@@ -16,9 +16,14 @@ class Config:
     DATA_DIR = os.path.join(BASE_DIR, 'data')
     ASSETS_DIR = os.path.join(BASE_DIR, 'assets')
     PDF_OUTPUT_DIR = os.path.join(DATA_DIR, 'generated_pdfs')
+    PDF_CACHE_DIR = os.path.join(PDF_OUTPUT_DIR, 'cache')
+    DATASET_CACHE_DIR = os.path.join(DATA_DIR, 'dataset_cache')
+    AUTOMATION_RUNS_DIR = os.path.join(DATA_DIR, 'automation_runs')
+    BACKGROUND_CACHE_DIR = os.path.join(DATA_DIR, 'background_callbacks')
     
     # Fichiers
     CREG_TARIFFS_JSON_FILE = os.path.join(DATA_DIR, 'creg_tariffs.json')
+    API_CACHE_FILE = os.path.join(DATA_DIR, 'api_cache.arrow')
     LOGO_PATH = os.path.join(ASSETS_DIR, 'logo_nexus-mp.png')
     
     # Paramètres de l'application
@@ -51,6 +56,13 @@ class Config:
     SMAPPEE_CLIENT_ID = os.environ.get('SMAPPEE_CLIENT_ID', '')
     SMAPPEE_CLIENT_SECRET = os.environ.get('SMAPPEE_CLIENT_SECRET', '')
     SMAPPEE_LOCATION_ID = os.environ.get('SMAPPEE_LOCATION_ID', '')
+    # Chevauchement (en heures) re-demandé à chaque synchronisation incrémentale
+    SMAPPEE_SYNC_OVERLAP_HOURS = int(os.environ.get('SMAPPEE_SYNC_OVERLAP_HOURS', 24))
+    # Récupération par tranches (mois/semaines) : parallélisme et nouvelles tentatives par tranche
+    SMAPPEE_FETCH_WORKERS = int(os.environ.get('SMAPPEE_FETCH_WORKERS', 4))
+    SMAPPEE_CHUNK_RETRIES = int(os.environ.get('SMAPPEE_CHUNK_RETRIES', 2))
+    # Délai maximal (en secondes) des requêtes HTTP vers Smappee
+    SMAPPEE_HTTP_TIMEOUT = int(os.environ.get('SMAPPEE_HTTP_TIMEOUT', 30))
     
     # --- Configuration Email (Chargée depuis .env) ---
     SMTP_SERVER = os.environ.get('SMTP_SERVER', '')
@@ -58,9 +70,55 @@ class Config:
     SMTP_USER = os.environ.get('SMTP_USER', '')
     SMTP_PASSWORD = os.environ.get('SMTP_PASSWORD', '')
     NOTIFICATION_EMAIL = os.environ.get('NOTIFICATION_EMAIL', '')
+    # Délai réseau SMTP (s) et fermeture des connexions authentifiées inactives (s)
+    SMTP_TIMEOUT = int(os.environ.get('SMTP_TIMEOUT', 30))
+    SMTP_POOL_IDLE_SECONDS = int(os.environ.get('SMTP_POOL_IDLE_SECONDS', 120))
+    # File d'envoi des emails : tentatives max avant abandon, délai initial et maximal entre tentatives (s)
+    MAIL_MAX_ATTEMPTS = int(os.environ.get('MAIL_MAX_ATTEMPTS', 6))
+    MAIL_RETRY_BASE_SECONDS = int(os.environ.get('MAIL_RETRY_BASE_SECONDS', 30))
+    MAIL_RETRY_MAX_SECONDS = int(os.environ.get('MAIL_RETRY_MAX_SECONDS', 3600))
+    MAIL_OUTBOX_POLL_SECONDS = int(os.environ.get('MAIL_OUTBOX_POLL_SECONDS', 60))
+    # Un email 'sending' réservé depuis plus longtemps (s) est considéré comme interrompu et renvoyé
+    MAIL_SENDING_LEASE_SECONDS = int(os.environ.get('MAIL_SENDING_LEASE_SECONDS', SMTP_TIMEOUT + 120))
     
     # Intervalle de rafraîchissement automatique (en ms) pour le dashboard
     AUTO_REFRESH_INTERVAL = 30000  # 30 secondes
+    # Pré-vérifications Smappee/SMTP : délai max par sonde (s) et durée de réutilisation d'un succès (s)
+    PRECHECK_TIMEOUT = int(os.environ.get('PRECHECK_TIMEOUT', 15))
+    PRECHECK_CACHE_TTL = int(os.environ.get('PRECHECK_CACHE_TTL', 120))
+    # Nombre d'automatisations exécutées simultanément (file AutomationJobQueue)
+    AUTOMATION_JOB_WORKERS = int(os.environ.get('AUTOMATION_JOB_WORKERS', 1))
+    # Bail d'une automatisation en cours : battement de cœur (s) et délai (s) au-delà duquel
+    # une demande 'running' sans battement est considérée comme interrompue et remise en file
+    AUTOMATION_JOB_HEARTBEAT_SECONDS = int(os.environ.get('AUTOMATION_JOB_HEARTBEAT_SECONDS', 30))
+    AUTOMATION_JOB_LEASE_SECONDS = int(os.environ.get('AUTOMATION_JOB_LEASE_SECONDS', 120))
+    # Nombre d'exécutions par page dans l'historique du dashboard
+    AUTOMATION_HISTORY_PAGE_SIZE = int(os.environ.get('AUTOMATION_HISTORY_PAGE_SIZE', 10))
+    
+    # Import CSV en flux : lignes par tranche et taille mémoire max avant débordement sur disque
+    CSV_IMPORT_CHUNK_ROWS = int(os.environ.get('CSV_IMPORT_CHUNK_ROWS', 50000))
+    CSV_IMPORT_SPOOL_BYTES = int(os.environ.get('CSV_IMPORT_SPOOL_BYTES', 8 * 1024 * 1024))
+    
+    # Cache serveur des jeux de données (le dcc.Store ne contient qu'une clé)
+    DATASET_CACHE_MAX_BYTES = int(os.environ.get('DATASET_CACHE_MAX_BYTES', 256 * 1024 * 1024))
+    DATASET_CACHE_SPILL_TO_DISK = os.environ.get('DATASET_CACHE_SPILL_TO_DISK', 'True').lower() == 'true'
+    # Taille maximale (octets) des jeux de données débordés sur disque (les plus anciens sont supprimés)
+    DATASET_CACHE_SPILL_MAX_BYTES = int(os.environ.get('DATASET_CACHE_SPILL_MAX_BYTES', 512 * 1024 * 1024))
+    # Nombre de rendus du dashboard (figures + statistiques) mémorisés
+    FIGURE_CACHE_MAX_ENTRIES = int(os.environ.get('FIGURE_CACHE_MAX_ENTRIES', 32))
+    # Taille maximale (octets) du cache disque des notes de frais PDF déjà rendues
+    PDF_CACHE_MAX_BYTES = int(os.environ.get('PDF_CACHE_MAX_BYTES', 64 * 1024 * 1024))
+    # Nombre de processus pour la génération des notes de frais mois par mois
+    # (interpréteurs gardés en vie avec le serveur : plafonné par défaut)
+    PDF_BATCH_WORKERS = int(os.environ.get('PDF_BATCH_WORKERS', min(4, os.cpu_count() or 1)))
+    
+    # API REST : taille minimale (octets) d'une réponse compressée en gzip, durée de cache client (s)
+    API_GZIP_MIN_BYTES = int(os.environ.get('API_GZIP_MIN_BYTES', 500))
+    API_CACHE_MAX_AGE = int(os.environ.get('API_CACHE_MAX_AGE', 0))
+    
+    # SQLite : attente max sur un verrou (ms) et requêtes préparées gardées par connexion
+    SQLITE_BUSY_TIMEOUT_MS = int(os.environ.get('SQLITE_BUSY_TIMEOUT_MS', 5000))
+    SQLITE_CACHED_STATEMENTS = int(os.environ.get('SQLITE_CACHED_STATEMENTS', 128))
     
     @classmethod
     def ensure_data_dir(cls):
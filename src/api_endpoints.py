@@ -3,17 +3,53 @@ Endpoints Flask pour l'API REST
 Permet l'intégration externe ou le déclenchement manuel via API
 """
 from flask import Blueprint, request, jsonify
-import threading
-from src.automation import run_monthly_automation
+import gzip
+from config import Config
 from src.database import AutomationDB
+from src.job_queue import AutomationJobQueue
 from src.smappee_client import SmappeeClient
 from src.email_notifier import EmailNotifier
+from src.figure_cache import FigureCache
+from src.dataset_cache import DatasetCache
+from src.pdf_cache import PdfCache
 
 
 # Créer un Blueprint Flask
 api_bp = Blueprint('api', __name__, url_prefix='/api')
 
 
+@api_bp.after_request
+def add_http_caching(response):
+    """
+    Réponses GET : ETag + If-None-Match (304 sans corps), Cache-Control,
+    puis compression gzip si le client l'accepte.
+    """
+    if request.method != 'GET' or response.status_code != 200 or response.direct_passthrough:
+        return response
+    
+    # Les clients doivent revalider (ETag) avant de réutiliser une réponse en cache
+    if Config.API_CACHE_MAX_AGE > 0:
+        response.headers['Cache-Control'] = f'private, max-age={Config.API_CACHE_MAX_AGE}, must-revalidate'
+    else:
+        response.headers['Cache-Control'] = 'no-cache'
+    
+    response.vary.add('Accept-Encoding')
+    response.add_etag()
+    response.make_conditional(request)
+    if response.status_code != 200:
+        return response
+    
+    body = response.get_data()
+    if ('gzip' in request.accept_encodings and len(body) >= Config.API_GZIP_MIN_BYTES
+            and 'Content-Encoding' not in response.headers):
+        response.set_data(gzip.compress(body, compresslevel=6))
+        response.headers['Content-Encoding'] = 'gzip'
+        # Même ressource, autre encodage : l'ETag devient faible (comparaison faible pour If-None-Match)
+        etag, _ = response.get_etag()
+        response.set_etag(etag, weak=True)
+    return response
+
+
 @api_bp.route('/automation/trigger', methods=['POST'])
 def trigger_automation():
     """
@@ -37,42 +73,55 @@ def trigger_automation():
         if not period_start or not period_end:
             return jsonify({'error': 'period_start et period_end sont requis'}), 400
         
-        # Lancer l'automatisation en arrière-plan
-        thread = threading.Thread(
-            target=run_monthly_automation,
-            args=(period_start, period_end, False),
-            daemon=True
-        )
-        thread.start()
+        # Mettre en file (une demande déjà active pour la période est réutilisée)
+        try:
+            job, created = AutomationJobQueue.submit(period_start, period_end, manual_trigger=False)
+        except ValueError:
+            return jsonify({'error': 'period_start et period_end doivent être des dates valides'}), 400
         
         return jsonify({
-            'status': 'started',
-            'message': 'Automatisation démarrée en arrière-plan',
-            'period_start': period_start,
-            'period_end': period_end
+            'status': 'started' if created else 'already_running',
+            'message': 'Automatisation démarrée en arrière-plan' if created
+                       else 'Une automatisation est déjà en cours pour cette période',
+            'job_id': job['id'],
+            'job_status': job['status'],
+            'period_start': job['period_start'],
+            'period_end': job['period_end']
         }), 202
         
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
 
+# Taille maximale d'une page d'historique
+MAX_PAGE_SIZE = 100
+
+
 @api_bp.route('/automation/status', methods=['GET'])
 def get_automation_status():
     """
-    Retourne le statut des dernières automatisations.
+    Retourne le statut des dernières automatisations (paginé, du plus récent au plus ancien).
     
     Query params optionnels:
-    - limit: nombre de runs à retourner (défaut: 10)
+    - limit: nombre de runs à retourner (défaut: 10, max: 100)
+    - cursor: jeton 'next_cursor' de la page précédente
+    - status: filtre sur le statut (success, failed, ...)
     """
     try:
-        limit = request.args.get('limit', 10, type=int)
+        limit = min(max(request.args.get('limit', 10, type=int), 1), MAX_PAGE_SIZE)
+        cursor = request.args.get('cursor')
+        status = request.args.get('status')
         
         db = AutomationDB()
-        runs = db.get_recent_runs(limit=limit)
+        try:
+            runs, next_cursor = db.get_runs_page(limit=limit, cursor=cursor, status=status)
+        except ValueError as e:
+            return jsonify({'error': str(e)}), 400
         
         return jsonify({
             'total': len(runs),
-            'runs': runs
+            'runs': runs,
+            'next_cursor': next_cursor
         }), 200
         
     except Exception as e:
@@ -84,9 +133,7 @@ def get_run_status(run_id):
     """Retourne le statut d'une exécution spécifique par son ID"""
     try:
         db = AutomationDB()
-        runs = db.get_recent_runs(limit=100)
-        
-        run = next((r for r in runs if r['id'] == run_id), None)
+        run = db.get_run(run_id)
         
         if not run:
             return jsonify({'error': 'Run non trouvé'}), 404
@@ -97,6 +144,48 @@ def get_run_status(run_id):
         return jsonify({'error': str(e)}), 500
 
 
+@api_bp.route('/automation/runs/<int:run_id>/resume', methods=['POST'])
+def resume_run(run_id):
+    """Reprend une exécution échouée à partir de sa première étape non terminée"""
+    try:
+        db = AutomationDB()
+        run = db.get_run(run_id)
+        
+        if not run:
+            return jsonify({'error': 'Run non trouvé'}), 404
+        if run['status'] == 'success':
+            return jsonify({'error': 'Run déjà terminé avec succès'}), 409
+        
+        job, created = AutomationJobQueue.resume(run_id)
+        if job is None:
+            return jsonify({'error': 'Run déjà terminé avec succès'}), 409
+        
+        return jsonify({
+            'status': 'started' if created else 'already_running',
+            'job_id': job['id'],
+            'job_status': job['status'],
+            'run_id': run_id
+        }), 202
+        
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+
+@api_bp.route('/automation/jobs/<int:job_id>', methods=['GET'])
+def get_job_status(job_id):
+    """Retourne l'état d'une demande d'automatisation (queued, running, done, failed)"""
+    try:
+        job = AutomationJobQueue.get_job(job_id)
+        
+        if not job:
+            return jsonify({'error': 'Job non trouvé'}), 404
+        
+        return jsonify(job), 200
+        
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+
 @api_bp.route('/config/test-smappee', methods=['POST'])
 def test_smappee():
     """
@@ -174,6 +263,16 @@ def test_email():
         return jsonify({'error': str(e)}), 500
 
 
+@api_bp.route('/cache/stats', methods=['GET'])
+def cache_stats():
+    """Retourne l'état des caches (rendus mémorisés, jeux de données et notes de frais PDF)"""
+    return jsonify({
+        'figures': FigureCache.stats(),
+        'datasets': DatasetCache.stats(),
+        'pdfs': PdfCache.stats()
+    }), 200
+
+
 @api_bp.route('/health', methods=['GET'])
 def health_check():
     """Endpoint de health check de l'application"""
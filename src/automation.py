@@ -5,13 +5,16 @@ Smappee → Calcul avec CREG → PDF → Email
 """
 import os
 import pandas as pd
+import pyarrow.feather as feather
 from datetime import datetime
 from config import Config
 from src.database import AutomationDB
 from src.smappee_client import SmappeeClient
 from src.email_notifier import EmailNotifier
+from src.mail_outbox import MailOutbox
 from src.pdf_generator import generate_monthly_pdf_auto
-from src.utils import get_previous_month_period, get_current_month_period
+from src.prechecks import ConnectivityPrecheck
+from src.utils import get_previous_month_period, get_current_month_period, normalize_session_dtypes
 
 def run_scheduled_job():
     """
@@ -33,20 +36,62 @@ def run_scheduled_job():
     
     print(f"📅 Période calculée pour l'automatisation : {start_str} au {end_str}")
     
-    run_monthly_automation(start_str, end_str, manual_trigger=False)
+    # Passe par la file : pas de doublon si la même période est déjà en cours
+    from src.job_queue import AutomationJobQueue
+    AutomationJobQueue.submit(start_str, end_str, manual_trigger=False)
 
 
-def run_monthly_automation(period_start, period_end, manual_trigger=False):
+def _save_run_data(run_id, df):
+    """Point de reprise de l'étape 1 : sessions récupérées, en Arrow IPC sous AUTOMATION_RUNS_DIR"""
+    os.makedirs(Config.AUTOMATION_RUNS_DIR, exist_ok=True)
+    path = os.path.join(Config.AUTOMATION_RUNS_DIR, f'run_{run_id}.arrow')
+    tmp_path = f"{path}.tmp"
+    feather.write_feather(normalize_session_dtypes(df), tmp_path, compression='uncompressed')
+    os.replace(tmp_path, path)
+    return path
+
+
+def _load_run_data(run):
+    """Sessions sauvegardées pour une exécution, ou None si le point de reprise est absent"""
+    path = run.get('data_path') if run else None
+    if path and os.path.exists(path):
+        return feather.read_table(path, memory_map=True).to_pandas()
+    return None
+
+
+def run_monthly_automation(period_start, period_end, manual_trigger=False, resume_run_id=None):
     """
     Exécute l'automatisation mensuelle complète.
     Récupère la config depuis la DB (prioritaire) ou le fichier config (fallback .env).
+    
+    Chaque étape enregistre un point de reprise sur l'exécution (data_path, pdf_path,
+    email_status). Avec resume_run_id, l'exécution existante reprend à la première
+    étape non terminée.
     """
     db = AutomationDB()
     
-    # Créer une nouvelle exécution dans l'historique
-    run_id = db.create_run(period_start, period_end)
+    if resume_run_id is not None:
+        # Reprise : on réutilise la ligne d'historique et ses points de reprise
+        run = db.get_run(resume_run_id)
+        if run is None:
+            return False, f"Exécution {resume_run_id} introuvable", None
+        run_id = run['id']
+        period_start, period_end = run['period_start'], run['period_end']
+        db.update_run(run_id, 'resume', 'pending', "Reprise de l'exécution...")
+    else:
+        # Créer une nouvelle exécution dans l'historique
+        run_id = db.create_run(period_start, period_end)
+        run = None
     
     try:
+        # Étapes déjà faites lors d'une exécution précédente
+        df = _load_run_data(run)
+        pdf_path = run.get('pdf_path') if run else None
+        if pdf_path and not os.path.exists(pdf_path):
+            pdf_path = None
+        # Email déjà envoyé ou en file d'envoi (la file gère les nouvelles tentatives)
+        email_sent = bool(run) and run.get('email_status') in ('sent', 'queued')
+        
         # Récupérer la configuration depuis la DB
         # Si la DB est vide, on prend les valeurs par défaut de Config (qui viennent du .env)
         db_config = db.get_config()
@@ -70,79 +115,78 @@ def run_monthly_automation(period_start, period_end, manual_trigger=False):
         smtp_password = get_conf('smtp_password', Config.SMTP_PASSWORD)
         notification_email = get_conf('notification_email', Config.NOTIFICATION_EMAIL)
 
-        # A. Test Smappee
-        if not all([smappee_client_id, smappee_client_secret, smappee_location_id]):
+        # Seuls les services encore nécessaires sont vérifiés
+        need_smappee = df is None
+        need_smtp = not email_sent
+        
+        if need_smappee and not all([smappee_client_id, smappee_client_secret, smappee_location_id]):
             raise Exception("⚠️ Configuration Smappee incomplète")
-            
-        smappee_test = SmappeeClient(smappee_client_id, smappee_client_secret)
-        if not smappee_test.authenticate():
-             # Message spécifique demandé par l'utilisateur
-             raise Exception("⚠️ Résoudre les problèmes de connexions smappee d'abord")
-
-        # B. Test Email
-        if not all([smtp_server, smtp_user, smtp_password]):
-             raise Exception("⚠️ Configuration SMTP incomplète")
-             
-        notifier_test = EmailNotifier(smtp_server, int(smtp_port), smtp_user, smtp_password)
-        email_ok, email_msg = notifier_test.test_connection()
-        if not email_ok:
+        if need_smtp and not all([smtp_server, smtp_user, smtp_password]):
+            raise Exception("⚠️ Configuration SMTP incomplète")
+        
+        # Sondes Smappee et SMTP en parallèle (résultat partagé avec le déclenchement manuel)
+        checks = ConnectivityPrecheck.check(
+            smappee=(smappee_client_id, smappee_client_secret) if need_smappee else None,
+            smtp=(smtp_server, int(smtp_port), smtp_user, smtp_password) if need_smtp else None
+        )
+        if need_smappee and not checks['smappee'][0]:
+            # Message spécifique demandé par l'utilisateur
+            raise Exception("⚠️ Résoudre les problèmes de connexions smappee d'abord")
+        if need_smtp and not checks['smtp'][0]:
             # Message spécifique demandé par l'utilisateur
             raise Exception("⚠️ Résoudre les problèmes de connexions du mail d'abord")
 
         # ====================================================================
         # ÉTAPE 1 : Récupération des données Smappee
         # ====================================================================
-        db.update_run(run_id, 'fetch_data', 'pending', 'Connexion à Smappee...')
-        
-        # On peut réutiliser l'instance authentifiée
-        smappee = smappee_test
-        
-        # Appel avec 3 arguments : ID, Début, Fin
-        df = smappee.get_charging_sessions(smappee_location_id, period_start, period_end)
-        
-        if df is None or len(df) == 0:
-            msg = f"Aucune session trouvée pour la période {period_start} - {period_end}"
-            print(f"⚠️ {msg}")
-            db.update_run(run_id, 'fetch_data', 'warning', msg)
-            return False, msg, run_id
-        
-        db.update_run(run_id, 'fetch_data', 'success', f'{len(df)} sessions récupérées')
+        if df is None:
+            db.update_run(run_id, 'fetch_data', 'pending', 'Connexion à Smappee...')
+            
+            # Le jeton obtenu par la pré-vérification est partagé entre instances du même client
+            smappee = SmappeeClient(smappee_client_id, smappee_client_secret)
+            if not smappee.authenticate():
+                raise Exception("⚠️ Résoudre les problèmes de connexions smappee d'abord")
+            
+            # Appel avec 3 arguments : ID, Début, Fin
+            df = smappee.get_charging_sessions(smappee_location_id, period_start, period_end)
+            
+            if df is None or len(df) == 0:
+                msg = f"Aucune session trouvée pour la période {period_start} - {period_end}"
+                print(f"⚠️ {msg}")
+                db.update_run(run_id, 'fetch_data', 'warning', msg)
+                return False, msg, run_id
+            
+            db.update_run_checkpoint(run_id, data_path=_save_run_data(run_id, df))
+            db.update_run(run_id, 'fetch_data', 'success', f'{len(df)} sessions récupérées')
         
         # ====================================================================
         # ÉTAPE 2 : Génération du PDF avec tarifs CREG
         # ====================================================================
-        db.update_run(run_id, 'generate_pdf', 'pending', 'Génération du PDF...')
-        
-        # Utilisation de la colonne mappée par SmappeeClient
-        vehicles = df['Nom de la borne de recharge'].unique().tolist()
-        
-        pdf_path = generate_monthly_pdf_auto(
-            df, period_start, period_end, vehicles
-        )
-        
-        if not pdf_path or not os.path.exists(pdf_path):
-            raise Exception("Erreur lors de la création du fichier PDF")
-        
-        db.update_run(run_id, 'generate_pdf', 'success', f'PDF généré: {os.path.basename(pdf_path)}', pdf_path=pdf_path)
+        if pdf_path is None:
+            db.update_run(run_id, 'generate_pdf', 'pending', 'Génération du PDF...')
+            
+            # Utilisation de la colonne mappée par SmappeeClient
+            vehicles = df['Nom de la borne de recharge'].unique().tolist()
+            
+            pdf_path = generate_monthly_pdf_auto(
+                df, period_start, period_end, vehicles
+            )
+            
+            if not pdf_path or not os.path.exists(pdf_path):
+                raise Exception("Erreur lors de la création du fichier PDF")
+            
+            db.update_run(run_id, 'generate_pdf', 'success', f'PDF généré: {os.path.basename(pdf_path)}', pdf_path=pdf_path)
         
         # ====================================================================
-        # ÉTAPE 3 : Envoi par email
+        # ÉTAPE 3 : Envoi par email (file d'envoi, sans attendre le serveur SMTP)
         # ====================================================================
-        db.update_run(run_id, 'send_email', 'pending', f'Envoi à {notification_email}...')
-        
-        notifier = EmailNotifier(smtp_server, int(smtp_port), smtp_user, smtp_password)
-        
-        success, message = notifier.send_automation_success(
-            notification_email, 
-            period_start, 
-            period_end, 
-            pdf_path
-        )
-        
-        if not success:
-            raise Exception(f"Échec envoi email: {message}")
-        
-        db.update_run(run_id, 'send_email', 'success', f'Envoyé à {notification_email}')
+        if not email_sent:
+            # email_status passe à 'sent' (ou 'failed' après abandon) lors de l'envoi effectif
+            db.update_run_checkpoint(run_id, email_status='queued')
+            
+            subject, body = EmailNotifier.compose_automation_success(period_start, period_end)
+            MailOutbox.enqueue(notification_email, subject, body, attachment_path=pdf_path, run_id=run_id)
+            db.update_run(run_id, 'send_email', 'success', f'Envoi à {notification_email} en file')
         
         # ====================================================================
         # Finalisation
@@ -162,13 +206,12 @@ def run_monthly_automation(period_start, period_end, manual_trigger=False):
             config = db.get_config()
             s_server = config.get('smtp_server', Config.SMTP_SERVER)
             s_user = config.get('smtp_user', Config.SMTP_USER)
-            s_pass = config.get('smtp_password', Config.SMTP_PASSWORD)
-            s_port = int(config.get('smtp_port', Config.SMTP_PORT))
             target = config.get('notification_email', Config.NOTIFICATION_EMAIL)
             
-            if s_server and s_user:
-                notifier = EmailNotifier(s_server, s_port, s_user, s_pass)
-                notifier.send_automation_error(target, period_start, period_end, error_message)
+            if s_server and s_user and target:
+                # Mis en file : l'expéditeur relit la configuration SMTP au moment de l'envoi
+                subject, body = EmailNotifier.compose_automation_error(period_start, period_end, error_message)
+                MailOutbox.enqueue(target, subject, body)
         except:
             pass # Si ça échoue aussi, on abandonne silencieusement l'alerte
         
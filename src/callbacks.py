@@ -11,38 +11,195 @@ parent_dir = os.path.dirname(current_dir)
 sys.path.append(parent_dir)
 # ------------------------
 
-import pandas as pd
 import dash_bootstrap_components as dbc
 import plotly.graph_objs as go
-from dash import Input, Output, State, callback_context, ALL, no_update, html, dcc, dash_table
+from dash import Input, Output, State, ClientsideFunction, Patch, callback_context, ALL, no_update, html, dcc, dash_table
 from datetime import datetime, timedelta
 
 from config import Config
 from src.utils import (
     parse_csv_contents,
-    get_month_button_texts,
-    calculate_end_date_12_months,
-    calculate_end_of_month,
     get_current_month_period,
     get_previous_month_period,
-    get_current_year_period,
     load_creg_tariffs,
-    save_creg_tariffs,
-    # Imports pour les calculs de graphs
-    filter_dataframe,
-    add_cost_columns_creg,
-    calculate_statistics,
-    prepare_weekly_data,
-    prepare_monthly_data,
-    prepare_daily_consumption,
-    prepare_duration_distribution
+    save_creg_tariffs
 )
 
 # Imports pour l'UI dynamique
-from src.components import create_stats_cards, create_pdf_buttons, create_automation_history_table
-from src.pdf_generator import generate_monthly_pdf_data
+from src.components import (
+    create_stats_cards, create_pdf_buttons, create_automation_history_table, format_stats_card_values
+)
+from src.pdf_generator import generate_monthly_pdf_data, generate_monthly_pdfs_batch_data, generate_annual_pdf_data
 from src.database import AutomationDB
 from src.smappee_client import SmappeeClient
+from src.dataset_cache import DatasetCache
+from src.session_sync import sync_charging_sessions
+from src.rollup import RollupCube
+from src.figure_cache import FigureCache
+
+def build_dashboard_view(selection):
+    """
+    Construit les cartes de statistiques et les trois figures du dashboard
+    à partir d'une sélection du cube d'agrégats.
+    
+    Returns:
+        dict avec 'layout' (arbre de composants), 'stats' et 'figures'
+    """
+    # 3. Préparer les données
+    stats = selection.statistics()
+    weekly_data = selection.weekly_data()
+    monthly_data = selection.monthly_data()
+    daily_consumption = selection.daily_consumption()
+    duration_dist = selection.duration_distribution()
+
+    # 4. Créer les figures Plotly
+
+    # Graphique 1: Combiné Semaine/Mois
+    fig_combined = go.Figure()
+
+    fig_combined.add_trace(go.Scatter(
+        x=weekly_data['week_date'],
+        y=weekly_data['cost'],
+        mode='markers',
+        name='Coût hebdomadaire',
+        marker=dict(size=8, color=Config.SAGE_GREEN, opacity=0.7),
+        customdata=weekly_data['energyConsumed_kWh'],
+        hovertemplate='<b>Semaine:</b> %{x|%Y-%m-%d}<br><b>Coût:</b> %{y:.2f} €<br><b>Consommation:</b> %{customdata:.2f} kWh<extra></extra>'
+    ))
+
+    fig_combined.add_trace(go.Scatter(
+        x=monthly_data['month_date'],
+        y=monthly_data['cost'],
+        mode='lines+markers',
+        name='Tendance mensuelle',
+        line=dict(color=Config.SAGE_GREEN, width=3),
+        marker=dict(size=10, color=Config.SAGE_GREEN),
+        customdata=monthly_data['energyConsumed_kWh'],
+        hovertemplate='<b>Mois:</b> %{x|%Y-%m}<br><b>Coût:</b> %{y:.2f} €<br><b>Consommation:</b> %{customdata:.2f} kWh<extra></extra>'
+    ))
+
+    fig_combined.update_layout(
+        title='Évolution des Coûts de Recharge (Tarifs CREG)',
+        xaxis_title='Date',
+        yaxis_title='Coût (€)',
+        hovermode='closest',
+        height=500,
+        template='plotly_white',
+        showlegend=True,
+        legend=dict(orientation="h", yanchor="bottom", y=1.02, xanchor="right", x=1)
+    )
+
+    # Graphique 2: Jours de la semaine
+    fig_weekly = go.Figure()
+    fig_weekly.add_trace(go.Bar(
+        x=daily_consumption['day_fr'],
+        y=daily_consumption['energyConsumed_kWh'],
+        marker=dict(color=Config.SAGE_GREEN),
+        text=daily_consumption['energyConsumed_kWh'].round(1),
+        textposition='auto'
+    ))
+    fig_weekly.update_layout(
+        title='Consommation par Jour de la Semaine',
+        xaxis_title='Jour',
+        yaxis_title='Consommation Totale (kWh)',
+        height=400,
+        template='plotly_white'
+    )
+
+    # Graphique 3: Distribution Durée
+    fig_duration = go.Figure()
+    fig_duration.add_trace(go.Scatter(
+        x=duration_dist['durationHours_rounded'],
+        y=duration_dist['sessions'],
+        mode='lines+markers',
+        line=dict(color=Config.SAGE_GREEN, width=3),
+        marker=dict(size=8, color=Config.SAGE_GREEN),
+        fill='tozeroy',
+        fillcolor='rgba(152, 192, 163, 0.3)',
+        name='Sessions',
+        hovertemplate='<b>Durée:</b> %{x}h<br><b>Nombre de sessions:</b> %{y}<extra></extra>'
+    ))
+
+    fig_duration.update_layout(
+        title='Distribution du Temps de Recharge',
+        xaxis_title='Durée de recharge (heures)',
+        yaxis_title='Nombre de sessions',
+        height=400,
+        template='plotly_white',
+        showlegend=False
+    )
+
+    # 5. Assembler le layout
+    graphs = html.Div([
+        # Cartes de stats
+        create_stats_cards(
+            stats['total_consumption'],
+            stats['total_cost'],
+            stats['avg_session'],
+            stats['total_sessions']
+        ),
+        # Boutons actions
+        create_pdf_buttons(),
+        # Graphs
+        dbc.Row([
+            dbc.Col([dcc.Graph(id={'type': 'dashboard-graph', 'index': 'combined'}, figure=fig_combined)], width=12)
+        ], className="mb-4"),
+        dbc.Row([
+            dbc.Col([dcc.Graph(id={'type': 'dashboard-graph', 'index': 'weekly'}, figure=fig_weekly)], width=6),
+            dbc.Col([dcc.Graph(id={'type': 'dashboard-graph', 'index': 'duration'}, figure=fig_duration)], width=6)
+        ], className="mb-4")
+    ])
+
+    return {
+        'layout': graphs,
+        'stats': stats,
+        'figures': {'combined': fig_combined, 'weekly': fig_weekly, 'duration': fig_duration}
+    }
+
+
+# Attributs de trace qui dépendent des données ; le reste de la figure (layout, styles) est statique
+PATCHED_TRACE_ATTRIBUTES = ('x', 'y', 'customdata', 'text')
+
+
+def build_dashboard_patches(view):
+    """
+    Mise à jour incrémentale d'un dashboard déjà affiché : uniquement les valeurs
+    des cartes de stats et les tableaux x/y des traces, sans renvoyer le layout.
+    
+    Returns:
+        tuple (valeurs des cartes par clé, Patch par figure)
+    """
+    stats = view['stats']
+    values = format_stats_card_values(
+        stats['total_consumption'],
+        stats['total_cost'],
+        stats['avg_session'],
+        stats['total_sessions']
+    )
+    
+    patches = {}
+    for name, fig in view['figures'].items():
+        patch = Patch()
+        for i, trace in enumerate(fig.data):
+            for attr in PATCHED_TRACE_ATTRIBUTES:
+                if attr in trace and trace[attr] is not None:
+                    patch['data'][i][attr] = trace[attr]
+        patches[name] = patch
+    
+    return values, patches
+
+
+def render_automation_history(db, cursors):
+    """Tableau d'historique pour la page courante (dernier curseur de la pile)"""
+    cursors = cursors or [None]
+    try:
+        runs, next_cursor = db.get_runs_page(limit=Config.AUTOMATION_HISTORY_PAGE_SIZE, cursor=cursors[-1])
+    except ValueError:
+        # Curseur client corrompu : retour à la première page
+        cursors = [None]
+        runs, next_cursor = db.get_runs_page(limit=Config.AUTOMATION_HISTORY_PAGE_SIZE)
+    return create_automation_history_table(runs, page=len(cursors), has_next=next_cursor is not None)
+
 
 def register_callbacks(app):
     """Enregistre tous les callbacks de l'application"""
@@ -65,16 +222,16 @@ def register_callbacks(app):
          Output('default-dates', 'data'),
          Output('data-source-indicator', 'children')],
         [Input('upload-data', 'contents'),
-         Input('refresh-smappee-data-btn', 'n_clicks')],
+         Input('smappee-refresh-result', 'data')],
         [State('upload-data', 'filename'),
          State('stored-data', 'data')],
     )
-    def manage_data_source(contents, refresh_clicks, filename, current_stored_data):
+    def manage_data_source(contents, refresh_result, filename, current_stored_data):
         """
         Master Callback: Gère le chargement des données.
         Priorité:
         1. Upload CSV (action explicite)
-        2. Bouton Refresh API (action explicite)
+        2. Fin d'une récupération Smappee (tâche de fond refresh_smappee_data)
         3. Chargement initial (Cache API si dispo)
         """
         ctx = callback_context
@@ -97,59 +254,34 @@ def register_callbacks(app):
                         no_update, no_update, no_update, no_update)
 
         # --- CAS 2: REFRESH API ---
-        elif trigger_id == 'refresh-smappee-data-btn':
+        # La synchronisation a tourné en tâche de fond ; on relit le cache columnar qu'elle a écrit
+        elif trigger_id == 'smappee-refresh-result':
+            if not refresh_result:
+                return (no_update, no_update, no_update, no_update, no_update, no_update, 
+                        no_update, no_update, no_update, no_update, no_update, no_update)
             db = AutomationDB()
-            config = db.get_config()
-            client_id = config.get('smappee_client_id')
-            client_secret = config.get('smappee_client_secret')
-            location_id = config.get('smappee_location_id')
-            
-            if not all([client_id, client_secret, location_id]):
-                return (no_update, dbc.Alert("⚠️ Configurez l'API Smappee d'abord", color="warning"),
-                        no_update, no_update, no_update, no_update, no_update, no_update, 
-                        no_update, no_update, no_update, no_update)
-            
-            # Récupérer données (monitoring depuis le début de l'année)
-            now = datetime.now()
-            start_monitor = datetime(now.year, 1, 1)
-            client = SmappeeClient(client_id, client_secret)
-            
-            if client.authenticate():
-                df = client.get_charging_sessions(location_id, start_monitor.isoformat(), now.isoformat())
-                if df is not None and not df.empty:
-                    # Sauvegarder dans le cache DB
-                    json_data = df.to_json(date_format='iso')
-                    db.save_api_cache(json_data)
-                    source_label = "Smappee API (En direct)"
-                else:
-                    return (no_update, dbc.Alert("Aucune donnée trouvée ou erreur API", color="warning"),
-                            no_update, no_update, no_update, no_update, no_update, no_update, 
-                            no_update, no_update, no_update, no_update)
-            else:
-                return (no_update, dbc.Alert("❌ Erreur authentification Smappee", color="danger"),
+            df = db.get_api_cache()
+            if df is None or df.empty:
+                return (no_update, dbc.Alert("Aucune donnée trouvée ou erreur API", color="warning"),
                         no_update, no_update, no_update, no_update, no_update, no_update, 
                         no_update, no_update, no_update, no_update)
+            source_label = "Smappee API (En direct)"
 
         # --- CAS 3: INITIAL LOAD (CACHE) ---
         elif trigger_id == 'initial_load':
-            # Si on a déjà des données (rechargement de page partiel), on ne fait rien
-            if current_stored_data: 
+            # Si on a déjà des données encore en cache (rechargement de page partiel), on ne fait rien
+            if current_stored_data and DatasetCache.get(current_stored_data) is not None:
                 return (no_update, no_update, no_update, no_update, no_update, no_update, 
                         no_update, no_update, no_update, no_update, no_update, no_update)
             
             # Sinon on cherche le cache
             db = AutomationDB()
-            cached_json = db.get_api_cache()
-            if cached_json:
-                try:
-                    df = pd.read_json(cached_json)
-                    # Re-conversion des dates car read_json peut parfois perdre le type
-                    if 'startTime' in df.columns:
-                        df['startTime'] = pd.to_datetime(df['startTime'])
-                        df['endTime'] = pd.to_datetime(df['endTime'])
+            try:
+                df = db.get_api_cache()
+                if df is not None:
                     source_label = "Smappee API (Cache)"
-                except:
-                    pass # Cache corrompu ou vide
+            except Exception:
+                df = None # Cache corrompu ou vide
 
         # --- TRAITEMENT COMMUN DU DATAFRAME ---
         if df is None:
@@ -181,15 +313,82 @@ def register_callbacks(app):
             }
         )
         
-        return (df.to_json(date_format='iso'), status_content, default_start, default_end,
+        # Le DataFrame reste côté serveur : seul sa clé transite vers le navigateur
+        dataset_key = DatasetCache.put(df)
+        # Cube des graphiques : étendu depuis celui du jeu précédent quand c'est possible
+        RollupCube.for_dataset(dataset_key, df, previous_key=current_stored_data)
+        
+        return (dataset_key, status_content, default_start, default_end,
                 min_date, max_date, min_date, max_date, vehicle_options, vehicles, default_dates, indicator)
     
     
+    @app.callback(
+        [Output('smappee-refresh-result', 'data'),
+         Output('upload-status', 'children', allow_duplicate=True)],
+        Input('refresh-smappee-data-btn', 'n_clicks'),
+        background=True,
+        running=[
+            (Output('refresh-smappee-data-btn', 'disabled'), True, False),
+            (Output('cancel-smappee-refresh-btn', 'style'), {'display': 'inline-block'}, {'display': 'none'}),
+            (Output('smappee-refresh-progress', 'style'), {'display': 'flex'}, {'display': 'none'}),
+        ],
+        progress=[Output('smappee-refresh-progress', 'value'),
+                  Output('smappee-refresh-progress', 'max'),
+                  Output('smappee-refresh-progress', 'label')],
+        cancel=[Input('cancel-smappee-refresh-btn', 'n_clicks')],
+        prevent_initial_call=True
+    )
+    def refresh_smappee_data(set_progress, n_clicks):
+        """
+        Récupération Smappee en tâche de fond (hors des workers web) :
+        authentification, synchronisation incrémentale par tranches, écriture du cache columnar.
+        Le résultat déclenche manage_data_source qui recharge le cache.
+        """
+        if not n_clicks:
+            return no_update, no_update
+        
+        db = AutomationDB()
+        config = db.get_config()
+        client_id = config.get('smappee_client_id')
+        client_secret = config.get('smappee_client_secret')
+        location_id = config.get('smappee_location_id')
+        
+        if not all([client_id, client_secret, location_id]):
+            return no_update, dbc.Alert("⚠️ Configurez l'API Smappee d'abord", color="warning")
+        
+        set_progress((0, 1, "Connexion à Smappee..."))
+        client = SmappeeClient(client_id, client_secret)
+        if not client.authenticate():
+            return no_update, dbc.Alert("❌ Erreur authentification Smappee", color="danger")
+        
+        # Synchronisation incrémentale puis lecture des sessions de l'année en base
+        now = datetime.now()
+        start_monitor = datetime(now.year, 1, 1)
+        
+        def on_chunk(done, total):
+            set_progress((done, total, f"{done}/{total}"))
+        
+        inserted = sync_charging_sessions(client, location_id, db=db, now=now, on_chunk=on_chunk)
+        if inserted is None:
+            return no_update, dbc.Alert("Aucune donnée trouvée ou erreur API", color="warning")
+        
+        df = db.get_sessions(location_id, start=start_monitor)
+        if df.empty:
+            return no_update, dbc.Alert("Aucune donnée trouvée ou erreur API", color="warning")
+        
+        # Sauvegarder dans le cache columnar (Arrow + manifeste SQLite)
+        db.save_api_cache(df)
+        return {'refreshed_at': now.isoformat(), 'rows': len(df), 'inserted': inserted}, ""
+    
+    
     # ========================================================================
     # 2. GESTION DES DATES - Sélection rapide
     # ========================================================================
     
-    @app.callback(
+    # Calculs de calendrier purs : exécutés dans le navigateur (assets/date_shortcuts.js),
+    # sans aller-retour serveur. Même sémantique que les helpers de src/utils.py.
+    app.clientside_callback(
+        ClientsideFunction(namespace='dates', function_name='select_period'),
         [Output('start-date', 'date', allow_duplicate=True),
          Output('end-date', 'date', allow_duplicate=True),
          Output('select-previous-month-btn', 'children'),
@@ -202,60 +401,24 @@ def register_callbacks(app):
         [State('default-dates', 'data')],
         prevent_initial_call=True
     )
-    def select_period(month_clicks, year_clicks, prev_month_clicks, default_clicks, default_dates):
-        """Sélectionne automatiquement le mois ou l'année"""
-        ctx = callback_context
-        if not ctx.triggered:
-            return no_update, no_update, no_update, no_update, no_update
-        
-        button_id = ctx.triggered[0]['prop_id'].split('.')[0]
-        prev_text, curr_text, year_text = get_month_button_texts()
-        
-        if button_id == 'select-current-month-btn':
-            start, end = get_current_month_period()
-            return start, end, prev_text, curr_text, year_text
-        
-        elif button_id == 'select-previous-month-btn':
-            start, end = get_previous_month_period()
-            return start, end, prev_text, curr_text, year_text
-            
-        elif button_id == 'select-current-year-btn':
-            start, end = get_current_year_period()
-            return start, end, prev_text, curr_text, year_text
-        
-        elif button_id == 'select-default-dates-btn':
-            if default_dates and default_dates.get('min') and default_dates.get('max'):
-                start = pd.to_datetime(default_dates['min']).date()
-                end = pd.to_datetime(default_dates['max']).date()
-                return start, end, prev_text, curr_text, year_text
-        
-        return no_update, no_update, prev_text, curr_text, year_text
 
-    # Callback pour la flèche dans les paramètres (calcul 12 mois)
-    @app.callback(
+    # Flèche dans les paramètres (calcul 12 mois)
+    app.clientside_callback(
+        ClientsideFunction(namespace='dates', function_name='calculate_end_date_12_months'),
         Output('end-date', 'date', allow_duplicate=True),
         Input('params-calculate-end-date-btn', 'n_clicks'),
         State('start-date', 'date'),
         prevent_initial_call=True
     )
-    def params_calculate_end_date(n_clicks, start_date):
-        """Calcule automatiquement 12 mois après la date de début"""
-        if n_clicks and start_date:
-            return calculate_end_date_12_months(start_date)
-        return no_update
 
-    # Callback pour la flèche dans la modale mensuelle
-    @app.callback(
+    # Flèche dans la modale mensuelle (dernier jour du mois)
+    app.clientside_callback(
+        ClientsideFunction(namespace='dates', function_name='calculate_end_of_month'),
         Output('modal-monthly-end-date', 'date', allow_duplicate=True),
         Input('calculate-monthly-end-date-btn', 'n_clicks'),
         State('modal-monthly-start-date', 'date'),
         prevent_initial_call=True
     )
-    def calculate_monthly_end_date_modal(n_clicks, start_date):
-        """Calcule le dernier jour du mois"""
-        if n_clicks and start_date:
-            return calculate_end_of_month(start_date)
-        return no_update
 
 
     # ========================================================================
@@ -263,141 +426,72 @@ def register_callbacks(app):
     # ========================================================================
     
     @app.callback(
-        Output('graphs-container', 'children'),
+        [Output('graphs-container', 'children'),
+         Output({'type': 'stats-card-value', 'index': ALL}, 'children'),
+         Output({'type': 'dashboard-graph', 'index': ALL}, 'figure'),
+         Output('graphs-render-state', 'data')],
         [Input('stored-data', 'data'),
          Input('start-date', 'date'),
          Input('end-date', 'date'),
-         Input('vehicle-selection', 'value')]
+         Input('vehicle-selection', 'value')],
+        State('graphs-render-state', 'data')
     )
-    def update_graphs(json_data, start_date, end_date, selected_vehicles):
-        """Met à jour les graphiques et statistiques"""
-        
-        if json_data is None or start_date is None or end_date is None or not selected_vehicles:
-            return html.Div()
-        
-        df = pd.read_json(json_data)
-        # Re-conversion des dates car read_json convertit en timestamp/string
-        if 'startTime' in df.columns:
-            df['startTime'] = pd.to_datetime(df['startTime'])
-        if 'endTime' in df.columns:
-            df['endTime'] = pd.to_datetime(df['endTime'])
-        
-        # 1. Filtrer
-        df_filtered = filter_dataframe(df, start_date, end_date, selected_vehicles)
-        
-        if len(df_filtered) == 0:
-            return dbc.Alert("Aucune donnée pour la période et les véhicules sélectionnés", color="warning")
-        
-        # 2. Calculer les coûts (AVEC CREG)
-        # On utilise add_cost_columns_creg qui récupère les prix automatiquement
-        df_filtered = add_cost_columns_creg(df_filtered)
-        
-        # 3. Préparer les données
-        stats = calculate_statistics(df_filtered)
-        weekly_data = prepare_weekly_data(df_filtered)
-        monthly_data = prepare_monthly_data(df_filtered)
-        daily_consumption = prepare_daily_consumption(df_filtered)
-        duration_dist = prepare_duration_distribution(df_filtered)
-        
-        # 4. Créer les figures Plotly
-        
-        # Graphique 1: Combiné Semaine/Mois
-        fig_combined = go.Figure()
-        
-        fig_combined.add_trace(go.Scatter(
-            x=weekly_data['week_date'],
-            y=weekly_data['cost'],
-            mode='markers',
-            name='Coût hebdomadaire',
-            marker=dict(size=8, color=Config.SAGE_GREEN, opacity=0.7),
-            customdata=weekly_data['energyConsumed_kWh'],
-            hovertemplate='<b>Semaine:</b> %{x|%Y-%m-%d}<br><b>Coût:</b> %{y:.2f} €<br><b>Consommation:</b> %{customdata:.2f} kWh<extra></extra>'
-        ))
-        
-        fig_combined.add_trace(go.Scatter(
-            x=monthly_data['month_date'],
-            y=monthly_data['cost'],
-            mode='lines+markers',
-            name='Tendance mensuelle',
-            line=dict(color=Config.SAGE_GREEN, width=3),
-            marker=dict(size=10, color=Config.SAGE_GREEN),
-            customdata=monthly_data['energyConsumed_kWh'],
-            hovertemplate='<b>Mois:</b> %{x|%Y-%m}<br><b>Coût:</b> %{y:.2f} €<br><b>Consommation:</b> %{customdata:.2f} kWh<extra></extra>'
-        ))
-        
-        fig_combined.update_layout(
-            title='Évolution des Coûts de Recharge (Tarifs CREG)',
-            xaxis_title='Date',
-            yaxis_title='Coût (€)',
-            hovermode='closest',
-            height=500,
-            template='plotly_white',
-            showlegend=True,
-            legend=dict(orientation="h", yanchor="bottom", y=1.02, xanchor="right", x=1)
-        )
+    def update_graphs(dataset_key, start_date, end_date, selected_vehicles, render_state):
+        """
+        Met à jour les graphiques et statistiques.
+        Si seul l'intervalle de dates change (même jeu de données, mêmes véhicules, dashboard
+        déjà affiché), les cartes et figures existantes reçoivent des Patch au lieu d'un
+        nouvel arbre de composants.
+        """
+        ctx = callback_context
+        unchanged_cards = [no_update] * len(ctx.outputs_list[1])
+        unchanged_graphs = [no_update] * len(ctx.outputs_list[2])
         
-        # Graphique 2: Jours de la semaine
-        fig_weekly = go.Figure()
-        fig_weekly.add_trace(go.Bar(
-            x=daily_consumption['day_fr'],
-            y=daily_consumption['energyConsumed_kWh'],
-            marker=dict(color=Config.SAGE_GREEN),
-            text=daily_consumption['energyConsumed_kWh'].round(1),
-            textposition='auto'
-        ))
-        fig_weekly.update_layout(
-            title='Consommation par Jour de la Semaine',
-            xaxis_title='Jour',
-            yaxis_title='Consommation Totale (kWh)',
-            height=400,
-            template='plotly_white'
-        )
+        if dataset_key is None or start_date is None or end_date is None or not selected_vehicles:
+            return html.Div(), unchanged_cards, unchanged_graphs, {'rendered': False}
         
-        # Graphique 3: Distribution Durée
-        fig_duration = go.Figure()
-        fig_duration.add_trace(go.Scatter(
-            x=duration_dist['durationHours_rounded'],
-            y=duration_dist['sessions'],
-            mode='lines+markers',
-            line=dict(color=Config.SAGE_GREEN, width=3),
-            marker=dict(size=8, color=Config.SAGE_GREEN),
-            fill='tozeroy',
-            fillcolor='rgba(152, 192, 163, 0.3)',
-            name='Sessions',
-            hovertemplate='<b>Durée:</b> %{x}h<br><b>Nombre de sessions:</b> %{y}<extra></extra>'
-        ))
-        
-        fig_duration.update_layout(
-            title='Distribution du Temps de Recharge',
-            xaxis_title='Durée de recharge (heures)',
-            yaxis_title='Nombre de sessions',
-            height=400,
-            template='plotly_white',
-            showlegend=False
+        # Combinaison déjà rendue (ex: véhicule décoché puis recoché) : aucun calcul pandas
+        cache_key = FigureCache.make_key(dataset_key, start_date, end_date, selected_vehicles)
+        view = FigureCache.get(cache_key)
+        
+        if view is None:
+            df = DatasetCache.get(dataset_key)
+            if df is None:
+                alert = dbc.Alert("Les données ne sont plus en cache, veuillez les recharger", color="warning")
+                return alert, unchanged_cards, unchanged_graphs, {'rendered': False}
+            
+            # 1. Cube d'agrégats (jour, borne) du jeu de données, construit une seule fois
+            cube = RollupCube.for_dataset(dataset_key, df)
+            
+            # 2. Filtrer (période et véhicules) sur le cube, coûts CREG déjà inclus
+            selection = cube.select(start_date, end_date, selected_vehicles)
+            
+            if selection.empty:
+                alert = dbc.Alert("Aucune donnée pour la période et les véhicules sélectionnés", color="warning")
+                view = {'layout': alert, 'stats': None, 'figures': None}
+            else:
+                view = build_dashboard_view(selection)
+            FigureCache.put(cache_key, view)
+        
+        vehicles = sorted(selected_vehicles)
+        incremental = (
+            view['figures'] is not None
+            and render_state
+            and render_state.get('rendered')
+            and render_state.get('dataset_key') == dataset_key
+            and render_state.get('vehicles') == vehicles
+            and len(ctx.outputs_list[1]) > 0
+            and len(ctx.outputs_list[2]) > 0
         )
         
-        # 5. Assembler le layout
-        graphs = html.Div([
-            # Cartes de stats
-            create_stats_cards(
-                stats['total_consumption'],
-                stats['total_cost'],
-                stats['avg_session'],
-                stats['total_sessions']
-            ),
-            # Boutons actions
-            create_pdf_buttons(),
-            # Graphs
-            dbc.Row([
-                dbc.Col([dcc.Graph(figure=fig_combined)], width=12)
-            ], className="mb-4"),
-            dbc.Row([
-                dbc.Col([dcc.Graph(figure=fig_weekly)], width=6),
-                dbc.Col([dcc.Graph(figure=fig_duration)], width=6)
-            ], className="mb-4")
-        ])
-        
-        return graphs
+        if incremental:
+            values, patches = build_dashboard_patches(view)
+            cards = [values[output['id']['index']] for output in ctx.outputs_list[1]]
+            graphs = [patches[output['id']['index']] for output in ctx.outputs_list[2]]
+            return no_update, cards, graphs, no_update
+        
+        render_state = {'dataset_key': dataset_key, 'vehicles': vehicles, 'rendered': view['figures'] is not None}
+        return view['layout'], unchanged_cards, unchanged_graphs, render_state
 
 
     # ========================================================================
@@ -492,12 +586,13 @@ def register_callbacks(app):
          Output('automation-history-table', 'children')],
         [Input('refresh-status-btn', 'n_clicks'),
          Input('automation-refresh-interval', 'n_intervals'),
-         Input('main-tabs', 'active_tab')]
+         Input('main-tabs', 'active_tab')],
+        State('automation-history-cursors', 'data')
     )
-    def update_automation_dashboard(n_clicks, n_intervals, active_tab):
+    def update_automation_dashboard(n_clicks, n_intervals, active_tab, history_cursors):
         """Met à jour le dashboard d'automatisation"""
         from src.database import AutomationDB
-        from src.components import create_automation_history_table, create_status_badge
+        from src.components import create_status_badge
         import calendar
         
         if active_tab != 'tab-automation':
@@ -588,8 +683,7 @@ def register_callbacks(app):
                 html.P("(Planificateur interne)", className="text-muted mb-0", style={'fontSize': '0.85em'})
             ])
         
-        runs = db.get_recent_runs(limit=10)
-        history = create_automation_history_table(runs)
+        history = render_automation_history(db, history_cursors)
         
         return status, next_run_text, config_summary, history
 
@@ -714,21 +808,19 @@ def register_callbacks(app):
 
     @app.callback(
         [Output('manual-trigger-alert', 'children'),
-         Output('automation-history-table', 'children', allow_duplicate=True)],
+         Output('automation-history-table', 'children', allow_duplicate=True),
+         Output('automation-history-cursors', 'data', allow_duplicate=True)],
         Input('manual-trigger-btn', 'n_clicks'),
         prevent_initial_call=True
     )
     def manual_trigger_automation(n_clicks):
-        from src.automation import run_monthly_automation
         from src.utils import get_previous_month_period
-        from src.components import create_automation_history_table
         from src.database import AutomationDB
-        from src.smappee_client import SmappeeClient
-        from src.email_notifier import EmailNotifier
-        import threading
+        from src.prechecks import ConnectivityPrecheck
+        from src.job_queue import AutomationJobQueue
         
         if not n_clicks: 
-            return no_update, no_update
+            return no_update, no_update, no_update
             
         db = AutomationDB()
         
@@ -739,22 +831,14 @@ def register_callbacks(app):
         def get_conf(key, default_val=None):
             return config.get(key) if config and config.get(key) else default_val
 
-        # --- TEST CONNEXION SMAPPEE ---
+        # --- CONFIGURATION SMAPPEE / EMAIL ---
         client_id = get_conf('smappee_client_id', Config.SMAPPEE_CLIENT_ID)
         client_secret = get_conf('smappee_client_secret', Config.SMAPPEE_CLIENT_SECRET)
         
         if not client_id or not client_secret:
             alert = dbc.Alert([html.I(className="fas fa-exclamation-triangle me-2"), "⚠️ Configurer Smappee (ID/Secret) d'abord"], color="warning")
-            return alert, no_update
-            
-        smappee_client = SmappeeClient(client_id, client_secret)
-        smappee_ok, smappee_msg = smappee_client.test_connection()
+            return alert, no_update, no_update
         
-        if not smappee_ok:
-            alert = dbc.Alert([html.I(className="fas fa-plug me-2"), "⚠️ Résoudre les problèmes de connexions smappee d'abord"], color="warning")
-            return alert, no_update
-
-        # --- TEST CONNEXION EMAIL ---
         smtp_server = get_conf('smtp_server', Config.SMTP_SERVER)
         smtp_user = get_conf('smtp_user', Config.SMTP_USER)
         smtp_password = get_conf('smtp_password', Config.SMTP_PASSWORD)
@@ -762,14 +846,21 @@ def register_callbacks(app):
         
         if not all([smtp_server, smtp_user, smtp_password]):
              alert = dbc.Alert([html.I(className="fas fa-envelope me-2"), "Configurer le serveur SMTP d'abord"], color="warning")
-             return alert, no_update
+             return alert, no_update, no_update
 
-        notifier = EmailNotifier(smtp_server, smtp_port, smtp_user, smtp_password)
-        email_ok, email_msg = notifier.test_connection()
+        # --- TEST DES CONNEXIONS (en parallèle, réutilisé par le job qui suit) ---
+        checks = ConnectivityPrecheck.check(
+            smappee=(client_id, client_secret),
+            smtp=(smtp_server, smtp_port, smtp_user, smtp_password)
+        )
         
-        if not email_ok:
+        if not checks['smappee'][0]:
+            alert = dbc.Alert([html.I(className="fas fa-plug me-2"), "⚠️ Résoudre les problèmes de connexions smappee d'abord"], color="warning")
+            return alert, no_update, no_update
+        
+        if not checks['smtp'][0]:
             alert = dbc.Alert([html.I(className="fas fa-wifi me-2"), "Résoudre les problèmes de connexions du mail d'abord"], color="warning")
-            return alert, no_update
+            return alert, no_update, no_update
 
         # --- TOUT EST OK : LANCEMENT ---
         # Logique de date intelligente : 
@@ -781,15 +872,16 @@ def register_callbacks(app):
         else:
             start, end = get_current_month_period()
             
-        thread = threading.Thread(target=run_monthly_automation, args=(start.isoformat(), end.isoformat(), True), daemon=True)
-        thread.start()
+        _, created = AutomationJobQueue.submit(start.isoformat(), end.isoformat(), manual_trigger=True)
         
         # Message de succès temporaire
-        success_alert = dbc.Alert("✅ Connexions OK. Automatisation lancée en arrière-plan...", color="success", duration=4000)
+        if created:
+            success_alert = dbc.Alert("✅ Connexions OK. Automatisation lancée en arrière-plan...", color="success", duration=4000)
+        else:
+            success_alert = dbc.Alert("⏳ Une automatisation est déjà en cours pour cette période", color="info", duration=4000)
         
-        # On rafraichit la table
-        runs = db.get_recent_runs(limit=10)
-        return success_alert, create_automation_history_table(runs)
+        # On rafraichit la table (retour à la première page, où apparaît le nouveau run)
+        return success_alert, render_automation_history(db, [None]), [None]
     
     # Callback pour la modale mensuelle PDF (Verrouillé avec prevent_initial_call=True)
     @app.callback(
@@ -799,18 +891,20 @@ def register_callbacks(app):
          Output('download-monthly-pdf', 'data', allow_duplicate=True)],
         [Input('export-monthly-btn', 'n_clicks'),
          Input('close-monthly-modal', 'n_clicks'),
-         Input('confirm-monthly-pdf-btn', 'n_clicks')],
+         Input('confirm-monthly-pdf-btn', 'n_clicks'),
+         Input('confirm-monthly-batch-btn', 'n_clicks')],
         [State('modal-monthly-start-date', 'date'),
          State('modal-monthly-end-date', 'date'),
          State('start-date', 'date'),
          State('end-date', 'date'),
          State('stored-data', 'data'),
          State('vehicle-selection', 'value'),
-         State('modal-monthly-period', 'is_open')],
+         State('modal-monthly-period', 'is_open'),
+         State('monthly-batch-format', 'value')],
         prevent_initial_call=True
     )
-    def handle_monthly_export(export_clicks, close_clicks, confirm_clicks, modal_start, modal_end, 
-                             main_start, main_end, json_data, selected_vehicles, is_open):
+    def handle_monthly_export(export_clicks, close_clicks, confirm_clicks, batch_clicks, modal_start, modal_end, 
+                             main_start, main_end, dataset_key, selected_vehicles, is_open, batch_format):
         """Gère la modale mensuelle"""
         ctx = callback_context
         if not ctx.triggered: return no_update, no_update, no_update, no_update
@@ -825,13 +919,40 @@ def register_callbacks(app):
             
         elif button_id == 'confirm-monthly-pdf-btn' and confirm_clicks:
             # Génère le PDF
-            if json_data and modal_start and modal_end:
+            df = DatasetCache.get(dataset_key)
+            if df is not None and modal_start and modal_end:
                 # Appelle la génération PDF avec les tarifs CREG par défaut
-                pdf_data = generate_monthly_pdf_data(json_data, modal_start, modal_end, selected_vehicles, region=None)
+                pdf_data = generate_monthly_pdf_data(df, modal_start, modal_end, selected_vehicles, region=None)
+                return False, no_update, no_update, pdf_data
+        
+        elif button_id == 'confirm-monthly-batch-btn' and batch_clicks:
+            # Une note par mois de la période (ZIP ou PDF combiné)
+            df = DatasetCache.get(dataset_key)
+            if df is not None and modal_start and modal_end:
+                pdf_data = generate_monthly_pdfs_batch_data(
+                    df, modal_start, modal_end, selected_vehicles, output=batch_format or 'zip'
+                )
                 return False, no_update, no_update, pdf_data
                 
         return no_update, no_update, no_update, no_update
 
+    # Rapport annuel : période principale si elle couvre 12 mois, sinon 12 mois depuis la date de début
+    @app.callback(
+        Output('download-monthly-pdf', 'data', allow_duplicate=True),
+        Input('export-annual-btn', 'n_clicks'),
+        [State('start-date', 'date'),
+         State('end-date', 'date'),
+         State('stored-data', 'data'),
+         State('vehicle-selection', 'value')],
+        prevent_initial_call=True
+    )
+    def export_annual_report(n_clicks, start_date, end_date, dataset_key, selected_vehicles):
+        """Génère le rapport annuel par mois et par borne"""
+        if not n_clicks:
+            return no_update
+        df = DatasetCache.get(dataset_key)
+        return generate_annual_pdf_data(df, start_date, end_date, selected_vehicles) or no_update
+
     # Callback pour ouvrir la modale de suppression
     @app.callback(
         [Output('delete-run-modal', 'is_open'),
@@ -865,16 +986,72 @@ def register_callbacks(app):
             
         return True, triggered_id['index']
 
+    # Pagination de l'historique (pile de curseurs : suivant = empiler, précédent = dépiler)
+    @app.callback(
+        [Output('automation-history-table', 'children', allow_duplicate=True),
+         Output('automation-history-cursors', 'data')],
+        [Input('history-prev-page-btn', 'n_clicks'),
+         Input('history-next-page-btn', 'n_clicks')],
+        State('automation-history-cursors', 'data'),
+        prevent_initial_call=True
+    )
+    def paginate_automation_history(prev_clicks, next_clicks, history_cursors):
+        ctx = callback_context
+        if not ctx.triggered or not ctx.triggered[0].get('value'):
+            return no_update, no_update
+        
+        cursors = list(history_cursors or [None])
+        db = AutomationDB()
+        
+        if ctx.triggered_id == 'history-next-page-btn':
+            _, next_cursor = db.get_runs_page(limit=Config.AUTOMATION_HISTORY_PAGE_SIZE, cursor=cursors[-1])
+            if next_cursor is None:
+                return no_update, no_update
+            cursors.append(next_cursor)
+        elif len(cursors) > 1:
+            cursors.pop()
+        
+        return render_automation_history(db, cursors), cursors
+
+    # Reprise d'une exécution depuis l'historique
+    @app.callback(
+        [Output('manual-trigger-alert', 'children', allow_duplicate=True),
+         Output('automation-history-table', 'children', allow_duplicate=True)],
+        Input({'type': 'resume-run-btn', 'index': ALL}, 'n_clicks'),
+        State('automation-history-cursors', 'data'),
+        prevent_initial_call=True
+    )
+    def resume_automation_run(n_clicks, history_cursors):
+        from src.job_queue import AutomationJobQueue
+        
+        ctx = callback_context
+        # Ignorer la création des boutons (n_clicks None) lors d'un rafraîchissement de la table
+        if not ctx.triggered or not ctx.triggered[0].get('value'):
+            return no_update, no_update
+        
+        run_id = ctx.triggered_id['index']
+        job, created = AutomationJobQueue.resume(run_id)
+        
+        if job is None:
+            alert = dbc.Alert("Cette exécution est déjà terminée avec succès", color="info", duration=4000)
+        elif created:
+            alert = dbc.Alert("🔁 Reprise lancée en arrière-plan (étapes déjà faites ignorées)...", color="success", duration=4000)
+        else:
+            alert = dbc.Alert("⏳ Une automatisation est déjà en cours pour cette période", color="info", duration=4000)
+        
+        return alert, render_automation_history(AutomationDB(), history_cursors)
+
     # Callback pour confirmer la suppression OU annuler
     @app.callback(
         [Output('automation-history-table', 'children', allow_duplicate=True),
          Output('delete-run-modal', 'is_open', allow_duplicate=True)],
         [Input('confirm-delete-btn', 'n_clicks'),
          Input('cancel-delete-btn', 'n_clicks')],
-        State('run-to-delete-id', 'data'),
+        [State('run-to-delete-id', 'data'),
+         State('automation-history-cursors', 'data')],
         prevent_initial_call=True
     )
-    def process_delete_run(confirm_click, cancel_click, run_id):
+    def process_delete_run(confirm_click, cancel_click, run_id, history_cursors):
         ctx = callback_context
         if not ctx.triggered: return no_update, no_update
         
@@ -883,9 +1060,8 @@ def register_callbacks(app):
         if button_id == 'confirm-delete-btn' and run_id:
             db = AutomationDB()
             db.delete_run(run_id)
-            runs = db.get_recent_runs(limit=10)
             # On retourne la nouvelle table et on ferme la modale
-            return create_automation_history_table(runs), False
+            return render_automation_history(db, history_cursors), False
             
         elif button_id == 'cancel-delete-btn':
             # On ferme juste la modale
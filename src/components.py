@@ -93,7 +93,32 @@ def create_upload_section():
                         ], width=8),
                     ], className="align-items-center mb-2"),
                     
-                    # Zone 4: Status global
+                    # Zone 4: Progression de la récupération Smappee (tâche de fond annulable)
+                    dbc.Row([
+                        dbc.Col([
+                            dbc.Progress(
+                                id='smappee-refresh-progress',
+                                value=0,
+                                max=1,
+                                striped=True,
+                                animated=True,
+                                color="success",
+                                style={'display': 'none'}
+                            ),
+                        ], width=10),
+                        dbc.Col([
+                            dbc.Button(
+                                "Annuler",
+                                id='cancel-smappee-refresh-btn',
+                                color="secondary",
+                                size="sm",
+                                outline=True,
+                                style={'display': 'none'}
+                            ),
+                        ], width=2),
+                    ], className="align-items-center"),
+                    
+                    # Zone 5: Status global
                     html.Div(id='upload-status', className="mt-2")
                 ])
             ], className="mb-4")
@@ -245,43 +270,41 @@ def create_parameters_section():
 # CARTES DE STATISTIQUES
 # ============================================================================
 
+STATS_CARD_KEYS = ['consumption', 'cost', 'avg_session', 'sessions']
+
+
+def format_stats_card_values(total_consumption, total_cost, avg_session, total_sessions):
+    """Textes affichés dans les cartes de statistiques, indexés par STATS_CARD_KEYS"""
+    return {
+        'consumption': f"{total_consumption:.2f} kWh",
+        'cost': f"{total_cost:.2f} €",
+        'avg_session': f"{avg_session:.2f} kWh",
+        'sessions': f"{total_sessions}",
+    }
+
+
 def create_stats_cards(total_consumption, total_cost, avg_session, total_sessions):
-    """Crée les cartes de statistiques"""
+    """Crée les cartes de statistiques (valeurs patchables via leur id pattern-matching)"""
     sage_green = Config.SAGE_GREEN
+    values = format_stats_card_values(total_consumption, total_cost, avg_session, total_sessions)
+    labels = {
+        'consumption': "Consommation Totale",
+        'cost': "Coût Total (CREG)",
+        'avg_session': "Moyenne par Session",
+        'sessions': "Sessions Totales",
+    }
     
     return dbc.Row([
         dbc.Col([
             dbc.Card([
                 dbc.CardBody([
-                    html.H4(f"{total_consumption:.2f} kWh", style={'color': sage_green}),
-                    html.P("Consommation Totale", className="text-muted")
-                ])
-            ])
-        ], width=3),
-        dbc.Col([
-            dbc.Card([
-                dbc.CardBody([
-                    html.H4(f"{total_cost:.2f} €", style={'color': sage_green}),
-                    html.P("Coût Total (CREG)", className="text-muted")
-                ])
-            ])
-        ], width=3),
-        dbc.Col([
-            dbc.Card([
-                dbc.CardBody([
-                    html.H4(f"{avg_session:.2f} kWh", style={'color': sage_green}),
-                    html.P("Moyenne par Session", className="text-muted")
-                ])
-            ])
-        ], width=3),
-        dbc.Col([
-            dbc.Card([
-                dbc.CardBody([
-                    html.H4(f"{total_sessions}", style={'color': sage_green}),
-                    html.P("Sessions Totales", className="text-muted")
+                    html.H4(values[key], id={'type': 'stats-card-value', 'index': key},
+                            style={'color': sage_green}),
+                    html.P(labels[key], className="text-muted")
                 ])
             ])
         ], width=3)
+        for key in STATS_CARD_KEYS
     ], className="mb-4")
 
 
@@ -290,14 +313,21 @@ def create_stats_cards(total_consumption, total_cost, avg_session, total_session
 # ============================================================================
 
 def create_pdf_buttons():
-    """Crée le bouton d'export PDF"""
+    """Crée les boutons d'export PDF (note mensuelle, rapport annuel)"""
     return dbc.Row([
         dbc.Col([
             dbc.Button(
                 [html.I(className="fas fa-file-pdf me-2"), "Générer Note de Frais Mensuelle"],
                 id='export-monthly-btn',
                 size='lg',
-                className='mb-3 sage-button'
+                className='mb-3 me-3 sage-button'
+            ),
+            dbc.Button(
+                [html.I(className="fas fa-file-pdf me-2"), "Générer Rapport Annuel"],
+                id='export-annual-btn',
+                size='lg',
+                className='mb-3 sage-button',
+                title="12 mois à partir de la date de début sélectionnée"
             )
         ], className="text-center")
     ])
@@ -385,6 +415,29 @@ def create_monthly_modal():
                         style={'width': '100%'}
                     ),
                 ], width=4)
+            ]),
+            html.Hr(),
+            dbc.Row([
+                dbc.Col([
+                    html.Label("Période de plusieurs mois :", style={'fontWeight': 'bold'}),
+                    dbc.Select(
+                        id='monthly-batch-format',
+                        options=[
+                            {'label': 'Archive ZIP (un PDF par mois)', 'value': 'zip'},
+                            {'label': 'PDF unique (une section par mois)', 'value': 'pdf'}
+                        ],
+                        value='zip'
+                    )
+                ], width=8),
+                dbc.Col([
+                    html.Label(" ", style={'display': 'block', 'visibility': 'hidden'}),
+                    dbc.Button(
+                        "Générer mois par mois",
+                        id='confirm-monthly-batch-btn',
+                        className='sage-button',
+                        style={'width': '100%'}
+                    )
+                ], width=4)
             ])
         ]),
         dbc.ModalFooter([
@@ -539,16 +592,18 @@ def create_automation_dashboard():
             html.H5("📋 Historique des Exécutions", style={'color': Config.SAGE_GREEN}),
             html.Div(id='automation-history-table'),
             
-            # Modale de suppression et Store caché
+            # Modale de suppression et Stores cachés
             create_delete_confirmation_modal(),
-            dcc.Store(id='run-to-delete-id')
+            dcc.Store(id='run-to-delete-id'),
+            # Pile des curseurs des pages d'historique visitées (None = première page)
+            dcc.Store(id='automation-history-cursors', data=[None])
         ])
     ], className="mb-4")
 
 
-def create_automation_history_table(runs):
-    """Crée le tableau d'historique des automatisations avec suppression"""
-    if not runs:
+def create_automation_history_table(runs, page=1, has_next=False):
+    """Crée le tableau d'historique des automatisations avec suppression et pagination"""
+    if not runs and page == 1:
         return dbc.Alert("Aucune exécution enregistrée", style={"backgroundColor": "rgba(152, 192, 163, 0.2)", "borderColor": Config.SAGE_GREEN, "color": "#2c3e50"})
     
     table_header = [
@@ -558,7 +613,7 @@ def create_automation_history_table(runs):
             html.Th("Étape", style={'backgroundColor': Config.DARK_GREY, 'color': 'white'}),
             html.Th("Statut", style={'backgroundColor': Config.DARK_GREY, 'color': 'white'}),
             html.Th("Message", style={'backgroundColor': Config.DARK_GREY, 'color': 'white'}),
-            html.Th("", style={'backgroundColor': Config.DARK_GREY, 'color': 'white', 'width': '50px'}) # Colonne suppression
+            html.Th("", style={'backgroundColor': Config.DARK_GREY, 'color': 'white', 'width': '80px'}) # Colonnes reprise / suppression
         ]))
     ]
     
@@ -581,6 +636,19 @@ def create_automation_history_table(runs):
             className="border-0 bg-transparent",
             title="Supprimer cette ligne"
         )
+        
+        # Bouton reprise (exécutions non abouties) : repart de la première étape non terminée
+        actions = [delete_btn]
+        if run['status'] not in ('success', 'pending'):
+            actions.insert(0, dbc.Button(
+                html.I(className="fas fa-redo"),
+                id={'type': 'resume-run-btn', 'index': run['id']},
+                color="secondary",
+                outline=True,
+                size="sm",
+                className="border-0 bg-transparent",
+                title="Reprendre cette exécution"
+            ))
 
         rows.append(html.Tr([
             html.Td(run_date),
@@ -588,12 +656,29 @@ def create_automation_history_table(runs):
             html.Td(run['step']),
             html.Td(status_badge),
             html.Td(run['message'], style={'fontSize': '0.85em'}),
-            html.Td(delete_btn, style={'textAlign': 'center'})
+            html.Td(actions, style={'textAlign': 'center', 'whiteSpace': 'nowrap'})
         ]))
     
     table_body = [html.Tbody(rows)]
     
-    return dbc.Table(table_header + table_body, bordered=True, hover=True, responsive=True, striped=True)
+    pagination = dbc.Row([
+        dbc.Col([
+            dbc.Button("← Plus récents", id='history-prev-page-btn', size="sm", outline=True,
+                       color="secondary", disabled=page <= 1)
+        ], width="auto"),
+        dbc.Col([
+            html.Span(f"Page {page}", className="text-muted", style={'fontSize': '0.9em'})
+        ], width="auto"),
+        dbc.Col([
+            dbc.Button("Plus anciens →", id='history-next-page-btn', size="sm", outline=True,
+                       color="secondary", disabled=not has_next)
+        ], width="auto"),
+    ], className="justify-content-center align-items-center g-2")
+    
+    return html.Div([
+        dbc.Table(table_header + table_body, bordered=True, hover=True, responsive=True, striped=True),
+        pagination
+    ])
 
 
 def create_status_badge(status):
@@ -754,6 +839,8 @@ def create_stores():
     """Crée les composants de stockage de données"""
     return [
         dcc.Store(id='stored-data'),
+        dcc.Store(id='smappee-refresh-result'),
+        dcc.Store(id='graphs-render-state'),
         dcc.Store(id='default-dates', data={'min': None, 'max': None}),
     ]
 
@@ -1,10 +1,112 @@
 """
 Gestion de la base de données pour le tracking des automatisations
 """
+import base64
+import io
+import json
 import sqlite3
 import os
-from datetime import datetime
+import threading
+from datetime import datetime, timedelta
+
+import pandas as pd
+import pyarrow.feather as feather
+
 from config import Config
+from src.utils import normalize_session_dtypes
+
+
+# Points de reprise d'une exécution : données récupérées (fichier Arrow), statut de l'email
+RUN_CHECKPOINT_COLUMNS = {
+    'data_path': 'TEXT',
+    'email_status': 'TEXT',
+}
+
+# Bail d'une demande d'automatisation en cours : processus propriétaire et dernier battement de cœur
+JOB_LEASE_COLUMNS = {
+    'owner_pid': 'INTEGER',
+    'heartbeat_at': 'TIMESTAMP',
+}
+
+
+def encode_run_cursor(created_at, run_id):
+    """Jeton opaque de pagination (clé de tri created_at, id du dernier run d'une page)"""
+    raw = json.dumps([created_at, run_id]).encode('utf-8')
+    return base64.urlsafe_b64encode(raw).decode('ascii')
+
+
+def decode_run_cursor(token):
+    """
+    Décode un jeton produit par encode_run_cursor.
+    
+    Raises:
+        ValueError si le jeton est invalide
+    """
+    try:
+        created_at, run_id = json.loads(base64.urlsafe_b64decode(token.encode('ascii')))
+    except (TypeError, ValueError, UnicodeError) as exc:
+        raise ValueError(f"Curseur de pagination invalide: {token!r}") from exc
+    if not isinstance(run_id, int):
+        raise ValueError(f"Curseur de pagination invalide: {token!r}")
+    return created_at, run_id
+
+
+class _SQLiteConnectionManager:
+    """
+    Une connexion SQLite longue durée par thread (et par processus) pour un fichier donné,
+    en mode WAL : lecteurs et écrivain (scheduler, automatisations, callbacks Dash)
+    ne se bloquent plus mutuellement.
+    """
+    
+    _managers = {}
+    _lock = threading.Lock()
+    
+    PRAGMAS = (
+        'PRAGMA journal_mode=WAL',
+        'PRAGMA synchronous=NORMAL',
+        'PRAGMA temp_store=MEMORY',
+        'PRAGMA cache_size=-8000',
+    )
+    
+    def __init__(self, db_path):
+        self.db_path = db_path
+        self._local = threading.local()
+        self._schema_pid = None
+    
+    @classmethod
+    def for_path(cls, db_path):
+        with cls._lock:
+            manager = cls._managers.get(db_path)
+            if manager is None:
+                manager = cls(db_path)
+                cls._managers[db_path] = manager
+            return manager
+    
+    def connection(self):
+        """Connexion du thread courant (recréée après un fork)"""
+        conn = getattr(self._local, 'conn', None)
+        if conn is None or self._local.pid != os.getpid():
+            conn = sqlite3.connect(
+                self.db_path,
+                timeout=Config.SQLITE_BUSY_TIMEOUT_MS / 1000,
+                cached_statements=Config.SQLITE_CACHED_STATEMENTS
+            )
+            conn.row_factory = sqlite3.Row
+            conn.execute(f'PRAGMA busy_timeout={int(Config.SQLITE_BUSY_TIMEOUT_MS)}')
+            for pragma in self.PRAGMAS:
+                conn.execute(pragma)
+            self._local.conn = conn
+            self._local.pid = os.getpid()
+        return conn
+    
+    def ensure_schema(self, init_schema):
+        """Exécute init_schema une seule fois par processus"""
+        if self._schema_pid == os.getpid():
+            return
+        with self._lock:
+            if self._schema_pid != os.getpid():
+                init_schema()
+                self._schema_pid = os.getpid()
 
 
 class AutomationDB:
@@ -12,12 +114,20 @@ class AutomationDB:
     
     def __init__(self):
         self.db_path = os.path.join(Config.DATA_DIR, 'automations.db')
-        self.init_database()
+        self._manager = _SQLiteConnectionManager.for_path(self.db_path)
+        self._manager.ensure_schema(self.init_database)
+    
+    def _connect(self):
+        """
+        Connexion réutilisable du thread courant ; utilisée comme context manager
+        (`with self._connect() as conn:`) elle valide ou annule la transaction sans se fermer.
+        """
+        return self._manager.connection()
     
     def init_database(self):
         """Initialise les tables de la base de données"""
         Config.ensure_data_dir()
-        conn = sqlite3.connect(self.db_path)
+        conn = self._connect()
         cursor = conn.cursor()
         
         # Table des exécutions d'automatisation
@@ -36,8 +146,17 @@ class AutomationDB:
         )
         ''')
         
+        # Points de reprise par étape (colonnes ajoutées après coup sur les bases existantes)
+        existing_columns = {row['name'] for row in cursor.execute('PRAGMA table_info(automation_runs)')}
+        for column, column_type in RUN_CHECKPOINT_COLUMNS.items():
+            if column not in existing_columns:
+                cursor.execute(f'ALTER TABLE automation_runs ADD COLUMN {column} {column_type}')
+        
+        # Historique trié/paginé par date de création (avec ou sans filtre de statut)
+        cursor.execute('CREATE INDEX IF NOT EXISTS idx_runs_created_at ON automation_runs(created_at)')
+        cursor.execute('CREATE INDEX IF NOT EXISTS idx_runs_status_created_at ON automation_runs(status, created_at)')
+        
         # Table de configuration (Key-Value store)
-        # Utilisé aussi pour stocker le cache API (key='latest_api_cache')
         cursor.execute('''
         CREATE TABLE IF NOT EXISTS automation_config (
             key TEXT PRIMARY KEY,
@@ -46,142 +165,514 @@ class AutomationDB:
         )
         ''')
         
-        conn.commit()
-        conn.close()
-    
-    def create_run(self, period_start, period_end):
-        """Crée une nouvelle exécution d'automatisation"""
-        conn = sqlite3.connect(self.db_path)
-        cursor = conn.cursor()
+        # Sessions de recharge normalisées (synchronisation incrémentale Smappee)
+        cursor.execute('''
+        CREATE TABLE IF NOT EXISTS charging_sessions (
+            location_id TEXT NOT NULL,
+            start_time TIMESTAMP NOT NULL,
+            station TEXT NOT NULL,
+            end_time TIMESTAMP,
+            duration_minutes REAL,
+            energy_kwh REAL,
+            synced_at TIMESTAMP,
+            PRIMARY KEY (location_id, start_time, station)
+        )
+        ''')
+        cursor.execute('CREATE INDEX IF NOT EXISTS idx_sessions_start_time ON charging_sessions(start_time)')
+        cursor.execute('CREATE INDEX IF NOT EXISTS idx_sessions_station ON charging_sessions(station, start_time)')
+        
+        # Manifeste du cache API columnar (fichier Arrow IPC sous DATA_DIR)
+        cursor.execute('''
+        CREATE TABLE IF NOT EXISTS api_cache_manifest (
+            name TEXT PRIMARY KEY,
+            path TEXT,
+            range_start TIMESTAMP,
+            range_end TIMESTAMP,
+            row_count INTEGER,
+            updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+        )
+        ''')
+        
+        # File persistante des demandes d'automatisation (exécutées par AutomationJobQueue)
+        cursor.execute('''
+        CREATE TABLE IF NOT EXISTS automation_jobs (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            idempotency_key TEXT NOT NULL,
+            period_start DATE,
+            period_end DATE,
+            manual_trigger INTEGER DEFAULT 0,
+            status TEXT,
+            run_id INTEGER,
+            message TEXT,
+            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            started_at TIMESTAMP,
+            finished_at TIMESTAMP
+        )
+        ''')
+        existing_columns = {row['name'] for row in cursor.execute('PRAGMA table_info(automation_jobs)')}
+        for column, column_type in JOB_LEASE_COLUMNS.items():
+            if column not in existing_columns:
+                cursor.execute(f'ALTER TABLE automation_jobs ADD COLUMN {column} {column_type}')
+        # Une seule demande active (en attente ou en cours) par période
+        cursor.execute('''
+        CREATE UNIQUE INDEX IF NOT EXISTS idx_jobs_active_key ON automation_jobs(idempotency_key)
+        WHERE status IN ('queued', 'running')
+        ''')
         
+        # File d'envoi des emails (envoyés en arrière-plan par MailOutbox)
         cursor.execute('''
-        INSERT INTO automation_runs (run_date, period_start, period_end, status, step, message)
-        VALUES (?, ?, ?, ?, ?, ?)
-        ''', (datetime.now(), period_start, period_end, 'pending', 'initialized', 'Automatisation initialisée'))
+        CREATE TABLE IF NOT EXISTS mail_outbox (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            run_id INTEGER,
+            to_email TEXT NOT NULL,
+            subject TEXT,
+            body TEXT,
+            attachment_path TEXT,
+            status TEXT DEFAULT 'pending',
+            attempts INTEGER DEFAULT 0,
+            next_attempt_at TIMESTAMP,
+            claimed_at TIMESTAMP,
+            last_error TEXT,
+            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            sent_at TIMESTAMP
+        )
+        ''')
+        existing_columns = {row['name'] for row in cursor.execute('PRAGMA table_info(mail_outbox)')}
+        if 'claimed_at' not in existing_columns:
+            cursor.execute('ALTER TABLE mail_outbox ADD COLUMN claimed_at TIMESTAMP')
+        cursor.execute('CREATE INDEX IF NOT EXISTS idx_outbox_due ON mail_outbox(status, next_attempt_at)')
         
-        run_id = cursor.lastrowid
         conn.commit()
-        conn.close()
+    
+    def create_run(self, period_start, period_end):
+        """Crée une nouvelle exécution d'automatisation"""
+        with self._connect() as conn:
+            cursor = conn.execute('''
+            INSERT INTO automation_runs (run_date, period_start, period_end, status, step, message)
+            VALUES (?, ?, ?, ?, ?, ?)
+            ''', (datetime.now(), period_start, period_end, 'pending', 'initialized', 'Automatisation initialisée'))
         
-        return run_id
+        return cursor.lastrowid
     
     def update_run(self, run_id, step, status, message='', pdf_path=None):
         """Met à jour une exécution d'automatisation"""
-        conn = sqlite3.connect(self.db_path)
-        cursor = conn.cursor()
-        
-        if pdf_path:
-            cursor.execute('''
-            UPDATE automation_runs 
-            SET step = ?, status = ?, message = ?, pdf_path = ?, updated_at = ?
-            WHERE id = ?
-            ''', (step, status, message, pdf_path, datetime.now(), run_id))
-        else:
-            cursor.execute('''
-            UPDATE automation_runs 
-            SET step = ?, status = ?, message = ?, updated_at = ?
-            WHERE id = ?
-            ''', (step, status, message, datetime.now(), run_id))
+        with self._connect() as conn:
+            if pdf_path:
+                conn.execute('''
+                UPDATE automation_runs 
+                SET step = ?, status = ?, message = ?, pdf_path = ?, updated_at = ?
+                WHERE id = ?
+                ''', (step, status, message, pdf_path, datetime.now(), run_id))
+            else:
+                conn.execute('''
+                UPDATE automation_runs 
+                SET step = ?, status = ?, message = ?, updated_at = ?
+                WHERE id = ?
+                ''', (step, status, message, datetime.now(), run_id))
+    
+    def update_run_checkpoint(self, run_id, **checkpoints):
+        """Enregistre un ou plusieurs points de reprise (data_path, pdf_path, email_status)"""
+        allowed = set(RUN_CHECKPOINT_COLUMNS) | {'pdf_path'}
+        unknown = set(checkpoints) - allowed
+        if unknown:
+            raise ValueError(f"Points de reprise inconnus: {sorted(unknown)}")
+        if not checkpoints:
+            return
         
-        conn.commit()
-        conn.close()
+        assignments = ', '.join(f'{column} = ?' for column in checkpoints)
+        with self._connect() as conn:
+            conn.execute(
+                f'UPDATE automation_runs SET {assignments}, updated_at = ? WHERE id = ?',
+                (*checkpoints.values(), datetime.now(), run_id)
+            )
+    
+    def get_run(self, run_id):
+        """Récupère une exécution par son identifiant (clé primaire)"""
+        row = self._connect().execute('SELECT * FROM automation_runs WHERE id = ?', (run_id,)).fetchone()
+        return dict(row) if row else None
     
     def get_latest_run(self):
         """Récupère la dernière exécution"""
-        conn = sqlite3.connect(self.db_path)
-        conn.row_factory = sqlite3.Row
-        cursor = conn.cursor()
-        
-        cursor.execute('''
-        SELECT * FROM automation_runs 
-        ORDER BY created_at DESC 
-        LIMIT 1
-        ''')
-        
-        row = cursor.fetchone()
-        conn.close()
-        
-        return dict(row) if row else None
+        runs, _ = self.get_runs_page(limit=1)
+        return runs[0] if runs else None
     
     def get_recent_runs(self, limit=10):
         """Récupère les dernières exécutions"""
-        conn = sqlite3.connect(self.db_path)
-        conn.row_factory = sqlite3.Row
-        cursor = conn.cursor()
+        runs, _ = self.get_runs_page(limit=limit)
+        return runs
+    
+    def get_runs_page(self, limit=10, cursor=None, status=None):
+        """
+        Page de l'historique, du plus récent au plus ancien (pagination par clé, via les index
+        sur created_at et (status, created_at)).
         
-        cursor.execute('''
-        SELECT * FROM automation_runs 
-        ORDER BY created_at DESC 
-        LIMIT ?
-        ''', (limit,))
+        Args:
+            limit: Nombre de runs par page
+            cursor: Jeton renvoyé pour la page précédente (None = première page)
+            status: Filtre optionnel sur le statut
         
-        rows = cursor.fetchall()
-        conn.close()
+        Returns:
+            tuple (runs, jeton de la page suivante ou None)
         
-        return [dict(row) for row in rows]
+        Raises:
+            ValueError si le curseur est invalide
+        """
+        query = 'SELECT * FROM automation_runs'
+        conditions = []
+        params = []
+        if status:
+            conditions.append('status = ?')
+            params.append(status)
+        if cursor:
+            created_at, run_id = decode_run_cursor(cursor)
+            conditions.append('(created_at < ? OR (created_at = ? AND id < ?))')
+            params.extend([created_at, created_at, run_id])
+        if conditions:
+            query += ' WHERE ' + ' AND '.join(conditions)
+        query += ' ORDER BY created_at DESC, id DESC LIMIT ?'
+        # Une ligne de plus pour savoir s'il existe une page suivante
+        params.append(limit + 1)
+        
+        runs = [dict(row) for row in self._connect().execute(query, params).fetchall()]
+        next_cursor = None
+        if len(runs) > limit:
+            runs = runs[:limit]
+            next_cursor = encode_run_cursor(runs[-1]['created_at'], runs[-1]['id'])
+        return runs, next_cursor
     
     def delete_run(self, run_id):
         """Supprime une exécution spécifique de la base de données"""
-        conn = sqlite3.connect(self.db_path)
-        cursor = conn.cursor()
-        
-        cursor.execute('DELETE FROM automation_runs WHERE id = ?', (run_id,))
-        
-        conn.commit()
-        conn.close()
+        with self._connect() as conn:
+            conn.execute('DELETE FROM automation_runs WHERE id = ?', (run_id,))
     
     def save_config(self, key, value):
         """Sauvegarde une valeur de configuration"""
-        conn = sqlite3.connect(self.db_path)
-        cursor = conn.cursor()
-        
-        cursor.execute('''
-        INSERT OR REPLACE INTO automation_config (key, value, updated_at)
-        VALUES (?, ?, ?)
-        ''', (key, value, datetime.now()))
-        
-        conn.commit()
-        conn.close()
+        with self._connect() as conn:
+            conn.execute('''
+            INSERT OR REPLACE INTO automation_config (key, value, updated_at)
+            VALUES (?, ?, ?)
+            ''', (key, value, datetime.now()))
     
     def get_config(self, key=None):
         """Récupère la configuration"""
-        conn = sqlite3.connect(self.db_path)
-        conn.row_factory = sqlite3.Row
-        cursor = conn.cursor()
+        conn = self._connect()
         
         if key:
-            cursor.execute('SELECT value FROM automation_config WHERE key = ?', (key,))
-            row = cursor.fetchone()
-            conn.close()
+            row = conn.execute('SELECT value FROM automation_config WHERE key = ?', (key,)).fetchone()
             return row['value'] if row else None
         else:
-            cursor.execute('SELECT key, value FROM automation_config')
-            rows = cursor.fetchall()
-            conn.close()
+            rows = conn.execute('SELECT key, value FROM automation_config').fetchall()
             return {row['key']: row['value'] for row in rows}
     
-    def save_api_cache(self, json_data):
-        """Sauvegarde le JSON des données API dans la DB pour préchargement"""
-        self.save_config('latest_api_cache', json_data)
+    def save_api_cache(self, df):
+        """
+        Sauvegarde les sessions API dans un fichier Arrow IPC typé (préchargement du dashboard)
+        et enregistre sa plage de dates et son nombre de lignes dans le manifeste.
+        """
+        Config.ensure_data_dir()
+        df = normalize_session_dtypes(df)
+        path = Config.API_CACHE_FILE
+        
+        # Écriture atomique : non compressé pour permettre le memory-mapping à la lecture
+        tmp_path = f"{path}.tmp"
+        feather.write_feather(df, tmp_path, compression='uncompressed')
+        os.replace(tmp_path, path)
+        
+        range_start = df['startTime'].min() if 'startTime' in df.columns and len(df) else None
+        range_end = df['endTime'].max() if 'endTime' in df.columns and len(df) else None
+        
+        with self._connect() as conn:
+            conn.execute('''
+            INSERT OR REPLACE INTO api_cache_manifest (name, path, range_start, range_end, row_count, updated_at)
+            VALUES (?, ?, ?, ?, ?, ?)
+            ''', ('latest', path,
+                  range_start.isoformat() if range_start is not None else None,
+                  range_end.isoformat() if range_end is not None else None,
+                  len(df), datetime.now()))
+            # L'ancien cache JSON (clé-valeur) est obsolète
+            conn.execute("DELETE FROM automation_config WHERE key = 'latest_api_cache'")
+    
+    def get_api_cache_manifest(self):
+        """Récupère la ligne de manifeste du cache API (plage, nombre de lignes)"""
+        row = self._connect().execute("SELECT * FROM api_cache_manifest WHERE name = 'latest'").fetchone()
+        return dict(row) if row else None
         
     def get_api_cache(self):
-        """Récupère le JSON des données API depuis la DB"""
-        return self.get_config('latest_api_cache')
+        """Récupère les sessions API en cache (DataFrame typé) ou None"""
+        manifest = self.get_api_cache_manifest()
+        if manifest and manifest.get('path') and os.path.exists(manifest['path']):
+            table = feather.read_table(manifest['path'], memory_map=True)
+            return table.to_pandas()
+        
+        # Migration : ancien cache stocké en JSON dans automation_config
+        legacy_json = self.get_config('latest_api_cache')
+        if legacy_json:
+            df = normalize_session_dtypes(pd.read_json(io.StringIO(legacy_json)))
+            self.save_api_cache(df)
+            return df
+        return None
+
+    def upsert_sessions(self, location_id, df):
+        """
+        Insère ou met à jour des sessions (clé: location, startTime, borne).
+        
+        Returns:
+            Nombre de nouvelles sessions insérées
+        """
+        if df is None or df.empty:
+            return 0
+        
+        start_times = pd.to_datetime(df['startTime']).dt.strftime('%Y-%m-%d %H:%M:%S')
+        end_times = pd.to_datetime(df['endTime']).dt.strftime('%Y-%m-%d %H:%M:%S')
+        synced_at = datetime.now()
+        rows = [
+            (str(location_id), start, str(station), end, float(duration), float(energy), synced_at)
+            for start, station, end, duration, energy in zip(
+                start_times, df['rfid'].astype(str), end_times,
+                df['durationMinutes'].fillna(0), df['energyConsumed_kWh'].fillna(0)
+            )
+        ]
+        
+        with self._connect() as conn:
+            count_before = conn.execute(
+                'SELECT COUNT(*) FROM charging_sessions WHERE location_id = ?', (str(location_id),)
+            ).fetchone()[0]
+            
+            conn.executemany('''
+            INSERT INTO charging_sessions
+                (location_id, start_time, station, end_time, duration_minutes, energy_kwh, synced_at)
+            VALUES (?, ?, ?, ?, ?, ?, ?)
+            ON CONFLICT(location_id, start_time, station) DO UPDATE SET
+                end_time = excluded.end_time,
+                duration_minutes = excluded.duration_minutes,
+                energy_kwh = excluded.energy_kwh,
+                synced_at = excluded.synced_at
+            ''', rows)
+            
+            count_after = conn.execute(
+                'SELECT COUNT(*) FROM charging_sessions WHERE location_id = ?', (str(location_id),)
+            ).fetchone()[0]
+        
+        return count_after - count_before
+    
+    def get_last_session_start(self, location_id):
+        """Récupère le début de la session la plus récente stockée pour une location"""
+        row = self._connect().execute(
+            'SELECT MAX(start_time) FROM charging_sessions WHERE location_id = ?',
+            (str(location_id),)
+        ).fetchone()
+        
+        return pd.to_datetime(row[0]) if row and row[0] else None
+    
+    def get_sessions(self, location_id, start=None, end=None):
+        """
+        Récupère les sessions stockées sous forme de DataFrame normalisé
+        (mêmes colonnes que SmappeeClient.convert_to_dataframe pour le dashboard).
+        """
+        query = '''
+        SELECT station, start_time, end_time, duration_minutes, energy_kwh
+        FROM charging_sessions
+        WHERE location_id = ?
+        '''
+        params = [str(location_id)]
+        if start is not None:
+            query += ' AND start_time >= ?'
+            params.append(pd.to_datetime(start).strftime('%Y-%m-%d %H:%M:%S'))
+        if end is not None:
+            query += ' AND start_time <= ?'
+            params.append(pd.to_datetime(end).strftime('%Y-%m-%d %H:%M:%S'))
+        query += ' ORDER BY start_time'
+        
+        raw = pd.read_sql_query(query, self._connect(), params=params)
+        
+        return pd.DataFrame({
+            'Nom de la borne de recharge': raw['station'].astype(str),
+            'startTime': pd.to_datetime(raw['start_time']),
+            'endTime': pd.to_datetime(raw['end_time']),
+            'durationMinutes': raw['duration_minutes'].astype('float64'),
+            'energyConsumed_kWh': raw['energy_kwh'].astype('float64'),
+            'rfid': raw['station'].astype(str),
+        })
+
+    def enqueue_job(self, idempotency_key, period_start, period_end, manual_trigger=False, run_id=None):
+        """
+        Ajoute une demande d'automatisation à la file, sauf si une demande active
+        (en attente ou en cours) existe déjà pour la même clé.
+        run_id désigne l'exécution existante à reprendre (None = nouvelle exécution).
+        
+        Returns:
+            tuple (job, created) : la demande créée ou celle déjà active
+        """
+        try:
+            with self._connect() as conn:
+                cursor = conn.execute('''
+                INSERT INTO automation_jobs (idempotency_key, period_start, period_end, manual_trigger, status, run_id)
+                VALUES (?, ?, ?, ?, 'queued', ?)
+                ''', (idempotency_key, period_start, period_end, int(bool(manual_trigger)), run_id))
+            return self.get_job(cursor.lastrowid), True
+        except sqlite3.IntegrityError:
+            row = self._connect().execute('''
+            SELECT * FROM automation_jobs
+            WHERE idempotency_key = ? AND status IN ('queued', 'running')
+            ''', (idempotency_key,)).fetchone()
+            if row is None:
+                # La demande active vient de se terminer : nouvelle tentative
+                return self.enqueue_job(idempotency_key, period_start, period_end, manual_trigger, run_id)
+            return dict(row), False
+    
+    def get_job(self, job_id):
+        """Récupère une demande d'automatisation par son identifiant"""
+        row = self._connect().execute('SELECT * FROM automation_jobs WHERE id = ?', (job_id,)).fetchone()
+        return dict(row) if row else None
+    
+    def claim_job(self, job_id):
+        """
+        Passe une demande de 'queued' à 'running' et en prend le bail pour ce processus ;
+        False si elle n'est plus en attente
+        """
+        now = datetime.now()
+        with self._connect() as conn:
+            cursor = conn.execute('''
+            UPDATE automation_jobs SET status = 'running', started_at = ?, owner_pid = ?, heartbeat_at = ?
+            WHERE id = ? AND status = 'queued'
+            ''', (now, os.getpid(), now, job_id))
+        return cursor.rowcount == 1
+    
+    def heartbeat_job(self, job_id):
+        """Prolonge le bail d'une demande en cours d'exécution par ce processus"""
+        with self._connect() as conn:
+            conn.execute('''
+            UPDATE automation_jobs SET heartbeat_at = ?
+            WHERE id = ? AND status = 'running' AND owner_pid = ?
+            ''', (datetime.now(), job_id, os.getpid()))
+    
+    def finish_job(self, job_id, status, run_id=None, message=''):
+        """Clôture une demande (status: 'done' ou 'failed')"""
+        with self._connect() as conn:
+            conn.execute('''
+            UPDATE automation_jobs SET status = ?, run_id = ?, message = ?, finished_at = ?
+            WHERE id = ?
+            ''', (status, run_id, message, datetime.now(), job_id))
+    
+    def requeue_interrupted_jobs(self, lease_seconds=None):
+        """
+        Remet en attente les demandes 'running' dont le bail a expiré (processus arrêté en cours
+        d'exécution) ; celles exécutées par un autre processus encore actif sont laissées en cours.
+        
+        Args:
+            lease_seconds: délai sans battement de cœur (défaut: Config.AUTOMATION_JOB_LEASE_SECONDS)
+        
+        Returns:
+            Liste des identifiants des demandes en attente, dans l'ordre d'arrivée
+        """
+        lease_seconds = Config.AUTOMATION_JOB_LEASE_SECONDS if lease_seconds is None else lease_seconds
+        expired_before = datetime.now() - timedelta(seconds=lease_seconds)
+        with self._connect() as conn:
+            conn.execute('''
+            UPDATE automation_jobs SET status = 'queued', started_at = NULL, owner_pid = NULL, heartbeat_at = NULL
+            WHERE status = 'running' AND (heartbeat_at IS NULL OR heartbeat_at < ?)
+            ''', (expired_before,))
+            rows = conn.execute("SELECT id FROM automation_jobs WHERE status = 'queued' ORDER BY id").fetchall()
+        return [row['id'] for row in rows]
+
+    def enqueue_mail(self, to_email, subject, body, attachment_path=None, run_id=None):
+        """Ajoute un email à la file d'envoi (envoi immédiat possible) ; retourne son identifiant"""
+        with self._connect() as conn:
+            cursor = conn.execute('''
+            INSERT INTO mail_outbox (run_id, to_email, subject, body, attachment_path, status, next_attempt_at)
+            VALUES (?, ?, ?, ?, ?, 'pending', ?)
+            ''', (run_id, to_email, subject, body, attachment_path, datetime.now()))
+        return cursor.lastrowid
+    
+    def get_mail(self, mail_id):
+        """Récupère un email de la file par son identifiant"""
+        row = self._connect().execute('SELECT * FROM mail_outbox WHERE id = ?', (mail_id,)).fetchone()
+        return dict(row) if row else None
+    
+    def claim_due_mails(self, limit=10):
+        """
+        Passe de 'pending' à 'sending' les emails dont la prochaine tentative est échue.
+        
+        Returns:
+            Liste des emails réservés (les autres processus ne peuvent plus les prendre)
+        """
+        rows = self._connect().execute('''
+        SELECT id FROM mail_outbox
+        WHERE status = 'pending' AND next_attempt_at <= ?
+        ORDER BY next_attempt_at, id LIMIT ?
+        ''', (datetime.now(), limit)).fetchall()
+        
+        claimed = []
+        for row in rows:
+            with self._connect() as conn:
+                cursor = conn.execute('''
+                UPDATE mail_outbox SET status = 'sending', attempts = attempts + 1, claimed_at = ?
+                WHERE id = ? AND status = 'pending'
+                ''', (datetime.now(), row['id']))
+            if cursor.rowcount == 1:
+                claimed.append(self.get_mail(row['id']))
+        return claimed
+    
+    def mark_mail_sent(self, mail_id):
+        with self._connect() as conn:
+            conn.execute(
+                "UPDATE mail_outbox SET status = 'sent', last_error = NULL, sent_at = ? WHERE id = ?",
+                (datetime.now(), mail_id)
+            )
+    
+    def mark_mail_failed(self, mail_id, error, next_attempt_at=None):
+        """Échec d'une tentative : nouvel essai à next_attempt_at, ou 'dead' (abandon) si None"""
+        with self._connect() as conn:
+            if next_attempt_at is None:
+                conn.execute(
+                    "UPDATE mail_outbox SET status = 'dead', last_error = ? WHERE id = ?",
+                    (error, mail_id)
+                )
+            else:
+                conn.execute(
+                    "UPDATE mail_outbox SET status = 'pending', last_error = ?, next_attempt_at = ? WHERE id = ?",
+                    (error, next_attempt_at, mail_id)
+                )
+    
+    def next_mail_attempt_at(self):
+        """Date de la prochaine tentative en attente (None si la file est vide)"""
+        row = self._connect().execute(
+            "SELECT MIN(next_attempt_at) AS next_at FROM mail_outbox WHERE status = 'pending'"
+        ).fetchone()
+        return pd.to_datetime(row['next_at']).to_pydatetime() if row and row['next_at'] else None
+    
+    def requeue_interrupted_mails(self, lease_seconds=None):
+        """
+        Remet en attente les emails 'sending' réservés depuis plus de lease_seconds
+        (processus arrêté pendant l'envoi) ; un envoi en cours dans un autre processus n'est pas repris.
+        
+        Args:
+            lease_seconds: délai depuis la réservation (défaut: Config.MAIL_SENDING_LEASE_SECONDS)
+        """
+        lease_seconds = Config.MAIL_SENDING_LEASE_SECONDS if lease_seconds is None else lease_seconds
+        expired_before = datetime.now() - timedelta(seconds=lease_seconds)
+        with self._connect() as conn:
+            cursor = conn.execute('''
+            UPDATE mail_outbox SET status = 'pending', claimed_at = NULL
+            WHERE status = 'sending' AND (claimed_at IS NULL OR claimed_at < ?)
+            ''', (expired_before,))
+        return cursor.rowcount
+    
+    def get_outbox_stats(self):
+        """Nombre d'emails par statut dans la file d'envoi"""
+        rows = self._connect().execute(
+            'SELECT status, COUNT(*) AS count FROM mail_outbox GROUP BY status'
+        ).fetchall()
+        return {row['status']: row['count'] for row in rows}
 
     def delete_old_runs(self, days=90):
         """Supprime les anciennes exécutions (nettoyage)"""
-        conn = sqlite3.connect(self.db_path)
-        cursor = conn.cursor()
-        
         cutoff_date = datetime.now().timestamp() - (days * 24 * 3600)
         
-        cursor.execute('''
-        DELETE FROM automation_runs 
-        WHERE created_at < datetime(?, 'unixepoch')
-        ''', (cutoff_date,))
-        
-        deleted = cursor.rowcount
-        conn.commit()
-        conn.close()
+        with self._connect() as conn:
+            cursor = conn.execute('''
+            DELETE FROM automation_runs 
+            WHERE created_at < datetime(?, 'unixepoch')
+            ''', (cutoff_date,))
         
-        return deleted
\ No newline at end of file
+        return cursor.rowcount
@@ -0,0 +1,166 @@
+"""
+Cache serveur des jeux de données de sessions
+Le dcc.Store 'stored-data' ne contient plus qu'une clé : le DataFrame reste
+dans ce processus (LRU borné en taille) avec un débordement optionnel sur disque,
+lui aussi borné en taille (les fichiers les moins récemment utilisés sont supprimés).
+"""
+import hashlib
+import os
+import threading
+from collections import OrderedDict
+
+import pandas as pd
+
+from config import Config
+
+
+class DatasetCache:
+    """Cache LRU des DataFrames de sessions, partagé par tous les callbacks du processus"""
+    _entries = OrderedDict()  # {clé: (DataFrame, taille en octets)}
+    _total_bytes = 0
+    _lock = threading.RLock()
+
+    @staticmethod
+    def fingerprint(df):
+        """Empreinte du contenu d'un DataFrame (sert de clé de jeu de données)"""
+        hashes = pd.util.hash_pandas_object(df, index=True).to_numpy()
+        digest = hashlib.sha1(hashes.tobytes())
+        digest.update(','.join(map(str, df.columns)).encode('utf-8'))
+        return digest.hexdigest()[:20]
+
+    @classmethod
+    def put(cls, df):
+        """Ajoute un DataFrame au cache et retourne sa clé"""
+        key = cls.fingerprint(df)
+        with cls._lock:
+            if key in cls._entries:
+                cls._entries.move_to_end(key)
+                return key
+            size = int(df.memory_usage(deep=True).sum())
+            cls._entries[key] = (df, size)
+            cls._total_bytes += size
+            cls._evict()
+        return key
+
+    @classmethod
+    def get(cls, key):
+        """Retourne le DataFrame associé à la clé, ou None s'il n'est plus disponible"""
+        # La clé vient du navigateur : on n'accepte qu'une empreinte hexadécimale
+        if not isinstance(key, str) or not key or any(c not in '0123456789abcdef' for c in key):
+            return None
+        with cls._lock:
+            entry = cls._entries.get(key)
+            if entry is not None:
+                cls._entries.move_to_end(key)
+                return entry[0]
+
+        df = cls._load_spill(key)
+        if df is None:
+            return None
+        with cls._lock:
+            if key not in cls._entries:
+                size = int(df.memory_usage(deep=True).sum())
+                cls._entries[key] = (df, size)
+                cls._total_bytes += size
+                cls._evict(keep=key)
+        return df
+
+    @classmethod
+    def clear(cls):
+        """Vide le cache mémoire (les fichiers débordés sur disque sont conservés)"""
+        with cls._lock:
+            cls._entries.clear()
+            cls._total_bytes = 0
+
+    @classmethod
+    def stats(cls):
+        """Occupation du cache mémoire et des fichiers débordés sur disque"""
+        spills = cls._spill_entries()
+        with cls._lock:
+            return {
+                'entries': len(cls._entries),
+                'bytes': cls._total_bytes,
+                'max_bytes': Config.DATASET_CACHE_MAX_BYTES,
+                'spill_entries': len(spills),
+                'spill_bytes': sum(size for _, size, _ in spills),
+                'spill_max_bytes': Config.DATASET_CACHE_SPILL_MAX_BYTES,
+            }
+
+    @classmethod
+    def _evict(cls, keep=None):
+        """Évince les entrées les moins récemment utilisées au-delà de la taille maximale"""
+        while cls._total_bytes > Config.DATASET_CACHE_MAX_BYTES and len(cls._entries) > 1:
+            key, (df, size) = next(iter(cls._entries.items()))
+            if key == keep:
+                cls._entries.move_to_end(key)
+                continue
+            del cls._entries[key]
+            cls._total_bytes -= size
+            cls._spill(key, df)
+
+    @staticmethod
+    def _spill_path(key):
+        return os.path.join(Config.DATASET_CACHE_DIR, f"{key}.pkl")
+
+    @classmethod
+    def _spill(cls, key, df):
+        if not Config.DATASET_CACHE_SPILL_TO_DISK:
+            return
+        path = cls._spill_path(key)
+        try:
+            if os.path.exists(path):
+                # Déjà débordé (clé = empreinte du contenu) : on le marque comme récent
+                os.utime(path)
+            else:
+                os.makedirs(Config.DATASET_CACHE_DIR, exist_ok=True)
+                df.to_pickle(path)
+        except Exception as e:
+            print(f"⚠️ Impossible d'écrire le jeu de données {key} sur disque: {e}")
+            return
+        cls._evict_spills(keep=key)
+
+    @staticmethod
+    def _spill_entries():
+        """(mtime, taille, chemin) des jeux de données débordés, du plus ancien au plus récent"""
+        entries = []
+        try:
+            with os.scandir(Config.DATASET_CACHE_DIR) as it:
+                for entry in it:
+                    if entry.name.endswith('.pkl'):
+                        stat = entry.stat()
+                        entries.append((stat.st_mtime, stat.st_size, entry.path))
+        except OSError:
+            return []
+        return sorted(entries)
+
+    @classmethod
+    def _evict_spills(cls, keep=None):
+        """Supprime les fichiers les plus anciens au-delà de DATASET_CACHE_SPILL_MAX_BYTES"""
+        entries = cls._spill_entries()
+        total = sum(size for _, size, _ in entries)
+        keep_path = cls._spill_path(keep) if keep else None
+        for _, size, path in entries:
+            if total <= Config.DATASET_CACHE_SPILL_MAX_BYTES:
+                break
+            if path == keep_path:
+                continue
+            try:
+                os.remove(path)
+                total -= size
+            except OSError:
+                pass
+
+    @classmethod
+    def _load_spill(cls, key):
+        if not Config.DATASET_CACHE_SPILL_TO_DISK:
+            return None
+        path = cls._spill_path(key)
+        if not os.path.exists(path):
+            return None
+        try:
+            df = pd.read_pickle(path)
+            os.utime(path)
+            return df
+        except Exception as e:
+            print(f"⚠️ Jeu de données {key} illisible sur disque: {e}")
+            return None
@@ -1,7 +1,11 @@
 """
 Module d'envoi de notifications par email
 """
+import hashlib
 import smtplib
+import threading
+import time
+from contextlib import contextmanager
 from email.mime.text import MIMEText
 from email.mime.multipart import MIMEMultipart
 from email.mime.base import MIMEBase
@@ -9,6 +13,128 @@ from email import encoders
 import os
 from datetime import datetime
 
+from config import Config
+
+
+class SmtpConnectionPool:
+    """
+    Connexions SMTP authentifiées (STARTTLS + login) réutilisées entre envois :
+    une connexion par serveur/compte, utilisée par un seul thread à la fois et
+    fermée après SMTP_POOL_IDLE_SECONDS d'inactivité.
+    """
+    
+    _connections = {}
+    _key_locks = {}
+    _lock = threading.Lock()
+    
+    @staticmethod
+    def _key(server, port, user, password):
+        # Le mot de passe n'est gardé que sous forme d'empreinte
+        digest = hashlib.sha1(repr((server, int(port), user, password)).encode('utf-8')).hexdigest()
+        return f"{server}:{port}:{digest}"
+    
+    @staticmethod
+    def _open(server, port, user, password, timeout):
+        smtp = smtplib.SMTP(server, port, timeout=timeout or Config.SMTP_TIMEOUT)
+        try:
+            smtp.starttls()
+            smtp.login(user, password)
+        except Exception:
+            smtp.close()
+            raise
+        return smtp
+    
+    @staticmethod
+    def _close(smtp):
+        try:
+            smtp.quit()
+        except Exception:
+            smtp.close()
+    
+    @classmethod
+    def _checkout(cls, key):
+        """Connexion en réserve encore vivante (NOOP), sinon None"""
+        with cls._lock:
+            pooled = cls._connections.pop(key, None)
+        if pooled is None:
+            return None
+        smtp, last_used = pooled
+        if time.monotonic() - last_used > Config.SMTP_POOL_IDLE_SECONDS:
+            cls._close(smtp)
+            return None
+        try:
+            if smtp.noop()[0] == 250:
+                return smtp
+        except Exception:
+            pass
+        smtp.close()
+        return None
+    
+    @classmethod
+    @contextmanager
+    def connection(cls, server, port, user, password, timeout=None, blocking=True):
+        """
+        Connexion authentifiée (réutilisée ou nouvelle) ; remise en réserve après usage,
+        sauf si la session SMTP est devenue inutilisable.
+        
+        Seules les connexions ouvertes avec Config.SMTP_TIMEOUT sont mises en réserve.
+        Avec blocking=False, si la connexion du pool est occupée par un envoi,
+        une connexion éphémère est ouverte au lieu d'attendre.
+        """
+        key = cls._key(server, port, user, password)
+        with cls._lock:
+            key_lock = cls._key_locks.setdefault(key, threading.Lock())
+        
+        if not key_lock.acquire(blocking=blocking):
+            smtp = cls._open(server, port, user, password, timeout)
+            try:
+                yield smtp
+            finally:
+                cls._close(smtp)
+            return
+        
+        try:
+            smtp = cls._checkout(key)
+            poolable = True
+            if smtp is None:
+                smtp = cls._open(server, port, user, password, timeout)
+                poolable = timeout in (None, Config.SMTP_TIMEOUT)
+            try:
+                yield smtp
+            except smtplib.SMTPResponseException:
+                # Refus du serveur (destinataire, taille...) : la session reste valide
+                cls._release_or_close(key, smtp, poolable)
+                raise
+            except Exception:
+                smtp.close()
+                raise
+            cls._release_or_close(key, smtp, poolable)
+        finally:
+            key_lock.release()
+    
+    @classmethod
+    def _release_or_close(cls, key, smtp, poolable):
+        if poolable:
+            cls._release(key, smtp)
+        else:
+            cls._close(smtp)
+    
+    @classmethod
+    def _release(cls, key, smtp):
+        with cls._lock:
+            cls._connections[key] = (smtp, time.monotonic())
+    
+    @classmethod
+    def close_idle(cls):
+        """Ferme les connexions inactives depuis plus de SMTP_POOL_IDLE_SECONDS"""
+        now = time.monotonic()
+        with cls._lock:
+            idle = [key for key, (_, last_used) in cls._connections.items()
+                    if now - last_used > Config.SMTP_POOL_IDLE_SECONDS]
+            expired = [cls._connections.pop(key)[0] for key in idle]
+        for smtp in expired:
+            cls._close(smtp)
+
 
 class EmailNotifier:
     """Classe pour envoyer des notifications par email"""
@@ -30,6 +156,12 @@ class EmailNotifier:
             period_end: Date de fin de la période
             pdf_path: Chemin optionnel du PDF généré
         """
+        subject, body = self.compose_automation_success(period_start, period_end)
+        return self._send_email(to_email, subject, body, pdf_path)
+    
+    @staticmethod
+    def compose_automation_success(period_start, period_end):
+        """Sujet et corps de l'email de succès d'automatisation"""
         subject = f"✅ Note de frais générée - {period_start} au {period_end}"
         
         body = f"""
@@ -52,7 +184,7 @@ class EmailNotifier:
         Ceci est un message automatique généré par l'application Recharge.
         """
         
-        return self._send_email(to_email, subject, body, pdf_path)
+        return subject, body
     
     def send_automation_error(self, to_email, period_start, period_end, error_message):
         """
@@ -64,6 +196,12 @@ class EmailNotifier:
             period_end: Date de fin de la période
             error_message: Message d'erreur détaillé
         """
+        subject, body = self.compose_automation_error(period_start, period_end, error_message)
+        return self._send_email(to_email, subject, body)
+    
+    @staticmethod
+    def compose_automation_error(period_start, period_end, error_message):
+        """Sujet et corps de l'email d'erreur d'automatisation"""
         subject = f"❌ Erreur automatisation - {period_start} au {period_end}"
         
         body = f"""
@@ -88,7 +226,7 @@ class EmailNotifier:
         Ceci est un message automatique généré par l'application Recharge.
         """
         
-        return self._send_email(to_email, subject, body)
+        return subject, body
     
     def send_test_email(self, to_email):
         """Envoie un email de test"""
@@ -112,6 +250,10 @@ class EmailNotifier:
         
         return self._send_email(to_email, subject, body)
     
+    def send_email(self, to_email, subject, body, attachment_path=None):
+        """Envoi d'un email déjà composé (utilisé par la file d'envoi MailOutbox)"""
+        return self._send_email(to_email, subject, body, attachment_path)
+    
     def _send_email(self, to_email, subject, body, attachment_path=None):
         """
         Méthode privée pour envoyer un email
@@ -141,10 +283,10 @@ class EmailNotifier:
                     )
                     msg.attach(part)
             
-            # Connexion au serveur SMTP et envoi
-            with smtplib.SMTP(self.smtp_server, self.smtp_port) as server:
-                server.starttls()
-                server.login(self.smtp_user, self.smtp_password)
+            # Envoi sur une connexion authentifiée du pool (login seulement si aucune n'est disponible)
+            with SmtpConnectionPool.connection(
+                self.smtp_server, self.smtp_port, self.smtp_user, self.smtp_password
+            ) as server:
                 server.send_message(msg)
             
             return True, "Email envoyé avec succès"
@@ -156,12 +298,18 @@ class EmailNotifier:
         except Exception as e:
             return False, f"Erreur lors de l'envoi: {str(e)}"
     
-    def test_connection(self):
-        """Teste la connexion au serveur SMTP"""
+    def test_connection(self, timeout=None):
+        """
+        Teste la connexion au serveur SMTP (timeout optionnel en secondes).
+        Réutilise la connexion du pool si elle est libre ; si un envoi l'occupe,
+        le test passe par une connexion éphémère plutôt que d'attendre la fin de l'envoi.
+        """
         try:
-            with smtplib.SMTP(self.smtp_server, self.smtp_port) as server:
-                server.starttls()
-                server.login(self.smtp_user, self.smtp_password)
+            with SmtpConnectionPool.connection(
+                self.smtp_server, self.smtp_port, self.smtp_user, self.smtp_password,
+                timeout=timeout, blocking=False
+            ):
+                pass
             return True, "Connexion SMTP réussie"
         except smtplib.SMTPAuthenticationError:
             return False, "Erreur d'authentification SMTP"
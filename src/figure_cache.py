@@ -0,0 +1,65 @@
+"""
+Mémoïsation des rendus du dashboard (figures Plotly + cartes de statistiques)
+Clé : empreinte du jeu de données, version des tarifs CREG, période et véhicules triés.
+"""
+import threading
+from collections import OrderedDict
+
+from config import Config
+from src.utils import CregTariffEngine
+
+
+class FigureCache:
+    """Cache LRU borné des rendus de update_graphs, avec compteurs de hits/misses"""
+    _entries = OrderedDict()
+    _lock = threading.Lock()
+    hits = 0
+    misses = 0
+
+    @staticmethod
+    def make_key(dataset_key, start_date, end_date, selected_vehicles):
+        """Clé de mémoïsation (la version des tarifs invalide les coûts déjà calculés)"""
+        return (
+            dataset_key,
+            CregTariffEngine.get_instance().version,
+            str(start_date)[:10],
+            str(end_date)[:10],
+            tuple(sorted(str(v) for v in selected_vehicles)),
+        )
+
+    @classmethod
+    def get(cls, key):
+        with cls._lock:
+            entry = cls._entries.get(key)
+            if entry is None:
+                cls.misses += 1
+                return None
+            cls._entries.move_to_end(key)
+            cls.hits += 1
+            return entry
+
+    @classmethod
+    def put(cls, key, value):
+        with cls._lock:
+            cls._entries[key] = value
+            cls._entries.move_to_end(key)
+            while len(cls._entries) > Config.FIGURE_CACHE_MAX_ENTRIES:
+                cls._entries.popitem(last=False)
+
+    @classmethod
+    def clear(cls):
+        with cls._lock:
+            cls._entries.clear()
+
+    @classmethod
+    def stats(cls):
+        """Compteurs exposés (API /api/cache/stats)"""
+        with cls._lock:
+            total = cls.hits + cls.misses
+            return {
+                'entries': len(cls._entries),
+                'max_entries': Config.FIGURE_CACHE_MAX_ENTRIES,
+                'hits': cls.hits,
+                'misses': cls.misses,
+                'hit_ratio': round(cls.hits / total, 3) if total else None,
+            }
@@ -0,0 +1,129 @@
+"""
+File d'exécution des automatisations mensuelles.
+Les demandes (API, bouton manuel, planificateur) sont persistées dans SQLite et
+exécutées par un pool de workers borné ; une demande pour une période déjà en
+attente ou en cours rejoint la demande existante au lieu d'en lancer une nouvelle.
+"""
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+import pandas as pd
+
+from config import Config
+from src.database import AutomationDB
+from src.automation import run_monthly_automation
+
+
+class AutomationJobQueue:
+    """Exécuteur unique (par processus) des demandes d'automatisation"""
+
+    _executor = None
+    _lock = threading.Lock()
+
+    @staticmethod
+    def idempotency_key(period_start, period_end):
+        """
+        Clé de dé-duplication d'une demande : la période normalisée en dates ISO.
+
+        Raises:
+            ValueError si une des dates est invalide
+        """
+        start = pd.to_datetime(period_start).date().isoformat()
+        end = pd.to_datetime(period_end).date().isoformat()
+        return f"{start}:{end}"
+
+    @classmethod
+    def _get_executor(cls):
+        with cls._lock:
+            if cls._executor is None:
+                cls._executor = ThreadPoolExecutor(
+                    max_workers=Config.AUTOMATION_JOB_WORKERS,
+                    thread_name_prefix='automation-job'
+                )
+            return cls._executor
+
+    @classmethod
+    def submit(cls, period_start, period_end, manual_trigger=False):
+        """
+        Met en file une automatisation pour la période.
+
+        Returns:
+            tuple (job, created) : created est False si la demande a rejoint
+            une exécution déjà en attente ou en cours pour la même période
+
+        Raises:
+            ValueError si une des dates est invalide
+        """
+        key = cls.idempotency_key(period_start, period_end)
+        start, end = key.split(':')
+
+        job, created = AutomationDB().enqueue_job(key, start, end, manual_trigger)
+        if created:
+            cls._get_executor().submit(cls._run_job, job['id'])
+        return job, created
+
+    @classmethod
+    def resume(cls, run_id):
+        """
+        Met en file la reprise d'une exécution à partir de sa première étape non terminée.
+
+        Returns:
+            tuple (job, created), ou (None, False) si l'exécution est introuvable ou déjà réussie
+        """
+        db = AutomationDB()
+        run = db.get_run(run_id)
+        if run is None or run['status'] == 'success':
+            return None, False
+
+        key = cls.idempotency_key(run['period_start'], run['period_end'])
+        start, end = key.split(':')
+        job, created = db.enqueue_job(key, start, end, manual_trigger=True, run_id=run['id'])
+        if created:
+            cls._get_executor().submit(cls._run_job, job['id'])
+        return job, created
+
+    @classmethod
+    def start(cls):
+        """Reprend les demandes restées en file ou dont le bail a expiré lors du dernier arrêt"""
+        for job_id in AutomationDB().requeue_interrupted_jobs():
+            cls._get_executor().submit(cls._run_job, job_id)
+
+    @classmethod
+    def get_job(cls, job_id):
+        return AutomationDB().get_job(job_id)
+
+    @classmethod
+    def _run_job(cls, job_id):
+        db = AutomationDB()
+        if not db.claim_job(job_id):
+            return
+
+        job = db.get_job(job_id)
+        stop_heartbeat = cls._start_heartbeat(job_id)
+        try:
+            success, message, run_id = run_monthly_automation(
+                job['period_start'], job['period_end'], bool(job['manual_trigger']),
+                resume_run_id=job['run_id']
+            )
+            db.finish_job(job_id, 'done' if success else 'failed', run_id, message)
+        except Exception as e:
+            print(f"❌ Erreur job d'automatisation {job_id}: {e}")
+            db.finish_job(job_id, 'failed', job['run_id'], str(e))
+        finally:
+            stop_heartbeat.set()
+
+    @staticmethod
+    def _start_heartbeat(job_id):
+        """Prolonge le bail de la demande tant qu'elle s'exécute ; retourne l'événement d'arrêt"""
+        stop = threading.Event()
+
+        def beat():
+            db = AutomationDB()
+            while not stop.wait(Config.AUTOMATION_JOB_HEARTBEAT_SECONDS):
+                try:
+                    db.heartbeat_job(job_id)
+                except Exception as e:
+                    print(f"⚠️ Battement de cœur du job {job_id} impossible: {e}")
+
+        threading.Thread(target=beat, name=f'automation-job-heartbeat-{job_id}', daemon=True).start()
+        return stop
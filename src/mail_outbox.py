@@ -0,0 +1,129 @@
+"""
+File d'envoi des emails.
+Les emails sont persistés dans SQLite (table mail_outbox) puis envoyés par un
+thread d'arrière-plan sur une connexion SMTP réutilisée ; un échec est retenté
+avec un délai exponentiel, puis abandonné ('dead') après MAIL_MAX_ATTEMPTS.
+"""
+import threading
+from datetime import datetime, timedelta
+
+from config import Config
+from src.database import AutomationDB
+from src.email_notifier import EmailNotifier, SmtpConnectionPool
+
+
+def _smtp_settings(db):
+    """Paramètres SMTP courants : DB (prioritaire) sinon Config/.env"""
+    db_config = db.get_config() or {}
+
+    def get_conf(key, default_val):
+        return db_config.get(key) or default_val
+
+    return (
+        get_conf('smtp_server', Config.SMTP_SERVER),
+        int(get_conf('smtp_port', Config.SMTP_PORT)),
+        get_conf('smtp_user', Config.SMTP_USER),
+        get_conf('smtp_password', Config.SMTP_PASSWORD),
+    )
+
+
+class MailOutbox:
+    """Expéditeur unique (par processus) de la file mail_outbox"""
+
+    _thread = None
+    _wake = threading.Event()
+    _lock = threading.Lock()
+
+    @staticmethod
+    def retry_delay(attempts):
+        """Délai avant la tentative suivante : MAIL_RETRY_BASE_SECONDS doublé à chaque échec, plafonné"""
+        delay = Config.MAIL_RETRY_BASE_SECONDS * (2 ** max(attempts - 1, 0))
+        return timedelta(seconds=min(delay, Config.MAIL_RETRY_MAX_SECONDS))
+
+    @classmethod
+    def enqueue(cls, to_email, subject, body, attachment_path=None, run_id=None):
+        """
+        Met un email en file et réveille l'expéditeur (retour immédiat).
+
+        Returns:
+            Identifiant de l'email dans la file
+        """
+        mail_id = AutomationDB().enqueue_mail(to_email, subject, body, attachment_path, run_id)
+        cls.start()
+        cls._wake.set()
+        return mail_id
+
+    @classmethod
+    def start(cls):
+        """Démarre le thread d'envoi (reprend les envois interrompus lors du dernier arrêt)"""
+        with cls._lock:
+            if cls._thread is not None and cls._thread.is_alive():
+                return
+            cls._thread = threading.Thread(target=cls._run, name='mail-outbox', daemon=True)
+            cls._thread.start()
+
+    @classmethod
+    def stats(cls):
+        return AutomationDB().get_outbox_stats()
+
+    @classmethod
+    def _run(cls):
+        while True:
+            cls._wake.clear()
+            try:
+                cls.process_due()
+                next_at = AutomationDB().next_mail_attempt_at()
+            except Exception as e:
+                print(f"❌ Erreur file d'envoi des emails: {e}")
+                next_at = None
+
+            SmtpConnectionPool.close_idle()
+            timeout = Config.MAIL_OUTBOX_POLL_SECONDS
+            if next_at is not None:
+                timeout = min(timeout, max((next_at - datetime.now()).total_seconds(), 0))
+            cls._wake.wait(timeout)
+
+    @classmethod
+    def process_due(cls):
+        """Envoie les emails dont la tentative est échue ; retourne le nombre traité"""
+        db = AutomationDB()
+        # Envois abandonnés par un processus arrêté depuis (réservation expirée)
+        db.requeue_interrupted_mails()
+        processed = 0
+        while True:
+            mails = db.claim_due_mails()
+            if not mails:
+                return processed
+            for mail in mails:
+                cls._deliver(db, mail)
+                processed += 1
+
+    @classmethod
+    def _deliver(cls, db, mail):
+        server, port, user, password = _smtp_settings(db)
+        if server and user and password:
+            notifier = EmailNotifier(server, port, user, password)
+            success, message = notifier.send_email(
+                mail['to_email'], mail['subject'], mail['body'], mail['attachment_path']
+            )
+        else:
+            success, message = False, "Configuration SMTP incomplète"
+
+        if success:
+            db.mark_mail_sent(mail['id'])
+            if mail['run_id'] is not None:
+                db.update_run_checkpoint(mail['run_id'], email_status='sent')
+            return
+
+        if mail['attempts'] >= Config.MAIL_MAX_ATTEMPTS:
+            print(f"❌ Email {mail['id']} abandonné après {mail['attempts']} tentatives: {message}")
+            db.mark_mail_failed(mail['id'], message)
+            if mail['run_id'] is not None:
+                # L'exécution peut être reprise pour renvoyer la note de frais
+                db.update_run_checkpoint(mail['run_id'], email_status='failed')
+                db.update_run(mail['run_id'], 'send_email', 'failed', f"Échec envoi email: {message}")
+            return
+
+        retry_at = datetime.now() + cls.retry_delay(mail['attempts'])
+        print(f"⚠️ Email {mail['id']} : tentative {mail['attempts']} échouée ({message}), nouvel essai à {retry_at:%H:%M:%S}")
+        db.mark_mail_failed(mail['id'], message, next_attempt_at=retry_at)
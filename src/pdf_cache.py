@@ -0,0 +1,118 @@
+"""
+Cache disque des notes de frais PDF, adressé par contenu.
+Clé : empreinte des sessions filtrées, version des tarifs CREG, période, véhicules
+(dans l'ordre du document) et date d'émission imprimée sur la note.
+"""
+import hashlib
+import os
+import threading
+
+import pandas as pd
+
+from config import Config
+from src.utils import CregTariffEngine
+
+# Colonnes dont dépend le contenu de la note (le coût est dérivé de startTime et des kWh)
+PDF_KEY_COLUMNS = ['startTime', 'rfid', 'energyConsumed_kWh']
+
+
+class PdfCache:
+    """Cache LRU borné en taille des PDF rendus, stockés sous Config.PDF_CACHE_DIR"""
+    _lock = threading.Lock()
+    hits = 0
+    misses = 0
+
+    @staticmethod
+    def make_key(df_selected, start_date, end_date, selected_vehicles, issue_date, kind='monthly'):
+        """Empreinte hexadécimale d'un document (sessions déjà filtrées, non valorisées)"""
+        rows = pd.util.hash_pandas_object(df_selected[PDF_KEY_COLUMNS], index=False).to_numpy()
+        digest = hashlib.sha1(rows.tobytes())
+        digest.update(repr((
+            CregTariffEngine.get_instance().version,
+            str(start_date)[:10],
+            str(end_date)[:10],
+            [str(v) for v in selected_vehicles],
+            str(issue_date),
+            kind,
+        )).encode('utf-8'))
+        return digest.hexdigest()
+
+    @staticmethod
+    def _path(key):
+        return os.path.join(Config.PDF_CACHE_DIR, f"{key}.pdf")
+
+    @classmethod
+    def get(cls, key):
+        """Octets du PDF en cache, ou None"""
+        path = cls._path(key)
+        try:
+            with open(path, 'rb') as f:
+                data = f.read()
+            # Marque l'entrée comme récemment utilisée (éviction par date de modification)
+            os.utime(path)
+        except OSError:
+            with cls._lock:
+                cls.misses += 1
+            return None
+        with cls._lock:
+            cls.hits += 1
+        return data
+
+    @classmethod
+    def put(cls, key, data):
+        """Stocke un PDF (écriture atomique) puis évince les plus anciens au-delà de la taille maximale"""
+        try:
+            os.makedirs(Config.PDF_CACHE_DIR, exist_ok=True)
+            path = cls._path(key)
+            tmp_path = f"{path}.{threading.get_ident()}.tmp"
+            with open(tmp_path, 'wb') as f:
+                f.write(data)
+            os.replace(tmp_path, path)
+        except OSError as e:
+            print(f"⚠️ Impossible d'écrire le PDF {key} en cache: {e}")
+            return
+        with cls._lock:
+            cls._evict(keep=key)
+
+    @classmethod
+    def _entries(cls):
+        """(mtime, taille, chemin) des PDF en cache, du plus ancien au plus récent"""
+        entries = []
+        try:
+            with os.scandir(Config.PDF_CACHE_DIR) as it:
+                for entry in it:
+                    if entry.name.endswith('.pdf'):
+                        stat = entry.stat()
+                        entries.append((stat.st_mtime, stat.st_size, entry.path))
+        except OSError:
+            return []
+        return sorted(entries)
+
+    @classmethod
+    def _evict(cls, keep=None):
+        entries = cls._entries()
+        total = sum(size for _, size, _ in entries)
+        keep_path = cls._path(keep) if keep else None
+        for _, size, path in entries:
+            if total <= Config.PDF_CACHE_MAX_BYTES:
+                break
+            if path == keep_path:
+                continue
+            try:
+                os.remove(path)
+                total -= size
+            except OSError:
+                pass
+
+    @classmethod
+    def stats(cls):
+        """Occupation du cache disque et compteurs de hits/misses"""
+        entries = cls._entries()
+        with cls._lock:
+            return {
+                'entries': len(entries),
+                'bytes': sum(size for _, size, _ in entries),
+                'max_bytes': Config.PDF_CACHE_MAX_BYTES,
+                'hits': cls.hits,
+                'misses': cls.misses,
+            }
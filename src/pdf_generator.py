@@ -3,140 +3,90 @@ Générateur de PDF pour note de frais mensuelle avec tarifs CREG (Simplifié)
 """
 import io
 import os
+import threading
+import zipfile
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
 import pandas as pd
 from dash import dcc
 from datetime import datetime
 from reportlab.lib.pagesizes import A4
 from reportlab.lib import colors
 from reportlab.lib.units import cm
-from reportlab.platypus import SimpleDocTemplate, Table, TableStyle, Paragraph, Spacer, Image
+from reportlab.lib.utils import ImageReader
+from reportlab.platypus import SimpleDocTemplate, Table, TableStyle, Paragraph, Spacer, Flowable, PageBreak
 from reportlab.lib.styles import getSampleStyleSheet, ParagraphStyle
 from reportlab.lib.enums import TA_CENTER
 
 from config import Config
-from src.utils import MOIS_FR, load_creg_tariffs, get_tariff_for_period, get_quarter_from_date
+from src.utils import (
+    MOIS_FR, get_tariff_for_period, get_quarter_from_date, add_cost_columns_creg,
+    is_12_months_period, calculate_end_date_12_months
+)
+from src.pdf_cache import PdfCache, PDF_KEY_COLUMNS
 
 
-def generate_monthly_pdf_data(json_data, start_date, end_date, selected_vehicles, region=None):
-    """Génère la note de frais mensuelle basée sur les tarifs CREG"""
-    if json_data is None or not selected_vehicles:
-        return None
-    
-    df = pd.read_json(json_data)
-    df['startTime'] = pd.to_datetime(df['startTime'])
-    df['endTime'] = pd.to_datetime(df['endTime'])
-    
-    # Filtrer par période et véhicules
-    mask = (df['startTime'].dt.date >= pd.to_datetime(start_date).date()) & \
-           (df['startTime'].dt.date <= pd.to_datetime(end_date).date()) & \
-           (df['rfid'].isin(selected_vehicles))
-    df_filtered = df[mask].copy()
+class _CachedImage(Flowable):
+    """Image déjà décodée (ImageReader partagé) dessinée à une taille fixe"""
     
-    # Calculer le coût avec tarifs CREG
-    df_filtered['tariff_creg'] = df_filtered['startTime'].apply(
-        lambda x: get_tariff_for_period(x, x)
-    )
-    df_filtered['cost'] = df_filtered['energyConsumed_kWh'] * df_filtered['tariff_creg']
+    def __init__(self, reader, width, height, hAlign='LEFT'):
+        super().__init__()
+        self._reader = reader
+        self.drawWidth = width
+        self.drawHeight = height
+        self.hAlign = hAlign
     
-    # Créer le PDF
-    buffer = io.BytesIO()
-    doc = SimpleDocTemplate(
-        buffer,
-        pagesize=A4,
-        topMargin=1*cm,
-        bottomMargin=2*cm,
-        leftMargin=2*cm,
-        rightMargin=2*cm
-    )
-    elements = []
-    styles = getSampleStyleSheet()
-    
-    # Styles personnalisés (identiques)
-    title_style = ParagraphStyle(
-        'CustomTitle',
-        parent=styles['Heading1'],
-        fontSize=18,
-        textColor=colors.HexColor(Config.SAGE_GREEN),
-        spaceAfter=12,
-        alignment=TA_CENTER
-    )
+    def wrap(self, availWidth, availHeight):
+        return self.drawWidth, self.drawHeight
     
-    subtitle_style = ParagraphStyle(
-        'CustomSubtitle',
-        parent=styles['Normal'],
-        fontSize=12,
-        textColor=colors.HexColor('#555555'),
-        spaceAfter=20,
-        alignment=TA_CENTER
-    )
+    def draw(self):
+        self.canv.drawImage(self._reader, 0, 0, self.drawWidth, self.drawHeight, mask='auto')
+
+
+class PdfRenderEngine:
+    """
+    Moteur de rendu unique des notes de frais : feuilles de styles, style de tableau
+    et logo décodé sont construits une seule fois par processus ; chaque PDF ne paie
+    que la mise en page. Rend vers un buffer mémoire (bytes) ou un fichier.
+    """
     
-    heading_style = ParagraphStyle(
-        'CustomHeading',
-        parent=styles['Heading2'],
-        fontSize=13,
-        textColor=colors.HexColor(Config.SAGE_GREEN),
-        spaceAfter=12,
-        spaceBefore=16,
-        fontName='Helvetica-Bold'
-    )
+    _instance = None
+    _lock = threading.Lock()
     
-    # Logo
-    try:
-        logo = Image(Config.LOGO_PATH, width=Config.LOGO_WIDTH_CM*cm, height=Config.LOGO_HEIGHT_CM*cm)
-        logo.hAlign = 'LEFT'
-        elements.append(logo)
-        elements.append(Spacer(1, 0.5*cm))
-    except:
-        pass
-    
-    # Titre
-    elements.append(Paragraph("Note de frais mensuelle - Recharge de véhicule électrique", title_style))
-    
-    start_dt = pd.to_datetime(start_date)
-    periode_text = f"{MOIS_FR[start_dt.month]} {start_dt.year}"
-    
-    elements.append(Paragraph(periode_text, subtitle_style))
-    
-    date_now = datetime.now()
-    elements.append(Paragraph(f"Document émis le {date_now.strftime('%d/%m/%Y')}", styles['Normal']))
-    elements.append(Spacer(1, 0.6*cm))
-    
-    # Note CREG
-    quarter = get_quarter_from_date(start_date)
-    note_text = f"<b>Tarif appliqué :</b> Tarif CREG {quarter}<br/>" \
-                "Le tarif CREG (Commission de Régulation de l'Électricité et du Gaz) est utilisé par le SPF Finances " \
-                "pour le calcul du remboursement des frais d'électricité liés à la recharge à domicile."
-    elements.append(Paragraph(note_text, styles['Normal']))
-    elements.append(Spacer(1, 0.8*cm))
-    
-    # Tarif appliqué
-    elements.append(Paragraph("Tarif CREG appliqué", heading_style))
-    avg_tariff = get_tariff_for_period(start_date, end_date)
-    elements.append(Paragraph(
-        f"{quarter} : {avg_tariff:.4f} € HTVA/kWh (soit {avg_tariff*1.06:.4f} € TVAC/kWh)",
-        styles['Normal']
-    ))
-    elements.append(Spacer(1, 0.8*cm))
-    
-    # Montant à rembourser
-    total_cost = df_filtered['cost'].sum()
-    
-    for vehicle in selected_vehicles:
-        elements.append(Paragraph("Montant à rembourser", heading_style))
-        
-        vehicle_data = df_filtered[df_filtered['rfid'] == vehicle]
-        vehicle_cost = vehicle_data['cost'].sum()
-        vehicle_kwh = vehicle_data['energyConsumed_kWh'].sum()
-        
-        table_data = [['Description', 'Consommation (kWh)', 'Montant (EUR)']]
-        table_data.append([
-            f"{MOIS_FR[start_dt.month]} {start_dt.year}",
-            f"{vehicle_kwh:.3f}",
-            f"{vehicle_cost:.2f} €"
-        ])
+    def __init__(self):
+        styles = getSampleStyleSheet()
+        self.normal_style = styles['Normal']
+        
+        self.title_style = ParagraphStyle(
+            'CustomTitle',
+            parent=styles['Heading1'],
+            fontSize=18,
+            textColor=colors.HexColor(Config.SAGE_GREEN),
+            spaceAfter=12,
+            alignment=TA_CENTER
+        )
+        
+        self.subtitle_style = ParagraphStyle(
+            'CustomSubtitle',
+            parent=styles['Normal'],
+            fontSize=12,
+            textColor=colors.HexColor('#555555'),
+            spaceAfter=20,
+            alignment=TA_CENTER
+        )
         
-        monthly_table = Table(table_data, colWidths=[6*cm, 4*cm, 4*cm])
-        monthly_table.setStyle(TableStyle([
+        self.heading_style = ParagraphStyle(
+            'CustomHeading',
+            parent=styles['Heading2'],
+            fontSize=13,
+            textColor=colors.HexColor(Config.SAGE_GREEN),
+            spaceAfter=12,
+            spaceBefore=16,
+            fontName='Helvetica-Bold'
+        )
+        
+        self.table_style = TableStyle([
             ('BACKGROUND', (0, 0), (-1, 0), colors.HexColor(Config.DARK_GREY)),
             ('TEXTCOLOR', (0, 0), (-1, 0), colors.whitesmoke),
             ('ALIGN', (0, 0), (-1, -1), 'CENTER'),
@@ -150,22 +100,456 @@ def generate_monthly_pdf_data(json_data, start_date, end_date, selected_vehicles
             ('FONTSIZE', (0, 1), (-1, -1), 9),
             ('TOPPADDING', (0, 1), (-1, -1), 6),
             ('BOTTOMPADDING', (0, 1), (-1, -1), 6),
-        ]))
+        ])
+        
+        # Tableaux terminés par une ligne de totaux
+        self.totals_table_style = TableStyle([
+            ('FONTNAME', (0, -1), (-1, -1), 'Helvetica-Bold'),
+            ('LINEABOVE', (0, -1), (-1, -1), 1, colors.HexColor(Config.DARK_GREY)),
+        ], parent=self.table_style)
+        
+        self.logo = self._load_logo()
+    
+    @classmethod
+    def get_instance(cls):
+        """Instance partagée du processus"""
+        if cls._instance is None:
+            with cls._lock:
+                if cls._instance is None:
+                    cls._instance = cls()
+        return cls._instance
+    
+    @staticmethod
+    def _load_logo():
+        """Lit et décode le logo une fois (None si absent ou illisible)"""
+        try:
+            with open(Config.LOGO_PATH, 'rb') as f:
+                reader = ImageReader(io.BytesIO(f.read()))
+            reader.getRGBData()
+            return reader
+        except Exception:
+            return None
+    
+    def monthly_note_elements(self, df_filtered, start_date, end_date, selected_vehicles):
+        """Flowables de la note de frais mensuelle (sessions déjà filtrées et valorisées)"""
+        elements = []
+        
+        # Logo
+        if self.logo is not None:
+            elements.append(_CachedImage(self.logo, Config.LOGO_WIDTH_CM*cm, Config.LOGO_HEIGHT_CM*cm))
+            elements.append(Spacer(1, 0.5*cm))
+        
+        # Titre
+        elements.append(Paragraph("Note de frais mensuelle - Recharge de véhicule électrique", self.title_style))
+        
+        start_dt = pd.to_datetime(start_date)
+        periode_text = f"{MOIS_FR[start_dt.month]} {start_dt.year}"
+        
+        elements.append(Paragraph(periode_text, self.subtitle_style))
+        
+        date_now = datetime.now()
+        elements.append(Paragraph(f"Document émis le {date_now.strftime('%d/%m/%Y')}", self.normal_style))
+        elements.append(Spacer(1, 0.6*cm))
         
-        elements.append(monthly_table)
+        # Note CREG
+        quarter = get_quarter_from_date(start_date)
+        note_text = f"<b>Tarif appliqué :</b> Tarif CREG {quarter}<br/>" \
+                    "Le tarif CREG (Commission de Régulation de l'Électricité et du Gaz) est utilisé par le SPF Finances " \
+                    "pour le calcul du remboursement des frais d'électricité liés à la recharge à domicile."
+        elements.append(Paragraph(note_text, self.normal_style))
         elements.append(Spacer(1, 0.8*cm))
+        
+        # Tarif appliqué
+        elements.append(Paragraph("Tarif CREG appliqué", self.heading_style))
+        avg_tariff = get_tariff_for_period(start_date, end_date)
+        elements.append(Paragraph(
+            f"{quarter} : {avg_tariff:.4f} € HTVA/kWh (soit {avg_tariff*1.06:.4f} € TVAC/kWh)",
+            self.normal_style
+        ))
+        elements.append(Spacer(1, 0.8*cm))
+        
+        # Montant à rembourser
+        total_cost = df_filtered['cost'].sum()
+        
+        for vehicle in selected_vehicles:
+            elements.append(Paragraph("Montant à rembourser", self.heading_style))
+            
+            vehicle_data = df_filtered[df_filtered['rfid'] == vehicle]
+            vehicle_cost = vehicle_data['cost'].sum()
+            vehicle_kwh = vehicle_data['energyConsumed_kWh'].sum()
+            
+            table_data = [['Description', 'Consommation (kWh)', 'Montant (EUR)']]
+            table_data.append([
+                f"{MOIS_FR[start_dt.month]} {start_dt.year}",
+                f"{vehicle_kwh:.3f}",
+                f"{vehicle_cost:.2f} €"
+            ])
+            
+            monthly_table = Table(table_data, colWidths=[6*cm, 4*cm, 4*cm])
+            monthly_table.setStyle(self.table_style)
+            
+            elements.append(monthly_table)
+            elements.append(Spacer(1, 0.8*cm))
+        
+        # Message de synthèse
+        summary_text = f"Une note de frais de <b>{total_cost:.2f} €</b> peut être réalisée pour le mois de {MOIS_FR[start_dt.month]} {start_dt.year}."
+        elements.append(Paragraph(summary_text, self.normal_style))
+        
+        return elements
     
-    # Message de synthèse
-    summary_text = f"Une note de frais de <b>{total_cost:.2f} €</b> peut être réalisée pour le mois de {MOIS_FR[start_dt.month]} {start_dt.year}."
-    elements.append(Paragraph(summary_text, styles['Normal']))
+    def annual_report_elements(self, summary, start_date, end_date):
+        """
+        Flowables du rapport annuel.
+        
+        Args:
+            summary: agrégat par mois et par borne (voir _annual_summary)
+        """
+        elements = []
+        
+        if self.logo is not None:
+            elements.append(_CachedImage(self.logo, Config.LOGO_WIDTH_CM*cm, Config.LOGO_HEIGHT_CM*cm))
+            elements.append(Spacer(1, 0.5*cm))
+        
+        elements.append(Paragraph("Rapport annuel - Recharge de véhicule électrique", self.title_style))
+        
+        start_dt = pd.to_datetime(start_date)
+        end_dt = pd.to_datetime(end_date)
+        periode_text = f"{MOIS_FR[start_dt.month]} {start_dt.year} - {MOIS_FR[end_dt.month]} {end_dt.year}"
+        elements.append(Paragraph(periode_text, self.subtitle_style))
+        
+        date_now = datetime.now()
+        elements.append(Paragraph(f"Document émis le {date_now.strftime('%d/%m/%Y')}", self.normal_style))
+        elements.append(Spacer(1, 0.6*cm))
+        
+        note_text = "Montants calculés session par session avec le tarif CREG du trimestre de la recharge " \
+                    "(tarif utilisé par le SPF Finances pour le remboursement de la recharge à domicile)."
+        elements.append(Paragraph(note_text, self.normal_style))
+        elements.append(Spacer(1, 0.8*cm))
+        
+        # Détail par mois et par borne
+        elements.append(Paragraph("Détail mensuel", self.heading_style))
+        table_data = [['Mois', 'Borne', 'Tarif CREG', 'Consommation (kWh)', 'Montant (EUR)']]
+        for row in summary.itertuples(index=False):
+            table_data.append([
+                f"{MOIS_FR[row.month.month]} {row.month.year}",
+                str(row.rfid),
+                row.quarter,
+                f"{row.kwh:.3f}",
+                f"{row.cost:.2f} €"
+            ])
+        table_data.append(['Total', '', '', f"{summary['kwh'].sum():.3f}", f"{summary['cost'].sum():.2f} €"])
+        
+        detail_table = Table(table_data, colWidths=[3.5*cm, 4*cm, 2.5*cm, 3.5*cm, 3.5*cm], repeatRows=1)
+        detail_table.setStyle(self.totals_table_style)
+        elements.append(detail_table)
+        elements.append(Spacer(1, 0.8*cm))
+        
+        # Totaux par borne
+        elements.append(Paragraph("Total par borne", self.heading_style))
+        per_vehicle = summary.groupby('rfid', observed=True, sort=False)[['kwh', 'cost']].sum()
+        table_data = [['Borne', 'Consommation (kWh)', 'Montant (EUR)']]
+        for rfid, row in per_vehicle.iterrows():
+            table_data.append([str(rfid), f"{row['kwh']:.3f}", f"{row['cost']:.2f} €"])
+        table_data.append(['Total', f"{summary['kwh'].sum():.3f}", f"{summary['cost'].sum():.2f} €"])
+        
+        vehicle_table = Table(table_data, colWidths=[6*cm, 4*cm, 4*cm])
+        vehicle_table.setStyle(self.totals_table_style)
+        elements.append(vehicle_table)
+        elements.append(Spacer(1, 0.8*cm))
+        
+        summary_text = f"Une note de frais de <b>{summary['cost'].sum():.2f} €</b> peut être réalisée " \
+                       f"pour la période de {periode_text}."
+        elements.append(Paragraph(summary_text, self.normal_style))
+        
+        return elements
     
-    # Générer le PDF
-    doc.build(elements)
-    buffer.seek(0)
+    def render(self, elements, sink=None):
+        """
+        Met en page les flowables en A4.
+        
+        Args:
+            sink: chemin de fichier, ou None pour un rendu en mémoire
+        
+        Returns:
+            Les octets du PDF (sink=None) ou le chemin écrit
+        """
+        target = io.BytesIO() if sink is None else sink
+        doc = SimpleDocTemplate(
+            target,
+            pagesize=A4,
+            topMargin=1*cm,
+            bottomMargin=2*cm,
+            leftMargin=2*cm,
+            rightMargin=2*cm
+        )
+        doc.build(elements)
+        return target.getvalue() if sink is None else sink
+    
+    def render_monthly_note(self, df_filtered, start_date, end_date, selected_vehicles, sink=None):
+        """Rend la note de frais mensuelle (voir render pour sink)"""
+        return self.render(
+            self.monthly_note_elements(df_filtered, start_date, end_date, selected_vehicles), sink
+        )
+
+
+def _select_monthly_sessions(df, start_date, end_date, selected_vehicles):
+    """Sessions de la période et des véhicules choisis (sans valorisation)"""
+    mask = (df['startTime'].dt.date >= pd.to_datetime(start_date).date()) & \
+           (df['startTime'].dt.date <= pd.to_datetime(end_date).date()) & \
+           (df['rfid'].isin(selected_vehicles))
+    return df[mask]
+
+
+def _render_monthly_note_cached(df, start_date, end_date, selected_vehicles):
+    """
+    Octets de la note de frais mensuelle, servis depuis le PdfCache quand les mêmes
+    sessions, tarifs, période, véhicules et date d'émission ont déjà été rendus
+    """
+    df_selected = _select_monthly_sessions(df, start_date, end_date, selected_vehicles)
+    key = PdfCache.make_key(df_selected, start_date, end_date, selected_vehicles, datetime.now().date())
+    
+    pdf_bytes = PdfCache.get(key)
+    if pdf_bytes is None:
+        # Calculer le coût avec tarifs CREG (moteur en mémoire, recherche vectorisée)
+        df_filtered = add_cost_columns_creg(df_selected.copy())
+        pdf_bytes = PdfRenderEngine.get_instance().render_monthly_note(
+            df_filtered, start_date, end_date, selected_vehicles
+        )
+        PdfCache.put(key, pdf_bytes)
+    return pdf_bytes
+
+
+def _render_month_worker(df_selected, start_date, end_date, selected_vehicles):
+    """Rendu d'un mois dans un processus du pool (sessions déjà sélectionnées, non valorisées)"""
+    df_filtered = add_cost_columns_creg(df_selected.copy())
+    return PdfRenderEngine.get_instance().render_monthly_note(
+        df_filtered, start_date, end_date, selected_vehicles
+    )
+
+
+def _split_months(df, start_date, end_date, selected_vehicles):
+    """
+    Découpe les sessions en une seule passe par mois calendaire.
+    
+    Returns:
+        liste [(début, fin, sessions)] des mois de la période ayant des sessions,
+        bornes du premier et du dernier mois ramenées à la période demandée
+    """
+    start = pd.to_datetime(start_date).date()
+    end = pd.to_datetime(end_date).date()
+    df_selected = _select_monthly_sessions(df, start, end, selected_vehicles)[PDF_KEY_COLUMNS]
+    groups = dict(tuple(df_selected.groupby(df_selected['startTime'].dt.to_period('M'))))
+    
+    months = []
+    for period in pd.period_range(start, end, freq='M'):
+        df_month = groups.get(period)
+        if df_month is None or df_month.empty:
+            continue
+        months.append((
+            max(start, period.start_time.date()),
+            min(end, period.end_time.date()),
+            df_month
+        ))
+    return months
+
+
+class PdfBatchRenderer:
+    """
+    Génération des notes de frais mois par mois : les mois déjà en PdfCache sont
+    servis directement, les autres sont rendus en parallèle dans un pool de
+    processus (un mois par tâche) partagé par le processus.
+    """
+    
+    _executor = None
+    _lock = threading.Lock()
+    
+    @classmethod
+    def _get_executor(cls):
+        with cls._lock:
+            if cls._executor is None:
+                # spawn : les workers ne héritent ni des threads ni des connexions du serveur
+                cls._executor = ProcessPoolExecutor(
+                    max_workers=Config.PDF_BATCH_WORKERS,
+                    mp_context=multiprocessing.get_context('spawn')
+                )
+            return cls._executor
+    
+    @classmethod
+    def _reset_executor(cls, broken):
+        """Abandonne un pool dont un worker est mort ; le suivant sera recréé à la demande"""
+        with cls._lock:
+            if cls._executor is broken:
+                cls._executor = None
+        broken.shutdown(wait=False, cancel_futures=True)
+    
+    @classmethod
+    def render_months(cls, df, start_date, end_date, selected_vehicles):
+        """
+        Rend une note de frais par mois de la période.
+        
+        Returns:
+            liste [(début, fin, octets du PDF)] dans l'ordre chronologique
+        """
+        issue_date = datetime.now().date()
+        months = _split_months(df, start_date, end_date, selected_vehicles)
+        
+        keys = [PdfCache.make_key(df_month, m_start, m_end, selected_vehicles, issue_date)
+                for m_start, m_end, df_month in months]
+        results = [PdfCache.get(key) for key in keys]
+        missing = [i for i, pdf_bytes in enumerate(results) if pdf_bytes is None]
+        
+        if len(missing) > 1 and Config.PDF_BATCH_WORKERS > 1:
+            executor = cls._get_executor()
+            futures = {
+                i: executor.submit(_render_month_worker, months[i][2], months[i][0], months[i][1], selected_vehicles)
+                for i in missing
+            }
+            try:
+                for i, future in futures.items():
+                    results[i] = future.result()
+            except BrokenProcessPool as e:
+                # Worker mort (mémoire, plantage reportlab) : mois restants rendus dans ce processus
+                print(f"⚠️ Pool de génération PDF interrompu, rendu séquentiel des mois restants: {e}")
+                cls._reset_executor(executor)
+                for i in missing:
+                    if results[i] is None:
+                        results[i] = _render_month_worker(months[i][2], months[i][0], months[i][1], selected_vehicles)
+        else:
+            # Un seul mois à rendre (ou un seul cœur) : pas de coût de transfert vers le pool
+            for i in missing:
+                results[i] = _render_month_worker(months[i][2], months[i][0], months[i][1], selected_vehicles)
+        
+        for i in missing:
+            PdfCache.put(keys[i], results[i])
+        
+        return [(m_start, m_end, pdf_bytes) for (m_start, m_end, _), pdf_bytes in zip(months, results)]
+    
+    @staticmethod
+    def render_combined(df, start_date, end_date, selected_vehicles):
+        """Un seul PDF : une section (nouvelle page) par mois de la période"""
+        engine = PdfRenderEngine.get_instance()
+        elements = []
+        for m_start, m_end, df_month in _split_months(df, start_date, end_date, selected_vehicles):
+            if elements:
+                elements.append(PageBreak())
+            elements.extend(engine.monthly_note_elements(
+                add_cost_columns_creg(df_month.copy()), m_start, m_end, selected_vehicles
+            ))
+        return engine.render(elements) if elements else None
+
+
+def generate_monthly_pdfs_batch(df, start_date, end_date, selected_vehicles, output='zip'):
+    """
+    Notes de frais de chaque mois de la période.
+    
+    Args:
+        output: 'zip' (un PDF par mois, rendus en parallèle) ou 'pdf' (document combiné)
+    
+    Returns:
+        tuple (octets, nom de fichier), ou None si aucune session
+    """
+    if output == 'pdf':
+        pdf_bytes = PdfBatchRenderer.render_combined(df, start_date, end_date, selected_vehicles)
+        if pdf_bytes is None:
+            return None
+        return pdf_bytes, f"notes_frais_mensuelles_{start_date}_{end_date}.pdf"
+    
+    notes = PdfBatchRenderer.render_months(df, start_date, end_date, selected_vehicles)
+    if not notes:
+        return None
+    
+    buffer = io.BytesIO()
+    # Les PDF sont déjà compressés : simple archivage
+    with zipfile.ZipFile(buffer, 'w', zipfile.ZIP_STORED) as archive:
+        for m_start, m_end, pdf_bytes in notes:
+            archive.writestr(f"note_frais_mensuelle_{m_start}_{m_end}.pdf", pdf_bytes)
+    return buffer.getvalue(), f"notes_frais_mensuelles_{start_date}_{end_date}.zip"
+
+
+def generate_monthly_pdfs_batch_data(df, start_date, end_date, selected_vehicles, output='zip'):
+    """Version dashboard de generate_monthly_pdfs_batch (téléchargement dcc.Download)"""
+    if df is None or not selected_vehicles:
+        return None
+    
+    result = generate_monthly_pdfs_batch(df, start_date, end_date, selected_vehicles, output)
+    if result is None:
+        return None
+    return dcc.send_bytes(*result)
+
+
+def annual_period(start_date, end_date=None):
+    """Période de 12 mois du rapport : la période donnée si elle couvre 12 mois, sinon 12 mois depuis le début"""
+    start = pd.to_datetime(start_date).date()
+    if end_date and is_12_months_period(start_date, end_date):
+        return start, pd.to_datetime(end_date).date()
+    return start, calculate_end_date_12_months(start_date)
+
+
+def _annual_summary(df_selected):
+    """
+    Agrégat du rapport annuel en une passe groupée : kWh, coût CREG et nombre de
+    sessions par mois et par borne (bornes dans l'ordre des sessions sélectionnées)
+    """
+    df_priced = add_cost_columns_creg(df_selected.copy())
+    summary = df_priced.groupby(
+        [df_priced['startTime'].dt.to_period('M').rename('month'), 'rfid'], observed=True
+    ).agg(
+        kwh=('energyConsumed_kWh', 'sum'),
+        cost=('cost', 'sum'),
+        sessions=('cost', 'size')
+    ).reset_index()
+    summary['quarter'] = summary['month'].map(lambda p: get_quarter_from_date(p.start_time))
+    return summary
+
+
+def generate_annual_report(df, start_date, selected_vehicles, end_date=None):
+    """
+    Rapport annuel : un document unique avec le détail par mois et par borne.
+    
+    Returns:
+        tuple (octets, nom de fichier), ou None si aucune session
+    """
+    start, end = annual_period(start_date, end_date)
+    vehicles = list(dict.fromkeys(selected_vehicles))
+    
+    df_selected = _select_monthly_sessions(df, start, end, vehicles)[PDF_KEY_COLUMNS]
+    if df_selected.empty:
+        return None
+    filename = f"rapport_annuel_{start}_{end}.pdf"
+    
+    key = PdfCache.make_key(df_selected, start, end, vehicles, datetime.now().date(), kind='annual')
+    pdf_bytes = PdfCache.get(key)
+    if pdf_bytes is None:
+        # Ordre des bornes du rapport = ordre de sélection
+        df_selected = df_selected.assign(rfid=pd.Categorical(df_selected['rfid'], categories=vehicles))
+        engine = PdfRenderEngine.get_instance()
+        pdf_bytes = engine.render(engine.annual_report_elements(_annual_summary(df_selected), start, end))
+        PdfCache.put(key, pdf_bytes)
+    return pdf_bytes, filename
+
+
+def generate_annual_pdf_data(df, start_date, end_date, selected_vehicles):
+    """Version dashboard de generate_annual_report (téléchargement dcc.Download)"""
+    if df is None or not selected_vehicles or not start_date:
+        return None
+    
+    result = generate_annual_report(df, start_date, selected_vehicles, end_date)
+    if result is None:
+        return None
+    return dcc.send_bytes(*result)
+
+
+def generate_monthly_pdf_data(df, start_date, end_date, selected_vehicles, region=None):
+    """Génère la note de frais mensuelle basée sur les tarifs CREG (DataFrame issu du DatasetCache)"""
+    if df is None or not selected_vehicles:
+        return None
+    
+    # Créer le PDF en mémoire (ou le reprendre du cache)
+    pdf_bytes = _render_monthly_note_cached(df, start_date, end_date, selected_vehicles)
     
     filename = f"note_frais_mensuelle_{start_date}_{end_date}.pdf"
     
-    return dcc.send_bytes(buffer.getvalue(), filename)
+    return dcc.send_bytes(pdf_bytes, filename)
 
 
 def generate_monthly_pdf_auto(df, start_date, end_date, selected_vehicles, region=None):
@@ -178,162 +562,35 @@ def generate_monthly_pdf_auto(df, start_date, end_date, selected_vehicles, regio
     if isinstance(end_date, str):
         end_date = pd.to_datetime(end_date).date()
     
-    # Préparer les données (parsing identique à avant)
-    df['startTime'] = pd.to_datetime(df['De'])
-    df['endTime'] = pd.to_datetime(df['À'])
-    df['rfid'] = df['Nom de la borne de recharge']
-    
-    def parse_duration(duration_str):
-        try:
-            parts = duration_str.strip().split(':')
-            hours = int(parts[0])
-            minutes = int(parts[1])
-            return hours * 60 + minutes
-        except:
-            return 0
-    
-    df['durationMinutes'] = df['Durée [h:mm]'].apply(parse_duration)
-    df['energyConsumed_kWh'] = df['kWh'].astype(str).str.replace(',', '.').astype(float)
-    
-    # Filtrer par période et véhicules
-    mask = (df['startTime'].dt.date >= start_date) & \
-           (df['startTime'].dt.date <= end_date) & \
-           (df['rfid'].isin(selected_vehicles))
-    df_filtered = df[mask].copy()
+    # Préparer les données : les colonnes normalisées (SmappeeClient) sont utilisées telles quelles,
+    # sinon on les reconstruit depuis les colonnes d'affichage de l'export
+    df = df.copy()
+    if 'startTime' not in df.columns:
+        df['startTime'] = pd.to_datetime(df['De'])
+        df['endTime'] = pd.to_datetime(df['À'])
+        
+        def parse_duration(duration_str):
+            try:
+                parts = duration_str.strip().split(':')
+                hours = int(parts[0])
+                minutes = int(parts[1])
+                return hours * 60 + minutes
+            except:
+                return 0
+        
+        df['durationMinutes'] = df['Durée [h:mm]'].apply(parse_duration)
+        df['energyConsumed_kWh'] = df['kWh'].astype(str).str.replace(',', '.').astype(float)
+    if 'rfid' not in df.columns:
+        df['rfid'] = df['Nom de la borne de recharge']
     
-    # Calculer le coût avec tarifs CREG
-    df_filtered['tariff_creg'] = df_filtered['startTime'].apply(
-        lambda x: get_tariff_for_period(x, x)
-    )
-    df_filtered['cost'] = df_filtered['energyConsumed_kWh'] * df_filtered['tariff_creg']
+    pdf_bytes = _render_monthly_note_cached(df, start_date, end_date, selected_vehicles)
     
     # Créer le nom de fichier unique
     timestamp = datetime.now().strftime('%Y%m%d_%H%M%S')
     filename = f"note_frais_{start_date}_{end_date}_{timestamp}.pdf"
     pdf_path = os.path.join(Config.PDF_OUTPUT_DIR, filename)
     
-    # Créer le PDF (même logique que generate_monthly_pdf_data)
-    doc = SimpleDocTemplate(
-        pdf_path,
-        pagesize=A4,
-        topMargin=1*cm,
-        bottomMargin=2*cm,
-        leftMargin=2*cm,
-        rightMargin=2*cm
-    )
-    
-    elements = []
-    styles = getSampleStyleSheet()
-    
-    # Styles personnalisés
-    title_style = ParagraphStyle(
-        'CustomTitle',
-        parent=styles['Heading1'],
-        fontSize=18,
-        textColor=colors.HexColor(Config.SAGE_GREEN),
-        spaceAfter=12,
-        alignment=TA_CENTER
-    )
-    
-    subtitle_style = ParagraphStyle(
-        'CustomSubtitle',
-        parent=styles['Normal'],
-        fontSize=12,
-        textColor=colors.HexColor('#555555'),
-        spaceAfter=20,
-        alignment=TA_CENTER
-    )
-    
-    heading_style = ParagraphStyle(
-        'CustomHeading',
-        parent=styles['Heading2'],
-        fontSize=13,
-        textColor=colors.HexColor(Config.SAGE_GREEN),
-        spaceAfter=12,
-        spaceBefore=16,
-        fontName='Helvetica-Bold'
-    )
-    
-    # Logo
-    try:
-        logo = Image(Config.LOGO_PATH, width=Config.LOGO_WIDTH_CM*cm, height=Config.LOGO_HEIGHT_CM*cm)
-        logo.hAlign = 'LEFT'
-        elements.append(logo)
-        elements.append(Spacer(1, 0.5*cm))
-    except:
-        pass
-    
-    # Titre
-    elements.append(Paragraph("Note de frais mensuelle - Recharge de véhicule électrique", title_style))
-    
-    start_dt = pd.to_datetime(start_date)
-    periode_text = f"{MOIS_FR[start_dt.month]} {start_dt.year}"
-    
-    elements.append(Paragraph(periode_text, subtitle_style))
-    
-    date_now = datetime.now()
-    elements.append(Paragraph(f"Document émis le {date_now.strftime('%d/%m/%Y')}", styles['Normal']))
-    elements.append(Spacer(1, 0.6*cm))
-    
-    # Note CREG
-    quarter = get_quarter_from_date(start_date)
-    note_text = f"<b>Tarif appliqué :</b> Tarif CREG {quarter}<br/>" \
-                "Le tarif CREG (Commission de Régulation de l'Électricité et du Gaz) est utilisé par le SPF Finances " \
-                "pour le calcul du remboursement des frais d'électricité liés à la recharge à domicile."
-    elements.append(Paragraph(note_text, styles['Normal']))
-    elements.append(Spacer(1, 0.8*cm))
-    
-    # Tarif appliqué
-    elements.append(Paragraph("Tarif CREG appliqué", heading_style))
-    avg_tariff = get_tariff_for_period(start_date, end_date)
-    elements.append(Paragraph(
-        f"{quarter} : {avg_tariff:.4f} € HTVA/kWh (soit {avg_tariff*1.06:.4f} € TVAC/kWh)",
-        styles['Normal']
-    ))
-    elements.append(Spacer(1, 0.8*cm))
-    
-    # Montant à rembourser
-    total_cost = df_filtered['cost'].sum()
-    
-    for vehicle in selected_vehicles:
-        elements.append(Paragraph("Montant à rembourser", heading_style))
-        
-        vehicle_data = df_filtered[df_filtered['rfid'] == vehicle]
-        vehicle_cost = vehicle_data['cost'].sum()
-        vehicle_kwh = vehicle_data['energyConsumed_kWh'].sum()
-        
-        table_data = [['Description', 'Consommation (kWh)', 'Montant (EUR)']]
-        table_data.append([
-            f"{MOIS_FR[start_dt.month]} {start_dt.year}",
-            f"{vehicle_kwh:.3f}",
-            f"{vehicle_cost:.2f} €"
-        ])
-        
-        monthly_table = Table(table_data, colWidths=[6*cm, 4*cm, 4*cm])
-        monthly_table.setStyle(TableStyle([
-            ('BACKGROUND', (0, 0), (-1, 0), colors.HexColor(Config.DARK_GREY)),
-            ('TEXTCOLOR', (0, 0), (-1, 0), colors.whitesmoke),
-            ('ALIGN', (0, 0), (-1, -1), 'CENTER'),
-            ('FONTNAME', (0, 0), (-1, 0), 'Helvetica-Bold'),
-            ('FONTSIZE', (0, 0), (-1, 0), 10),
-            ('BOTTOMPADDING', (0, 0), (-1, 0), 10),
-            ('TOPPADDING', (0, 0), (-1, 0), 10),
-            ('BACKGROUND', (0, 1), (-1, -1), colors.HexColor(Config.LIGHT_GREY)),
-            ('GRID', (0, 0), (-1, -1), 0.5, colors.HexColor('#cccccc')),
-            ('FONTNAME', (0, 1), (-1, -1), 'Helvetica'),
-            ('FONTSIZE', (0, 1), (-1, -1), 9),
-            ('TOPPADDING', (0, 1), (-1, -1), 6),
-            ('BOTTOMPADDING', (0, 1), (-1, -1), 6),
-        ]))
-        
-        elements.append(monthly_table)
-        elements.append(Spacer(1, 0.8*cm))
-    
-    # Message de synthèse
-    summary_text = f"Une note de frais de <b>{total_cost:.2f} €</b> peut être réalisée pour le mois de {MOIS_FR[start_dt.month]} {start_dt.year}."
-    elements.append(Paragraph(summary_text, styles['Normal']))
-    
-    # Générer le PDF
-    doc.build(elements)
-    
-    return pdf_path
\ No newline at end of file
+    # Écrire le PDF (même moteur et même cache que generate_monthly_pdf_data)
+    with open(pdf_path, 'wb') as f:
+        f.write(pdf_bytes)
+    return pdf_path
@@ -0,0 +1,95 @@
+"""
+Pré-vérification des connexions (Smappee OAuth, login SMTP) avant une automatisation.
+Les deux sondes tournent en parallèle avec un délai maximal chacune ; un succès est
+réutilisé pendant PRECHECK_CACHE_TTL secondes, de sorte que le bouton manuel et le
+job lancé juste après partagent la même vérification.
+"""
+import hashlib
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, TimeoutError as FutureTimeoutError
+
+from config import Config
+from src.smappee_client import SmappeeClient
+from src.email_notifier import EmailNotifier
+
+
+def _probe_smappee(client_id, client_secret):
+    return SmappeeClient(client_id, client_secret).test_connection()
+
+
+def _probe_smtp(server, port, user, password, timeout):
+    return EmailNotifier(server, int(port), user, password).test_connection(timeout=timeout)
+
+
+class ConnectivityPrecheck:
+    """Sondes de connectivité concurrentes avec cache TTL des succès"""
+
+    _cache = {}
+    _inflight = {}
+    _lock = threading.Lock()
+    _executor = ThreadPoolExecutor(max_workers=4, thread_name_prefix='precheck')
+
+    @staticmethod
+    def _cache_key(name, settings):
+        # Les secrets ne sont gardés en mémoire que sous forme d'empreinte
+        digest = hashlib.sha1(repr(settings).encode('utf-8')).hexdigest()
+        return f"{name}:{digest}"
+
+    @classmethod
+    def _submit(cls, name, settings, probe, *args):
+        """Résultat en cache, sonde déjà en cours pour les mêmes paramètres, ou nouvelle sonde"""
+        key = cls._cache_key(name, settings)
+        with cls._lock:
+            cached = cls._cache.get(key)
+            if cached and cached[0] > time.monotonic():
+                return key, cached[1]
+            future = cls._inflight.get(key)
+            if future is not None:
+                return key, future
+            future = cls._executor.submit(probe, *args)
+            cls._inflight[key] = future
+        # Hors du verrou : une sonde déjà terminée exécute le callback immédiatement
+        future.add_done_callback(lambda f, k=key: cls._on_done(k, f))
+        return key, future
+
+    @classmethod
+    def _on_done(cls, key, future):
+        with cls._lock:
+            cls._inflight.pop(key, None)
+            if not future.cancelled() and future.exception() is None and future.result()[0]:
+                cls._cache[key] = (time.monotonic() + Config.PRECHECK_CACHE_TTL, future.result())
+
+    @classmethod
+    def check(cls, smappee=None, smtp=None, timeout=None):
+        """
+        Vérifie les connexions demandées en parallèle.
+
+        Args:
+            smappee: tuple (client_id, client_secret) ou None
+            smtp: tuple (server, port, user, password) ou None
+            timeout: délai max par sonde en secondes (défaut: Config.PRECHECK_TIMEOUT)
+
+        Returns:
+            dict {'smappee': (ok, message), 'smtp': (ok, message)} pour les sondes demandées
+        """
+        timeout = timeout or Config.PRECHECK_TIMEOUT
+        pending = {}
+        if smappee is not None:
+            pending['smappee'] = cls._submit('smappee', tuple(smappee), _probe_smappee, *smappee)
+        if smtp is not None:
+            pending['smtp'] = cls._submit('smtp', tuple(smtp), _probe_smtp, *smtp, timeout)
+
+        deadline = time.monotonic() + timeout
+        results = {}
+        for name, (key, outcome) in pending.items():
+            if isinstance(outcome, tuple):
+                results[name] = outcome
+                continue
+            try:
+                results[name] = outcome.result(timeout=max(deadline - time.monotonic(), 0))
+            except FutureTimeoutError:
+                results[name] = (False, f"Délai dépassé ({timeout}s)")
+            except Exception as e:
+                results[name] = (False, f"Erreur de connexion: {str(e)}")
+        return results
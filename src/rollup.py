@@ -0,0 +1,177 @@
+"""
+Cube d'agrégats matérialisés pour les graphiques du dashboard
+Une ligne par jour et par borne (kWh, coût CREG, nombre de sessions, histogramme
+des durées) : les graphiques d'une période et d'une sélection de véhicules se
+calculent en sommant quelques centaines de lignes au lieu des sessions brutes.
+"""
+import threading
+from collections import OrderedDict
+
+import pandas as pd
+
+from src.utils import CregTariffEngine, DAYS_ORDER, DAYS_FR
+
+
+class RollupCube:
+    """Agrégats par (jour, borne) d'un jeu de données, construits une fois puis étendus"""
+    # Cubes déjà construits {(clé du jeu de données, version des tarifs): RollupCube}
+    _cubes = OrderedDict()
+    _lock = threading.Lock()
+    MAX_CUBES = 8
+
+    def __init__(self, rows, durations, watermark=None, n_sessions=0):
+        self.rows = rows            # colonnes: day, rfid, energy, cost, sessions
+        self.durations = durations  # même index, une colonne par durée arrondie (heures)
+        self.watermark = watermark  # startTime le plus récent agrégé
+        self.n_sessions = n_sessions
+
+    # ------------------------------------------------------------------
+    # Construction
+    # ------------------------------------------------------------------
+
+    @staticmethod
+    def _aggregate(df):
+        """Agrège des sessions brutes en lignes (jour, borne) + histogramme des durées"""
+        start_times = pd.to_datetime(df['startTime'])
+        sessions = pd.DataFrame({
+            'day': start_times.dt.normalize(),
+            'rfid': df['rfid'].astype(str),
+            'energy': df['energyConsumed_kWh'].astype(float),
+            'tariff': CregTariffEngine.get_instance().price_dates(start_times),
+            'duration_h': (df['durationMinutes'].fillna(0) / 60).round().astype('int64'),
+        })
+        sessions['cost'] = sessions['energy'] * sessions['tariff']
+
+        grouped = sessions.groupby(['day', 'rfid'], sort=True)
+        rows = grouped.agg(energy=('energy', 'sum'), cost=('cost', 'sum'), sessions=('energy', 'size'))
+        durations = sessions.groupby(['day', 'rfid', 'duration_h']).size().unstack(fill_value=0)
+        durations = durations.reindex(rows.index, fill_value=0)
+        return rows, durations
+
+    @staticmethod
+    def _assemble(rows, durations):
+        rows = rows.reset_index()
+        durations = durations.reset_index(drop=True)
+        durations.columns = durations.columns.astype('int64')
+        return rows, durations.sort_index(axis=1)
+
+    @classmethod
+    def build(cls, df):
+        """Construit le cube complet d'un jeu de sessions"""
+        rows, durations = cls._aggregate(df)
+        rows, durations = cls._assemble(rows, durations)
+        watermark = pd.to_datetime(df['startTime']).max() if len(df) else None
+        return cls(rows, durations, watermark, len(df))
+
+    def extend(self, df):
+        """
+        Étend le cube avec un jeu de données qui contient les sessions déjà agrégées
+        plus de nouvelles sessions postérieures au watermark.
+        Retourne None si le jeu de données n'est pas une extension de celui du cube.
+        """
+        start_times = pd.to_datetime(df['startTime'])
+        known = start_times <= self.watermark if self.watermark is not None else start_times.isna()
+        known_energy = df.loc[known, 'energyConsumed_kWh'].astype(float).sum()
+        if int(known.sum()) != self.n_sessions or abs(known_energy - self.rows['energy'].sum()) > 1e-6:
+            return None
+
+        new_sessions = df[~known]
+        if new_sessions.empty:
+            return self
+
+        new_rows, new_durations = self._aggregate(new_sessions)
+        old_rows = self.rows.set_index(['day', 'rfid'])
+        old_durations = self.durations.set_index(old_rows.index)
+
+        rows = pd.concat([old_rows, new_rows]).groupby(level=['day', 'rfid']).sum()
+        durations = pd.concat([old_durations, new_durations]).fillna(0).groupby(level=['day', 'rfid']).sum()
+        rows, durations = self._assemble(rows, durations.reindex(rows.index, fill_value=0).astype('int64'))
+        return RollupCube(rows, durations, start_times.max(), len(df))
+
+    @classmethod
+    def for_dataset(cls, dataset_key, df, previous_key=None):
+        """
+        Retourne le cube d'un jeu de données (construit une seule fois par version des tarifs).
+        Si le cube du jeu précédent est disponible, il est étendu avec les nouvelles sessions.
+        """
+        version = CregTariffEngine.get_instance().version
+        cache_key = (dataset_key, version)
+        with cls._lock:
+            cube = cls._cubes.get(cache_key)
+            if cube is not None:
+                cls._cubes.move_to_end(cache_key)
+                return cube
+            previous = cls._cubes.get((previous_key, version)) if previous_key else None
+
+        cube = previous.extend(df) if previous is not None else None
+        if cube is None:
+            cube = cls.build(df)
+
+        with cls._lock:
+            cls._cubes[cache_key] = cube
+            while len(cls._cubes) > cls.MAX_CUBES:
+                cls._cubes.popitem(last=False)
+        return cube
+
+    # ------------------------------------------------------------------
+    # Requêtes
+    # ------------------------------------------------------------------
+
+    def select(self, start_date, end_date, selected_vehicles):
+        """Sous-cube d'une période (bornes incluses) et d'une sélection de véhicules"""
+        mask = (self.rows['day'] >= pd.to_datetime(start_date).normalize()) & \
+               (self.rows['day'] <= pd.to_datetime(end_date).normalize()) & \
+               (self.rows['rfid'].isin([str(v) for v in selected_vehicles]))
+        return RollupCube(self.rows[mask], self.durations[mask],
+                          self.watermark, int(self.rows.loc[mask, 'sessions'].sum()))
+
+    @property
+    def empty(self):
+        return self.rows.empty
+
+    def statistics(self):
+        """Équivalent de calculate_statistics"""
+        total_sessions = int(self.rows['sessions'].sum())
+        total_consumption = self.rows['energy'].sum()
+        return {
+            'total_consumption': total_consumption,
+            'total_cost': self.rows['cost'].sum(),
+            'avg_session': total_consumption / total_sessions if total_sessions else float('nan'),
+            'total_sessions': total_sessions
+        }
+
+    def weekly_data(self):
+        """Équivalent de prepare_weekly_data"""
+        weekly_data = self.rows.groupby(self.rows['day'].dt.to_period('W').rename('week')).agg(
+            cost=('cost', 'sum'), energyConsumed_kWh=('energy', 'sum')
+        ).reset_index()
+        weekly_data['week_date'] = weekly_data['week'].apply(lambda x: x.start_time)
+        return weekly_data
+
+    def monthly_data(self):
+        """Équivalent de prepare_monthly_data"""
+        monthly_data = self.rows.groupby(self.rows['day'].dt.to_period('M').rename('month')).agg(
+            cost=('cost', 'sum'), energyConsumed_kWh=('energy', 'sum')
+        ).reset_index()
+        monthly_data['month_str'] = monthly_data['month'].astype(str)
+        monthly_data['month_date'] = monthly_data['month'].apply(lambda x: x.to_timestamp())
+        return monthly_data
+
+    def daily_consumption(self):
+        """Équivalent de prepare_daily_consumption"""
+        weekly_consumption = self.rows.groupby(self.rows['day'].dt.day_name().rename('day_of_week'))['energy'] \
+            .sum().reindex(DAYS_ORDER).rename('energyConsumed_kWh').reset_index()
+        weekly_consumption['day_fr'] = DAYS_FR
+        return weekly_consumption
+
+    def duration_distribution(self):
+        """Équivalent de prepare_duration_distribution"""
+        counts = self.durations.sum()
+        counts = counts[counts > 0]
+        if counts.empty:
+            return pd.DataFrame({'durationHours_rounded': [], 'sessions': []})
+        hours = range(int(counts.index.min()), int(counts.index.max()) + 1)
+        return pd.DataFrame({
+            'durationHours_rounded': [float(h) for h in hours],
+            'sessions': [float(counts.get(h, 0)) for h in hours],
+        })
@@ -0,0 +1,47 @@
+"""
+Synchronisation incrémentale des sessions Smappee vers la table charging_sessions
+Seule la fenêtre postérieure à la dernière session stockée (plus un léger
+chevauchement) est redemandée à l'API.
+"""
+from datetime import datetime, timedelta
+
+from config import Config
+from src.database import AutomationDB
+
+
+def sync_charging_sessions(client, location_id, db=None, now=None, on_chunk=None):
+    """
+    Récupère les nouvelles sessions depuis Smappee et les insère dans la base.
+
+    Args:
+        client: SmappeeClient authentifié (ou authentifiable)
+        location_id: ID de la service location
+        db: Instance AutomationDB (optionnelle)
+        now: Fin de la fenêtre de synchronisation (défaut: maintenant)
+        on_chunk: Callback de progression (tranches terminées, total)
+
+    Returns:
+        Nombre de nouvelles sessions insérées, ou None en cas d'erreur API
+    """
+    db = db or AutomationDB()
+    now = now or datetime.now()
+    
+    last_start = db.get_last_session_start(location_id)
+    if last_start is None:
+        # Première synchronisation : depuis le début de l'année (comportement historique)
+        window_start = datetime(now.year, 1, 1)
+    else:
+        # Chevauchement pour rattraper les sessions terminées après la dernière synchro
+        window_start = last_start.to_pydatetime() - timedelta(hours=Config.SMAPPEE_SYNC_OVERLAP_HOURS)
+    
+    print(f"🔄 Synchronisation Smappee : {window_start.isoformat()} → {now.isoformat()}")
+    # Au-delà d'un mois (rattrapage), on récupère par tranches mensuelles en parallèle
+    chunk = 'month' if (now - window_start).days > 31 else None
+    df = client.get_charging_sessions(location_id, window_start.isoformat(), now.isoformat(),
+                                      chunk=chunk, on_chunk=on_chunk)
+    if df is None:
+        return None
+    
+    inserted = db.upsert_sessions(location_id, df)
+    print(f"💾 {len(df)} sessions reçues, {inserted} nouvelles enregistrées.")
+    return inserted
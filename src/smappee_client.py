@@ -4,23 +4,107 @@ Client pour l'API Smappee (Compatible v3)
 Gère l'authentification OAuth2 et la récupération des sessions.
 """
 import requests
+from requests.adapters import HTTPAdapter
+import numpy as np
 import pandas as pd
-from datetime import datetime
+from concurrent.futures import ThreadPoolExecutor, as_completed
+import threading
 import time
 
+from config import Config
+
+# Fréquences pandas des tranches supportées par la récupération parallèle
+CHUNK_FREQUENCIES = {'month': 'MS', 'week': 'W-MON'}
+
+# Les changements d'heure tombent sur des demi-heures : le décalage local est constant par tranche
+_UTC_OFFSET_BUCKET_MS = 30 * 60 * 1000
+
+
+def _epoch_ms_to_local(epoch_ms):
+    """
+    Convertit des timestamps epoch (ms) en datetime64 locaux naïfs, comme datetime.fromtimestamp.
+    Le décalage UTC n'est calculé qu'une fois par demi-heure distincte.
+    """
+    values = epoch_ms.to_numpy(dtype='int64')
+    buckets = values // _UTC_OFFSET_BUCKET_MS
+    unique_buckets, positions = np.unique(buckets, return_inverse=True)
+    offsets_ms = np.array(
+        [time.localtime(int(b) * _UTC_OFFSET_BUCKET_MS // 1000).tm_gmtoff * 1000 for b in unique_buckets],
+        dtype='int64'
+    )
+    local = pd.to_datetime(values + offsets_ms[positions], unit='ms')
+    return pd.Series(local, index=epoch_ms.index)
+
+class _SmappeeConnection:
+    """
+    État partagé par client_id dans tout le processus :
+    session HTTP keep-alive (pool de connexions) et jeton OAuth en cache.
+    """
+    def __init__(self):
+        self.session = requests.Session()
+        pool_size = max(Config.SMAPPEE_FETCH_WORKERS, 1) * 2
+        adapter = HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size)
+        self.session.mount('https://', adapter)
+        self.session.mount('http://', adapter)
+        self.client_secret = None
+        self.access_token = None
+        self.token_expiry = 0
+        self.lock = threading.Lock()
+
+
 class SmappeeClient:
+    # Registre process-wide {client_id: _SmappeeConnection}
+    _registry = {}
+    _registry_lock = threading.Lock()
+
     def __init__(self, client_id, client_secret):
         # URL de production standard pour l'API v3
         self.base_url = "https://app1pub.smappee.net/dev/v3"
         self.client_id = client_id
         self.client_secret = client_secret
-        self.access_token = None
-        self.token_expiry = 0
+        self._conn = self._get_connection(client_id, client_secret)
+
+    @classmethod
+    def _get_connection(cls, client_id, client_secret):
+        """Retourne la connexion partagée du client_id (le jeton est oublié si le secret change)"""
+        with cls._registry_lock:
+            conn = cls._registry.get(client_id)
+            if conn is None:
+                conn = _SmappeeConnection()
+                cls._registry[client_id] = conn
+        with conn.lock:
+            if conn.client_secret != client_secret:
+                conn.client_secret = client_secret
+                conn.access_token = None
+                conn.token_expiry = 0
+        return conn
+
+    @property
+    def access_token(self):
+        return self._conn.access_token
+
+    @access_token.setter
+    def access_token(self, value):
+        self._conn.access_token = value
+
+    @property
+    def token_expiry(self):
+        return self._conn.token_expiry
+
+    @token_expiry.setter
+    def token_expiry(self, value):
+        self._conn.token_expiry = value
+
+    def _token_is_valid(self):
+        # Un jeton obtenu avec un autre secret (ex: test d'un nouvel identifiant) n'est pas réutilisé
+        return (bool(self.access_token) and time.time() <= self.token_expiry
+                and self._conn.client_secret == self.client_secret)
     
-    def authenticate(self):
+    def authenticate(self, force=False):
         """
         Authentification OAuth2 pour obtenir un access token.
-        Utilise le flux 'client_credentials'.
+        Utilise le flux 'client_credentials'. Le jeton est partagé par toutes les
+        instances du même client_id jusqu'à son expiration (sauf si force=True).
         """
         token_url = f"{self.base_url}/oauth2/token"
         
@@ -31,34 +115,41 @@ class SmappeeClient:
             'client_secret': self.client_secret
         }
         
-        try:
-            print("🔑 Tentative d'authentification Smappee...")
-            response = requests.post(token_url, data=data)
-            
-            if response.status_code == 200:
-                token_data = response.json()
-                self.access_token = token_data.get('access_token')
-                # Calcul de l'expiration (buffer de 60s par sécurité)
-                expires_in = token_data.get('expires_in', 3600)
-                self.token_expiry = time.time() + expires_in - 60
-                print("✅ Authentification Smappee réussie")
+        with self._conn.lock:
+            if not force and self._token_is_valid():
                 return True
-            else:
-                print(f"❌ Erreur auth Smappee ({response.status_code}): {response.text}")
-                return False
+            
+            try:
+                print("🔑 Tentative d'authentification Smappee...")
+                response = self._conn.session.post(token_url, data=data, timeout=Config.SMAPPEE_HTTP_TIMEOUT)
                 
-        except Exception as e:
-            print(f"❌ Exception lors de l'auth Smappee: {str(e)}")
-            return False
+                if response.status_code == 200:
+                    token_data = response.json()
+                    self._conn.client_secret = self.client_secret
+                    self.access_token = token_data.get('access_token')
+                    # Calcul de l'expiration (buffer de 60s par sécurité)
+                    expires_in = token_data.get('expires_in', 3600)
+                    self.token_expiry = time.time() + expires_in - 60
+                    print("✅ Authentification Smappee réussie")
+                    return True
+                else:
+                    self.access_token = None
+                    print(f"❌ Erreur auth Smappee ({response.status_code}): {response.text}")
+                    return False
+                    
+            except Exception as e:
+                print(f"❌ Exception lors de l'auth Smappee: {str(e)}")
+                return False
     
     def _ensure_token(self):
         """Vérifie si le token est valide, sinon ré-authentifie"""
-        if not self.access_token or time.time() > self.token_expiry:
+        if not self._token_is_valid():
             print("🔄 Renouvellement du token Smappee...")
             return self.authenticate()
         return True
 
-    def get_charging_sessions(self, location_id, start_date_iso, end_date_iso):
+    def get_charging_sessions(self, location_id, start_date_iso, end_date_iso,
+                              chunk=None, max_workers=None, on_chunk=None):
         """
         Récupère les sessions de recharge pour une période.
         
@@ -66,6 +157,9 @@ class SmappeeClient:
             location_id (str): ID de la service location
             start_date_iso (str): Date de début (ISO format YYYY-MM-DD)
             end_date_iso (str): Date de fin (ISO format YYYY-MM-DD)
+            chunk (str): None (un seul appel), 'month' ou 'week' (tranches récupérées en parallèle)
+            max_workers (int): Taille du pool de threads en mode tranches
+            on_chunk (callable): Appelé avec (tranches terminées, total) à chaque tranche reçue
         """
         if not self._ensure_token():
             return None
@@ -88,92 +182,170 @@ class SmappeeClient:
             print(f"❌ Erreur de conversion des dates: {e}")
             return None
 
-        # 2. Construction de la requête
+        if chunk is None:
+            try:
+                print(f"📡 Appel API Smappee (Location ID: {location_id})...")
+                data = self._fetch_window(location_id, from_ts, to_ts)
+                print(f"📥 {len(data)} sessions brutes reçues.")
+                if on_chunk:
+                    on_chunk(1, 1)
+                return self.convert_to_dataframe(data)
+            except Exception as e:
+                print(f"❌ {str(e)}")
+                return None
+
+        return self._get_charging_sessions_chunked(
+            location_id, dt_start, dt_end, chunk, max_workers, on_chunk
+        )
+
+    def _fetch_window(self, location_id, from_ts, to_ts):
+        """
+        Appel brut de l'endpoint des sessions pour une fenêtre [from_ts, to_ts] (ms).
+        Lève une exception en cas d'erreur pour permettre une nouvelle tentative.
+        """
         # Endpoint: /servicelocation/{id}/chargingsessions
         url = f"{self.base_url}/servicelocation/{location_id}/chargingsessions"
         
-        headers = {
-            'Authorization': f'Bearer {self.access_token}',
-            'Content-Type': 'application/json'
-        }
-        
         params = {
             'from': from_ts,
             'to': to_ts
         }
         
-        try:
-            print(f"📡 Appel API Smappee (Location ID: {location_id})...")
-            response = requests.get(url, headers=headers, params=params)
-            
-            if response.status_code == 200:
-                data = response.json()
-                print(f"📥 {len(data)} sessions brutes reçues.")
-                return self.convert_to_dataframe(data)
-            else:
-                print(f"❌ Erreur API Smappee ({response.status_code}): {response.text}")
-                return None
-                
-        except Exception as e:
-            print(f"❌ Exception lors de l'appel API: {str(e)}")
+        for attempt in range(2):
+            headers = {
+                'Authorization': f'Bearer {self.access_token}',
+                'Content-Type': 'application/json'
+            }
+            response = self._conn.session.get(url, headers=headers, params=params,
+                                              timeout=Config.SMAPPEE_HTTP_TIMEOUT)
+            # Jeton partagé révoqué côté serveur : on le renouvelle une fois
+            if response.status_code == 401 and attempt == 0 and self.authenticate(force=True):
+                continue
+            break
+        
+        if response.status_code != 200:
+            raise Exception(f"Erreur API Smappee ({response.status_code}): {response.text}")
+        return response.json()
+
+    def _get_charging_sessions_chunked(self, location_id, dt_start, dt_end, chunk, max_workers, on_chunk):
+        """Découpe la période en tranches, les récupère en parallèle et fusionne le résultat"""
+        if chunk not in CHUNK_FREQUENCIES:
+            print(f"❌ Découpage inconnu: {chunk} (attendu: {', '.join(CHUNK_FREQUENCIES)})")
             return None
+
+        # Bornes des tranches : début, chaque début de mois/semaine intermédiaire, fin
+        inner = pd.date_range(dt_start, dt_end, freq=CHUNK_FREQUENCIES[chunk], normalize=True)
+        boundaries = [dt_start] + [b for b in inner if dt_start < b <= dt_end]
+        windows = []
+        for i, window_start in enumerate(boundaries):
+            from_ts = int(window_start.timestamp() * 1000)
+            to_ts = int(boundaries[i + 1].timestamp() * 1000) - 1 if i + 1 < len(boundaries) \
+                else int(dt_end.timestamp() * 1000)
+            windows.append((from_ts, to_ts))
+
+        workers = max_workers or Config.SMAPPEE_FETCH_WORKERS
+        print(f"📡 Appel API Smappee par tranches ({len(windows)} x {chunk}, {workers} en parallèle)...")
+
+        results = {}
+        pending = list(windows)
+        done = 0
+        for attempt in range(Config.SMAPPEE_CHUNK_RETRIES + 1):
+            if not pending:
+                break
+            if attempt > 0:
+                print(f"🔁 Nouvelle tentative pour {len(pending)} tranche(s) ({attempt}/{Config.SMAPPEE_CHUNK_RETRIES})...")
+                time.sleep(attempt)
+                if not self._ensure_token():
+                    return None
+
+            failed = []
+            with ThreadPoolExecutor(max_workers=workers) as executor:
+                futures = {executor.submit(self._fetch_window, location_id, *w): w for w in pending}
+                for future in as_completed(futures):
+                    window = futures[future]
+                    try:
+                        results[window] = future.result()
+                        done += 1
+                        if on_chunk:
+                            on_chunk(done, len(windows))
+                    except Exception as e:
+                        print(f"⚠️ Tranche en échec: {e}")
+                        failed.append(window)
+            pending = failed
+
+        if pending:
+            # Un résultat partiel fausserait la synchronisation : on abandonne
+            print(f"❌ {len(pending)} tranche(s) toujours en échec, abandon.")
+            return None
+
+        data = [session for window in windows for session in results[window]]
+        print(f"📥 {len(data)} sessions brutes reçues.")
+        df = self.convert_to_dataframe(data)
+        if df.empty:
+            return df
+        # Une session à cheval sur deux tranches peut être renvoyée deux fois
+        return df.drop_duplicates(subset=['startTime', 'rfid']).reset_index(drop=True)
     
-    def convert_to_dataframe(self, data):
+    def convert_to_dataframe(self, data, display_columns=False):
         """
         Convertit les données JSON Smappee en DataFrame compatible avec l'application.
         NORMALISATION: Ajoute les colonnes 'startTime', 'endTime', 'rfid', 'energyConsumed_kWh'
         pour correspondre exactement à ce que parse_csv_contents produit.
+        
+        La conversion est colonne par colonne (epoch ms → datetime64, durée en minutes entières) ;
+        les chaînes d'affichage 'De', 'À' et 'Durée [h:mm]' ne sont produites que si
+        display_columns=True (voir add_display_columns).
         """
         if not data:
             return pd.DataFrame()
 
-        formatted_data = []
+        raw = pd.DataFrame.from_records(
+            data, columns=['startTime', 'stopTime', 'volume', 'chargingStationName']
+        )
         
-        for session in data:
-            try:
-                # Smappee renvoie des timestamps en millisecondes
-                start_ts = session.get('startTime')
-                stop_ts = session.get('stopTime')
-                
-                if not start_ts or not stop_ts:
-                    continue
-                
-                start_dt = datetime.fromtimestamp(start_ts / 1000)
-                stop_dt = datetime.fromtimestamp(stop_ts / 1000)
-                
-                # Calcul de la durée format H:MM
-                duration_seconds = (stop_dt - start_dt).total_seconds()
-                hours, remainder = divmod(duration_seconds, 3600)
-                minutes, _ = divmod(remainder, 60)
-                duration_str = f"{int(hours):02}:{int(minutes):02}"
-                
-                # Récupération de l'énergie
-                consumption = session.get('volume', 0) 
-                
-                # Nom de la borne / Connecteur
-                station_name = session.get('chargingStationName', 'Borne Smappee')
-                
-                row = {
-                    'Nom de la borne de recharge': station_name,
-                    'De': start_dt.strftime('%Y-%m-%d %H:%M:%S'),
-                    'À': stop_dt.strftime('%Y-%m-%d %H:%M:%S'),
-                    'Durée [h:mm]': duration_str,
-                    'kWh': consumption,
-                    
-                    # --- CHAMPS NORMALISÉS POUR L'APP ---
-                    'startTime': start_dt,
-                    'endTime': stop_dt,
-                    'durationMinutes': (hours * 60) + minutes,
-                    'energyConsumed_kWh': float(consumption),
-                    'rfid': station_name # Smappee n'a pas toujours de RFID explicite, on utilise le nom de la borne par défaut
-                }
-                formatted_data.append(row)
-                
-            except Exception as e:
-                print(f"⚠️ Erreur parsing session: {e}")
-                continue
-                
-        df = pd.DataFrame(formatted_data)
+        # Smappee renvoie des timestamps en millisecondes ; les sessions sans début/fin sont ignorées
+        start_ms = pd.to_numeric(raw['startTime'], errors='coerce')
+        stop_ms = pd.to_numeric(raw['stopTime'], errors='coerce')
+        valid = start_ms.notna() & stop_ms.notna() & (start_ms != 0) & (stop_ms != 0)
+        if not valid.all():
+            print(f"⚠️ {int((~valid).sum())} session(s) sans début ou fin ignorée(s)")
+            raw, start_ms, stop_ms = raw[valid], start_ms[valid], stop_ms[valid]
+        
+        start_ms = start_ms.astype('int64')
+        stop_ms = stop_ms.astype('int64')
+        
+        # Heure locale naïve, comme datetime.fromtimestamp
+        start_dt = _epoch_ms_to_local(start_ms)
+        stop_dt = _epoch_ms_to_local(stop_ms)
+        
+        # Récupération de l'énergie et du nom de la borne / connecteur
+        consumption = pd.to_numeric(raw['volume'], errors='coerce').fillna(0).astype('float64')
+        station_name = raw['chargingStationName'].fillna('Borne Smappee').astype(str)
+        
+        df = pd.DataFrame({
+            'Nom de la borne de recharge': station_name,
+            'kWh': consumption,
+            
+            # --- CHAMPS NORMALISÉS POUR L'APP ---
+            'startTime': start_dt,
+            'endTime': stop_dt,
+            'durationMinutes': (stop_ms - start_ms) // 60000,
+            'energyConsumed_kWh': consumption,
+            'rfid': station_name # Smappee n'a pas toujours de RFID explicite, on utilise le nom de la borne par défaut
+        }).reset_index(drop=True)
+        
+        if display_columns:
+            df = self.add_display_columns(df)
+        return df
+
+    @staticmethod
+    def add_display_columns(df):
+        """Ajoute les colonnes d'affichage de l'export Smappee ('De', 'À', 'Durée [h:mm]')"""
+        df = df.copy()
+        df['De'] = df['startTime'].dt.strftime('%Y-%m-%d %H:%M:%S')
+        df['À'] = df['endTime'].dt.strftime('%Y-%m-%d %H:%M:%S')
+        hours, minutes = divmod(df['durationMinutes'].astype('int64'), 60)
+        df['Durée [h:mm]'] = hours.astype(str).str.zfill(2) + ':' + minutes.astype(str).str.zfill(2)
         return df
 
     def test_connection(self):
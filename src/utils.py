@@ -12,9 +12,11 @@ sys.path.append(parent_dir)
 # ------------------------
 
 import json
+import threading
+import numpy as np
 import pandas as pd
 import base64
-import io
+import tempfile
 from datetime import datetime, timedelta
 from dateutil.relativedelta import relativedelta
 import calendar
@@ -76,6 +78,136 @@ def save_creg_tariffs(data):
     Config.ensure_data_dir()
     with open(Config.CREG_TARIFFS_JSON_FILE, 'w', encoding='utf-8') as f:
         json.dump(data, f, indent=2, ensure_ascii=False)
+    # Le moteur en mémoire doit relire le fichier au prochain appel
+    CregTariffEngine.invalidate()
+
+
+# Ordinal du trimestre de janvier 1970 (epoch numpy) : année * 4 + index du trimestre
+_EPOCH_QUARTER_ORDINAL = 1970 * 4
+
+
+def _quarter_ordinals(dates):
+    """Convertit une série/tableau de dates en ordinaux de trimestre (année * 4 + trimestre - 1)"""
+    values = pd.to_datetime(pd.Series(dates)).to_numpy(dtype='datetime64[ns]')
+    months = values.astype('datetime64[M]').astype(np.int64)
+    return months // 3 + _EPOCH_QUARTER_ORDINAL
+
+
+class CregTariffEngine:
+    """
+    Moteur de tarification CREG en mémoire.
+    Le fichier JSON est lu une seule fois puis indexé par trimestre ;
+    il est relu automatiquement lorsque sa date de modification change.
+    """
+    _instance = None
+    _instance_lock = threading.Lock()
+
+    def __init__(self, path=None):
+        self.path = path or Config.CREG_TARIFFS_JSON_FILE
+        self._lock = threading.Lock()
+        self._signature = None
+        self._index = {}  # {ordinal de trimestre: prix en €/kWh}
+
+    @classmethod
+    def get_instance(cls):
+        """Retourne l'instance partagée du processus"""
+        if cls._instance is None:
+            with cls._instance_lock:
+                if cls._instance is None:
+                    cls._instance = cls()
+        return cls._instance
+
+    @classmethod
+    def invalidate(cls):
+        """Force le rechargement de l'index au prochain accès"""
+        if cls._instance is not None:
+            cls._instance._signature = None
+
+    def _file_signature(self):
+        try:
+            stat = os.stat(self.path)
+            return (stat.st_mtime_ns, stat.st_size)
+        except OSError:
+            return None
+
+    def _refresh(self):
+        """Recharge l'index si le fichier a changé depuis la dernière lecture"""
+        signature = self._file_signature()
+        if signature is not None and signature == self._signature:
+            return
+        with self._lock:
+            signature = self._file_signature()
+            if signature is not None and signature == self._signature:
+                return
+            creg_data = load_creg_tariffs()
+            index = {}
+            for tariff in creg_data.get('tariffs', []):
+                try:
+                    quarter, year = parse_quarter(str(tariff['quarter']).strip())
+                    quarter_idx = int(quarter.upper().lstrip('Q')) - 1
+                    price = float(tariff.get('price', 0) or 0) / 100
+                except (KeyError, ValueError, IndexError, TypeError):
+                    continue
+                if not 0 <= quarter_idx <= 3:
+                    continue
+                # Comme l'ancienne recherche linéaire : la première entrée d'un trimestre l'emporte
+                index.setdefault(year * 4 + quarter_idx, price)
+            self._index = index
+            # load_creg_tariffs peut (ré)écrire le fichier : on relit la signature après coup
+            self._signature = self._file_signature()
+
+    @property
+    def version(self):
+        """Version de la table des tarifs (change à chaque modification du fichier)"""
+        self._refresh()
+        return self._signature
+
+    def get_tariff(self, date):
+        """Tarif (€/kWh) du trimestre contenant la date"""
+        self._refresh()
+        return self._index.get(int(_quarter_ordinals([date])[0]), 0)
+
+    def price_dates(self, dates):
+        """Tarifs (€/kWh) pour une colonne de dates, via une recherche vectorisée dans l'index"""
+        self._refresh()
+        ordinals = pd.Series(_quarter_ordinals(dates), index=getattr(dates, 'index', None))
+        return ordinals.map(self._index).fillna(0.0).astype(float)
+
+    def price_periods(self, starts, ends):
+        """
+        Tarifs moyens (€/kWh) pour des lots de périodes [début, fin] (bornes incluses).
+        Chaque trimestre traversé est pondéré par le nombre de jours que la période y passe :
+        le coût est en O(nombre de trimestres) et non plus en O(nombre de jours).
+        """
+        self._refresh()
+        start_days = pd.to_datetime(pd.Series(starts)).to_numpy(dtype='datetime64[ns]').astype('datetime64[D]')
+        end_days = pd.to_datetime(pd.Series(ends)).to_numpy(dtype='datetime64[ns]').astype('datetime64[D]')
+        start_q = _quarter_ordinals(start_days)
+        end_q = _quarter_ordinals(end_days)
+        # Bornes manquantes (NaT) : tarif 0, et exclues du calcul du nombre de trimestres à parcourir
+        valid = ~(np.isnat(start_days) | np.isnat(end_days))
+
+        total_days = (end_days - start_days).astype(np.int64) + 1
+        weighted_sum = np.zeros(len(start_days), dtype=float)
+        span = int((end_q[valid] - start_q[valid]).max()) + 1 if valid.any() else 0
+
+        for offset in range(max(span, 0)):
+            quarter = start_q + offset
+            # Bornes du trimestre : premier jour du trimestre et veille du suivant
+            q_start = (np.datetime64('1970-01', 'M') + (quarter - _EPOCH_QUARTER_ORDINAL) * 3).astype('datetime64[D]')
+            q_end = (np.datetime64('1970-01', 'M') + (quarter + 1 - _EPOCH_QUARTER_ORDINAL) * 3).astype('datetime64[D]') - 1
+            overlap = (np.minimum(end_days, q_end) - np.maximum(start_days, q_start)).astype(np.int64) + 1
+            overlap = np.where(valid & (quarter <= end_q), np.clip(overlap, 0, None), 0)
+            prices = pd.Series(quarter).map(self._index).fillna(0.0).to_numpy(dtype=float)
+            weighted_sum += overlap * prices
+
+        with np.errstate(divide='ignore', invalid='ignore'):
+            result = np.where(valid & (total_days > 0), weighted_sum / total_days, 0.0)
+        # Période dans un seul trimestre : tarif du trimestre, quelle que soit la durée
+        same_quarter = valid & (start_q == end_q)
+        if same_quarter.any():
+            result[same_quarter] = pd.Series(start_q[same_quarter]).map(self._index).fillna(0.0).to_numpy(dtype=float)
+        return result
 
 
 def load_prices_from_json():
@@ -121,31 +253,29 @@ def get_quarter_from_date(date):
 
 def get_tariff_for_date(date, region=None):
     """Récupère le tarif CREG pour une date donnée"""
-    creg_data = load_creg_tariffs()
-    quarter = get_quarter_from_date(date)
-    for tariff in creg_data['tariffs']:
-        if tariff['quarter'] == quarter:
-            return tariff.get('price', 0) / 100
-    return 0
+    return CregTariffEngine.get_instance().get_tariff(date)
 
 
 def get_tariff_for_period(start_date, end_date, region=None):
     """Récupère le tarif CREG moyen pour une période"""
-    start = pd.to_datetime(start_date)
-    end = pd.to_datetime(end_date)
-    
-    if get_quarter_from_date(start) == get_quarter_from_date(end):
-        return get_tariff_for_date(start)
-    
-    total_days = (end - start).days + 1
-    weighted_sum = 0
-    current = start
-    while current <= end:
-        tariff = get_tariff_for_date(current)
-        weighted_sum += tariff
-        current += timedelta(days=1)
-    
-    return weighted_sum / total_days if total_days > 0 else 0
+    return float(CregTariffEngine.get_instance().price_periods([start_date], [end_date])[0])
+
+
+def get_tariffs_for_periods(periods, region=None):
+    """
+    Récupère les tarifs CREG moyens pour un lot de périodes en un seul appel.
+
+    Args:
+        periods: Itérable de couples (début, fin)
+
+    Returns:
+        numpy.ndarray des tarifs moyens (€/kWh), dans l'ordre des périodes
+    """
+    periods = list(periods)
+    if not periods:
+        return np.array([], dtype=float)
+    starts, ends = zip(*periods)
+    return CregTariffEngine.get_instance().price_periods(starts, ends)
 
 
 def create_price_dict_from_lists(years, prices):
@@ -248,32 +378,92 @@ def get_years_from_period(start_date, end_date):
 # TRAITEMENT DES DONNÉES
 # ============================================================================
 
-def parse_csv_contents(contents, filename):
-    content_type, content_string = contents.split(',')
-    decoded = base64.b64decode(content_string)
+# Colonnes de l'export CSV Smappee utilisées par l'application (lues comme texte brut)
+CSV_IMPORT_DTYPES = {
+    'Nom de la borne de recharge': str,
+    'De': str,
+    'À': str,
+    'Durée [h:mm]': str,
+    'kWh': str,
+}
+
+# Taille des tranches base64 décodées à la fois (multiple de 4)
+_BASE64_DECODE_CHUNK = 4 * 256 * 1024
+
+
+def _decode_data_url_to_file(contents, target):
+    """Décode par tranches le contenu base64 d'une data URL (dcc.Upload) dans un fichier"""
+    offset = contents.index(',') + 1
+    for i in range(offset, len(contents), _BASE64_DECODE_CHUNK):
+        target.write(base64.b64decode(contents[i:i + _BASE64_DECODE_CHUNK]))
+    target.seek(0)
+
+
+def _normalize_csv_chunk(chunk):
+    """Transforme une tranche de l'export CSV en colonnes normalisées (opérations vectorisées)"""
+    # Durée "h:mm" → minutes ; valeur illisible → 0 (comme l'ancien parse_duration)
+    duration_parts = chunk['Durée [h:mm]'].str.strip().str.extract(r'^(\d+):(\d+)')
+    hours = pd.to_numeric(duration_parts[0], errors='coerce')
+    minutes = pd.to_numeric(duration_parts[1], errors='coerce')
+    duration_minutes = (hours * 60 + minutes).fillna(0).astype('int64')
+    
+    return pd.DataFrame({
+        'Nom de la borne de recharge': chunk['Nom de la borne de recharge'],
+        'startTime': pd.to_datetime(chunk['De']),
+        'endTime': pd.to_datetime(chunk['À']),
+        'durationMinutes': duration_minutes,
+        # kWh au format décimal belge ("12,345")
+        'energyConsumed_kWh': chunk['kWh'].str.replace(',', '.', regex=False).astype('float64'),
+        'rfid': chunk['Nom de la borne de recharge'],
+    })
+
+
+def parse_csv_contents(contents, filename, chunksize=None):
+    """
+    Importe un export CSV Smappee (data URL base64 issue de dcc.Upload).
+    Le fichier est décodé par tranches dans un fichier temporaire puis lu par blocs
+    de lignes : la mémoire consommée ne dépend plus de la taille du fichier.
+    """
+    chunksize = chunksize or Config.CSV_IMPORT_CHUNK_ROWS
     try:
-        df = pd.read_csv(io.StringIO(decoded.decode('utf-8')))
-        df['startTime'] = pd.to_datetime(df['De'])
-        df['endTime'] = pd.to_datetime(df['À'])
-        df['rfid'] = df['Nom de la borne de recharge']
-        
-        def parse_duration(duration_str):
-            try:
-                parts = duration_str.strip().split(':')
-                hours = int(parts[0])
-                minutes = int(parts[1])
-                return hours * 60 + minutes
-            except:
-                return 0
+        with tempfile.SpooledTemporaryFile(max_size=Config.CSV_IMPORT_SPOOL_BYTES, mode='w+b') as buffer:
+            _decode_data_url_to_file(contents, buffer)
+            reader = pd.read_csv(
+                buffer,
+                usecols=list(CSV_IMPORT_DTYPES),
+                dtype=CSV_IMPORT_DTYPES,
+                encoding='utf-8',
+                chunksize=chunksize
+            )
+            frames = [_normalize_csv_chunk(chunk) for chunk in reader]
         
-        df['durationMinutes'] = df['Durée [h:mm]'].apply(parse_duration)
-        df['energyConsumed_kWh'] = df['kWh'].astype(str).str.replace(',', '.').astype(float)
-        return df
+        if not frames:
+            return None
+        return pd.concat(frames, ignore_index=True)
     except Exception as e:
         print(f"Erreur lors du parsing: {e}")
         return None
 
 
+SESSION_DATETIME_COLUMNS = ['startTime', 'endTime']
+SESSION_FLOAT_COLUMNS = ['energyConsumed_kWh', 'durationMinutes']
+
+
+def normalize_session_dtypes(df):
+    """Impose des types stables aux colonnes de sessions (dates, flottants, textes)"""
+    df = df.copy()
+    for col in SESSION_DATETIME_COLUMNS:
+        if col in df.columns:
+            df[col] = pd.to_datetime(df[col])
+    for col in SESSION_FLOAT_COLUMNS:
+        if col in df.columns:
+            df[col] = pd.to_numeric(df[col], errors='coerce').astype('float64')
+    for col in df.columns:
+        if col not in SESSION_DATETIME_COLUMNS and df[col].dtype == object:
+            df[col] = df[col].astype(str)
+    return df.reset_index(drop=True)
+
+
 def filter_dataframe(df, start_date, end_date, selected_vehicles):
     mask = (df['startTime'].dt.date >= pd.to_datetime(start_date).date()) & \
            (df['startTime'].dt.date <= pd.to_datetime(end_date).date()) & \
@@ -291,9 +481,7 @@ def add_cost_columns(df_filtered, price_dict, cost_column_name='cost'):
 
 def add_cost_columns_creg(df_filtered, region=None):
     """Ajoute les colonnes de prix et coût (Méthode CREG)"""
-    df_filtered['tariff_creg'] = df_filtered['startTime'].apply(
-        lambda x: get_tariff_for_date(x)
-    )
+    df_filtered['tariff_creg'] = CregTariffEngine.get_instance().price_dates(df_filtered['startTime'])
     df_filtered['cost'] = df_filtered['energyConsumed_kWh'] * df_filtered['tariff_creg']
     return df_filtered
 
@@ -0,0 +1,61 @@
+"""
+Reprise des demandes d'automatisation et des emails interrompus (src/database.py)
+"""
+import sys
+import os
+from datetime import datetime, timedelta
+
+import pytest
+
+ROOT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT_DIR)
+
+from src.database import AutomationDB
+
+
+@pytest.fixture
+def db(tmp_path, monkeypatch):
+    monkeypatch.setattr('config.Config.DATA_DIR', str(tmp_path))
+    return AutomationDB()
+
+
+def _age(db, table, column, row_id, seconds):
+    with db._connect() as conn:
+        conn.execute(
+            f'UPDATE {table} SET {column} = ? WHERE id = ?',
+            (datetime.now() - timedelta(seconds=seconds), row_id)
+        )
+
+
+def test_requeue_skips_jobs_with_live_lease(db):
+    live, _ = db.enqueue_job('2024-01-01:2024-01-31', '2024-01-01', '2024-01-31')
+    stale, _ = db.enqueue_job('2024-02-01:2024-02-29', '2024-02-01', '2024-02-29')
+    waiting, _ = db.enqueue_job('2024-03-01:2024-03-31', '2024-03-01', '2024-03-31')
+    assert db.claim_job(live['id']) and db.claim_job(stale['id'])
+    _age(db, 'automation_jobs', 'heartbeat_at', stale['id'], 600)
+
+    assert db.requeue_interrupted_jobs(lease_seconds=120) == [stale['id'], waiting['id']]
+    assert db.get_job(live['id'])['status'] == 'running'
+    assert db.get_job(live['id'])['owner_pid'] == os.getpid()
+    assert db.get_job(stale['id'])['status'] == 'queued'
+
+
+def test_heartbeat_renews_lease(db):
+    job, _ = db.enqueue_job('2024-01-01:2024-01-31', '2024-01-01', '2024-01-31')
+    db.claim_job(job['id'])
+    _age(db, 'automation_jobs', 'heartbeat_at', job['id'], 600)
+    db.heartbeat_job(job['id'])
+
+    assert db.requeue_interrupted_jobs(lease_seconds=120) == []
+    assert db.get_job(job['id'])['status'] == 'running'
+
+
+def test_requeue_mails_skips_recent_claims(db):
+    sending = db.enqueue_mail('a@example.com', 'Note', 'Corps')
+    abandoned = db.enqueue_mail('b@example.com', 'Note', 'Corps')
+    assert len(db.claim_due_mails()) == 2
+    _age(db, 'mail_outbox', 'claimed_at', abandoned, 600)
+
+    assert db.requeue_interrupted_mails(lease_seconds=120) == 1
+    assert db.get_mail(sending)['status'] == 'sending'
+    assert db.get_mail(abandoned)['status'] == 'pending'
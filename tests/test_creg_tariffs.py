@@ -0,0 +1,38 @@
+"""
+Tarifs moyens par période du moteur CREG (src/utils.py)
+"""
+import sys
+import os
+import json
+
+import numpy as np
+import pytest
+
+ROOT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT_DIR)
+
+from src.utils import CregTariffEngine
+
+
+@pytest.fixture
+def engine(tmp_path, monkeypatch):
+    path = tmp_path / 'creg_tariffs.json'
+    path.write_text(json.dumps({'tariffs': [
+        {'quarter': 'Q1/2024', 'price': 30.0},
+        {'quarter': 'Q2/2024', 'price': 40.0},
+    ]}), encoding='utf-8')
+    monkeypatch.setattr('config.Config.CREG_TARIFFS_JSON_FILE', str(path))
+    return CregTariffEngine(str(path))
+
+
+def test_price_periods_weights_quarters_by_days(engine):
+    result = engine.price_periods(['2024-03-31', '2024-01-01'], ['2024-04-01', '2024-02-15'])
+    np.testing.assert_allclose(result, [0.35, 0.30])
+
+
+def test_price_periods_missing_bounds_price_zero(engine):
+    result = engine.price_periods(
+        [None, '2024-01-01', None, '2024-01-01'],
+        ['2024-03-01', None, None, '2024-06-30'],
+    )
+    np.testing.assert_allclose(result, [0.0, 0.0, 0.0, (91 * 0.30 + 91 * 0.40) / 182])
@@ -0,0 +1,50 @@
+"""
+Débordement sur disque du cache des jeux de données (src/dataset_cache.py)
+"""
+import sys
+import os
+
+import pandas as pd
+import pytest
+
+ROOT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT_DIR)
+
+from src.dataset_cache import DatasetCache
+
+
+@pytest.fixture
+def cache(tmp_path, monkeypatch):
+    monkeypatch.setattr('config.Config.DATASET_CACHE_DIR', str(tmp_path))
+    monkeypatch.setattr('config.Config.DATASET_CACHE_SPILL_TO_DISK', True)
+    # Un seul jeu de données en mémoire : chaque ajout déborde le précédent sur disque
+    monkeypatch.setattr('config.Config.DATASET_CACHE_MAX_BYTES', 1)
+    DatasetCache.clear()
+    yield DatasetCache
+    DatasetCache.clear()
+
+
+def _frame(seed):
+    return pd.DataFrame({'energy_kwh': [float(seed + i) for i in range(1000)]})
+
+
+def test_spill_directory_is_bounded(cache, tmp_path, monkeypatch):
+    first = cache.put(_frame(0))
+    cache.put(_frame(1))
+    spill_size = os.path.getsize(tmp_path / f'{first}.pkl')
+    monkeypatch.setattr('config.Config.DATASET_CACHE_SPILL_MAX_BYTES', 2 * spill_size)
+
+    keys = [cache.put(_frame(seed)) for seed in range(2, 6)]
+
+    stats = cache.stats()
+    assert stats['spill_bytes'] <= 2 * spill_size
+    assert not (tmp_path / f'{first}.pkl').exists()
+    # Le plus récent reste en mémoire, le précédent est encore sur disque
+    assert (tmp_path / f'{keys[-2]}.pkl').exists()
+
+
+def test_spilled_dataset_is_reloaded(cache):
+    first = cache.put(_frame(0))
+    cache.put(_frame(1))
+
+    pd.testing.assert_frame_equal(cache.get(first), _frame(0))
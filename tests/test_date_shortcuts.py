@@ -0,0 +1,109 @@
+"""
+Parité entre les raccourcis de dates clientside (assets/date_shortcuts.js)
+et les helpers Python de src/utils.py
+"""
+import sys
+import os
+import json
+import shutil
+import subprocess
+from datetime import date, datetime
+
+import pytest
+
+ROOT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT_DIR)
+
+from src import utils
+
+JS_PATH = os.path.join(ROOT_DIR, 'assets', 'date_shortcuts.js')
+NODE = shutil.which('node')
+
+pytestmark = pytest.mark.skipif(NODE is None, reason="node n'est pas installé")
+
+# Charge le script dans un contexte vm avec un `window` minimal, puis évalue
+# chaque appel demandé ; les déclarations de fonctions deviennent globales.
+NODE_RUNNER = r"""
+const fs = require('fs');
+const vm = require('vm');
+const context = {window: {}};
+vm.createContext(context);
+vm.runInContext(fs.readFileSync(process.argv[1], 'utf8'), context);
+const calls = JSON.parse(fs.readFileSync(0, 'utf8'));
+const results = calls.map(([fn, arg]) => vm.runInContext(fn, context)(arg));
+process.stdout.write(JSON.stringify(results));
+"""
+
+NOW_CASES = [
+    date(2024, 1, 15),   # janvier : mois précédent en décembre de l'année passée
+    date(2024, 2, 10),   # février bissextile
+    date(2023, 2, 10),   # février non bissextile
+    date(2024, 3, 31),   # mois précédent = février bissextile
+    date(2023, 3, 1),    # mois précédent = février non bissextile
+    date(2024, 12, 31),  # décembre : mois précédent dans la même année
+    date(2025, 1, 1),
+    date(2000, 2, 29),
+]
+
+START_CASES = [
+    date(2024, 2, 29),   # 29/02 -> 27/02 de l'année suivante
+    date(2023, 3, 1),    # 01/03 -> 29/02 bissextile
+    date(2024, 3, 1),
+    date(2024, 1, 1),    # 01/01 -> 31/12
+    date(2023, 12, 31),  # 31/12 -> 30/12
+    date(2024, 12, 1),
+    date(2023, 2, 1),
+    date(1999, 2, 28),
+]
+
+
+def run_js(calls):
+    result = subprocess.run(
+        [NODE, '-e', NODE_RUNNER, JS_PATH],
+        input=json.dumps(calls), capture_output=True, text=True, check=True
+    )
+    return json.loads(result.stdout)
+
+
+def js_date(d):
+    return {'year': d.year, 'month': d.month, 'day': d.day}
+
+
+def frozen_now(monkeypatch, d):
+    class FrozenDatetime(datetime):
+        @classmethod
+        def now(cls, tz=None):
+            return cls(d.year, d.month, d.day, 12, 0, 0)
+
+    monkeypatch.setattr(utils, 'datetime', FrozenDatetime)
+
+
+@pytest.mark.parametrize('now', NOW_CASES, ids=str)
+def test_now_based_shortcuts_match_python(monkeypatch, now):
+    js = dict(zip(
+        ['current_month', 'previous_month', 'current_year', 'texts'],
+        run_js([[name, js_date(now)] for name in
+                ('currentMonthPeriod', 'previousMonthPeriod', 'currentYearPeriod', 'monthButtonTexts')])
+    ))
+
+    frozen_now(monkeypatch, now)
+    assert js['current_month'] == [d.isoformat() for d in utils.get_current_month_period()]
+    assert js['previous_month'] == [d.isoformat() for d in utils.get_previous_month_period()]
+    assert js['current_year'] == [d.isoformat() for d in utils.get_current_year_period()]
+    assert js['texts'] == list(utils.get_month_button_texts())
+
+
+@pytest.mark.parametrize('start', START_CASES, ids=str)
+def test_end_dates_match_python(start):
+    end_12_months, end_of_month = run_js([
+        ['endDate12Months', js_date(start)],
+        ['endOfMonth', js_date(start)],
+    ])
+
+    assert end_12_months == utils.calculate_end_date_12_months(start.isoformat()).isoformat()
+    assert end_of_month == utils.calculate_end_of_month(start.isoformat()).isoformat()
+
+
+def test_leap_day_end_date_12_months():
+    assert run_js([['endDate12Months', js_date(date(2024, 2, 29))]]) == ['2025-02-27']
+    assert utils.calculate_end_date_12_months('2024-02-29') == date(2025, 2, 27)
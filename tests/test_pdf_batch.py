@@ -0,0 +1,60 @@
+"""
+Génération des notes de frais mois par mois sur le pool de processus (src/pdf_generator.py)
+"""
+import sys
+import os
+from concurrent.futures import Future
+from concurrent.futures.process import BrokenProcessPool
+from datetime import date
+
+import pytest
+
+ROOT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT_DIR)
+
+from src import pdf_generator
+from src.pdf_generator import PdfBatchRenderer
+
+
+class BrokenExecutor:
+    """Pool dont un worker est mort : le premier mois aboutit, les suivants échouent"""
+
+    def __init__(self):
+        self.submitted = 0
+        self.shut_down = False
+
+    def submit(self, fn, *args):
+        future = Future()
+        if self.submitted == 0:
+            future.set_result(fn(*args))
+        else:
+            future.set_exception(BrokenProcessPool('worker mort'))
+        self.submitted += 1
+        return future
+
+    def shutdown(self, wait=True, cancel_futures=False):
+        self.shut_down = True
+
+
+@pytest.fixture
+def months(monkeypatch):
+    months = [(date(2024, m, 1), date(2024, m, 28), f'sessions-{m}') for m in (1, 2, 3)]
+    monkeypatch.setattr(pdf_generator, '_split_months', lambda *args: months)
+    monkeypatch.setattr(pdf_generator, '_render_month_worker',
+                        lambda df_month, *args: f'pdf:{df_month}'.encode())
+    monkeypatch.setattr(pdf_generator.PdfCache, 'make_key', staticmethod(lambda df_month, *args: df_month))
+    monkeypatch.setattr(pdf_generator.PdfCache, 'get', classmethod(lambda cls, key: None))
+    monkeypatch.setattr(pdf_generator.PdfCache, 'put', classmethod(lambda cls, key, data: None))
+    monkeypatch.setattr('config.Config.PDF_BATCH_WORKERS', 2)
+    return months
+
+
+def test_broken_pool_falls_back_in_process_and_is_replaced(months, monkeypatch):
+    broken = BrokenExecutor()
+    monkeypatch.setattr(PdfBatchRenderer, '_executor', broken)
+
+    notes = PdfBatchRenderer.render_months(None, '2024-01-01', '2024-03-31', ['car'])
+
+    assert [pdf for _, _, pdf in notes] == [b'pdf:sessions-1', b'pdf:sessions-2', b'pdf:sessions-3']
+    assert broken.shut_down
+    assert PdfBatchRenderer._executor is None